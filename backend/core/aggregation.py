@@ -0,0 +1,53 @@
+# backend/core/aggregation.py
+
+import numpy as np
+
+# Function to get the min-max range of every criterion row of a score matrix as (lows, spans),
+# both of shape (rows, 1)
+def row_ranges(scores):
+    valid = np.isfinite(scores)
+    lows = np.where(valid, scores, np.inf).min(axis=1, keepdims=True)
+    highs = np.where(valid, scores, -np.inf).max(axis=1, keepdims=True)
+    spans = highs - lows
+    # Constant (or empty) rows map to 0, like MinMaxScaler does
+    spans[~np.isfinite(spans) | (spans == 0)] = 1.0
+    return lows, spans
+
+# Function to min-max normalize every criterion row of a score matrix to [0, 1], over the row's own
+# values or over given (lows, spans) ranges, e.g. of the full rows when scoring only some recipes
+def normalize_rows(scores, ranges=None):
+    if scores.shape[1] == 0:
+        return scores
+    lows, spans = row_ranges(scores) if ranges is None else ranges
+    return (scores - lows) / spans
+
+# Function to combine already normalized per-criterion rows into one weighted score per recipe
+def combine_scores(normalized, weights, mask=None):
+    # Strict matching: a recipe survives only if every criterion scored it
+    survivors = np.isfinite(normalized).all(axis=0)
+    if mask is not None:
+        survivors &= mask
+
+    weights = np.asarray(weights, dtype=normalized.dtype)
+    combined = weights @ np.nan_to_num(normalized, nan=0.0)
+    return combined, survivors
+
+# Function to combine raw per-criterion scores into one weighted score per recipe
+def aggregate_scores(scores, weights, mask=None):
+    return combine_scores(normalize_rows(scores), weights, mask)
+
+# Function to select the best surviving recipe rows, highest score first
+def top_k(combined, survivors, k=None, offset=0):
+    candidates = np.flatnonzero(survivors)
+    end = len(candidates) if k is None else min(offset + k, len(candidates))
+    if offset >= end:
+        return candidates[:0]
+
+    candidate_scores = combined[candidates]
+    if end < len(candidates):
+        # Partial selection: only the first `end` rows need to be ordered
+        selected = np.argpartition(-candidate_scores, end - 1)[:end]
+    else:
+        selected = np.arange(len(candidates))
+    order = selected[np.argsort(-candidate_scores[selected], kind='stable')]
+    return candidates[order[offset:end]]
@@ -0,0 +1,223 @@
+# backend/core/ann.py
+#
+# Similar-recipe search over the QuatE recipe entity embeddings (cosine similarity). An
+# inverted-file (IVF) index clusters the recipes with k-means, so a query only scans the
+# recipes of the few clusters closest to it instead of the whole catalogue.
+# Usage: python -m core.ann [--num-lists N] [--benchmark]
+
+import argparse
+import hashlib
+import os
+import time
+import numpy as np
+from .artifacts import write_atomically, load_recipe_table, load_embedding_artifacts, embedding_dir, data_dir
+from .aggregation import top_k
+from .scoring import ScoringEngine
+from .quantization import EmbeddingMatrix
+
+# Clusters scanned per query; more is slower and closer to exact search
+ANN_NPROBE = int(os.environ.get('ANN_NPROBE', 8))
+# Below this many recipes an exact scan is as fast as the index
+ANN_MIN_RECIPES = int(os.environ.get('ANN_MIN_RECIPES', 5000))
+
+processed_table_path = os.path.join(data_dir, 'processed_recipes.arrow')
+ann_index_file = 'recipe_ann_index.npz'
+
+# Function to scale rows to unit length, leaving all-zero rows at zero
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+# Function to fingerprint the recipe vectors from a strided sample, so an index built on other
+# embeddings (e.g. before a retrain) is detected without hashing the whole matrix
+def vector_fingerprint(vectors):
+    step = max(1, len(vectors) // 1024)
+    sample = np.ascontiguousarray(vectors[::step], dtype=np.float32)
+    return hashlib.sha1(sample.tobytes()).hexdigest()
+
+# Function to assign each vector to its most similar centroid, in chunks to bound memory.
+# Row norms do not change the argmax, so the vectors need not be normalized.
+def assign_lists(vectors, centroids, chunk_size=65536):
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        assignment[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignment
+
+# Function to cluster vectors with spherical k-means, trained on a sample of at most sample_size rows
+def train_centroids(vectors, num_lists, iterations=10, sample_size=100_000, seed=0):
+    rng = np.random.default_rng(seed)
+    sample_rows = rng.choice(len(vectors), min(len(vectors), sample_size), replace=False)
+    sample = normalize(np.asarray(vectors[np.sort(sample_rows)], dtype=np.float32))
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)]
+
+    for _ in range(iterations):
+        assignment = assign_lists(sample, centroids)
+        counts = np.bincount(assignment, minlength=num_lists)
+        # Sum the members of every cluster with one sort instead of a scatter-add
+        order = np.argsort(assignment, kind='stable')
+        sums = np.zeros_like(centroids)
+        non_empty = np.flatnonzero(counts)
+        sums[non_empty] = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[non_empty])
+        # Restart empty clusters from random sample rows
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+# Inverted-file index: the rows of the recipe matrix grouped by their closest centroid,
+# stored as one array of rows plus the offset of every list in it
+class IVFIndex:
+    def __init__(self, centroids, list_offsets, list_rows, labels, fingerprint):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.list_rows = np.asarray(list_rows, dtype=np.int32)
+        self.labels = np.asarray(labels, dtype=object)
+        self.fingerprint = str(fingerprint)
+
+    @property
+    def num_lists(self):
+        return len(self.centroids)
+
+    # Build the index over the recipe matrix; labels are the recipe names of its rows
+    @classmethod
+    def build(cls, vectors, labels, num_lists=None, iterations=10, seed=0):
+        # Rule of thumb: about 4 * sqrt(N) lists
+        num_lists = min(len(vectors), num_lists or max(1, int(4 * np.sqrt(len(vectors)))))
+        centroids = train_centroids(vectors, num_lists, iterations, seed=seed)
+        assignment = assign_lists(vectors, centroids)
+        list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=num_lists))])
+        return cls(centroids, list_offsets, list_rows, labels, vector_fingerprint(vectors))
+
+    def save(self, file_path):
+        write_atomically(file_path, lambda f: np.savez(
+            f,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            labels=np.array(self.labels, dtype=str),
+            fingerprint=np.array(self.fingerprint),
+        ))
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path, allow_pickle=False) as data:
+            return cls(data['centroids'], data['list_offsets'], data['list_rows'], data['labels'], data['fingerprint'])
+
+    # Function to check the index was built on exactly these recipe rows and vectors
+    def matches(self, vectors, labels):
+        return (
+            len(self.labels) == len(labels)
+            and bool(np.array_equal(self.labels, labels))
+            and self.fingerprint == vector_fingerprint(vectors)
+        )
+
+    # Rows of the `nprobe` lists whose centroids are most similar to the query, probing further
+    # lists until there are at least `min_rows` candidates
+    def candidates(self, query, nprobe=ANN_NPROBE, min_rows=0):
+        order = np.argsort(-(self.centroids @ query))
+        enough = np.cumsum(np.diff(self.list_offsets)[order]) >= min_rows
+        num_probed = max(nprobe, int(np.argmax(enough)) + 1 if enough.any() else len(order))
+        return np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in order[:num_probed]])
+
+# Function to load a persisted index, or None when there is none
+def load_ann_index(file_path):
+    if not os.path.exists(file_path):
+        return None
+    return IVFIndex.load(file_path)
+
+# Cosine similarity between recipes of one snapshot; uses the IVF index when it matches the
+# snapshot's recipes and falls back to an exact scan otherwise
+class RecipeSimilarity:
+    def __init__(self, recipe_matrix, recipe_labels, index=None, min_recipes=ANN_MIN_RECIPES):
+        self.min_recipes = min_recipes
+        # Float32 or quantized rows, see quantization.EmbeddingMatrix
+        self.vectors = recipe_matrix if isinstance(recipe_matrix, EmbeddingMatrix) else EmbeddingMatrix(recipe_matrix)
+        self.inverse_norms = 1.0 / np.maximum(self.vectors.norms(), 1e-12)
+        self.recipe_labels = recipe_labels
+        self.row_of = {label: row for row, label in enumerate(recipe_labels)}
+        # A stale index (other recipes or retrained embeddings) is ignored
+        self.index = index if index is not None and index.matches(recipe_matrix, recipe_labels) else None
+
+    # Function to score candidate rows (all rows when None) against a unit query
+    def _scores(self, query, rows=None):
+        if rows is None:
+            return self.vectors.dot(query) * self.inverse_norms
+        return (self.vectors[rows] @ query) * self.inverse_norms[rows]
+
+    # Function to find the k rows most similar to the mean direction of the given rows,
+    # excluding them. Returns (rows, scores).
+    def search_rows(self, rows, k=10, exact=False, nprobe=ANN_NPROBE):
+        rows = np.asarray(rows, dtype=np.int64)
+        query = normalize((self.vectors[rows] * self.inverse_norms[rows, None]).mean(axis=0, keepdims=True))[0]
+
+        if exact or self.index is None or len(self.vectors) < self.min_recipes:
+            scores = self._scores(query)
+            keep = np.ones(len(scores), dtype=bool)
+            keep[rows] = False
+            best = top_k(scores, keep, k)
+            return best, scores[best]
+
+        candidates = self.index.candidates(query, nprobe, min_rows=k + len(rows))
+        scores = self._scores(query, candidates)
+        best = top_k(scores, ~np.isin(candidates, rows), k)
+        return candidates[best], scores[best]
+
+    # Function to find the k recipes most similar to one or more recipes.
+    # Returns (names, scores, missing) where missing lists the unknown input names.
+    def search(self, recipe_names, k=10, exact=False, nprobe=ANN_NPROBE):
+        rows = [self.row_of.get(name) for name in recipe_names]
+        missing = [name for name, row in zip(recipe_names, rows) if row is None]
+        rows = list(dict.fromkeys(row for row in rows if row is not None))
+        if not rows:
+            return [], [], missing
+        best, scores = self.search_rows(rows, k, exact, nprobe)
+        return self.recipe_labels[best].tolist(), scores.tolist(), missing
+
+# Function to measure the recall@k of the similarity's index against exact search and the time per query
+def benchmark_recall(similarity, index, k=10, num_queries=200, nprobe_values=(1, 2, 4, 8, 16, 32), seed=0):
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(similarity.vectors), min(num_queries, len(similarity.vectors)), replace=False)
+
+    started = time.perf_counter()
+    truth = [set(similarity.search_rows([row], k, exact=True)[0].tolist()) for row in queries]
+    results = [{'nprobe': 'exact', 'recall': 1.0, 'ms_per_query': (time.perf_counter() - started) * 1000 / len(queries)}]
+
+    for nprobe in nprobe_values:
+        if nprobe > index.num_lists:
+            break
+        started = time.perf_counter()
+        found = [similarity.search_rows([row], k, nprobe=nprobe)[0] for row in queries]
+        elapsed = time.perf_counter() - started
+        hits = sum(len(expected.intersection(rows.tolist())) for expected, rows in zip(truth, found))
+        results.append({
+            'nprobe': nprobe,
+            'recall': hits / sum(len(expected) for expected in truth),
+            'ms_per_query': elapsed * 1000 / len(queries),
+        })
+    return results
+
+# Function to build and save the index for the recipe table and embeddings in these locations
+def build_ann_index(table_path=processed_table_path, directory=embedding_dir, num_lists=None, seed=0):
+    recipe_names = load_recipe_table(table_path)['Name']
+    engine = ScoringEngine(recipe_names=recipe_names, **load_embedding_artifacts(directory))
+    index = IVFIndex.build(engine.recipe_matrix, engine.recipe_labels, num_lists, seed=seed)
+    index.save(os.path.join(directory, ann_index_file))
+    return engine, index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the similar-recipe ANN index")
+    parser.add_argument('--num-lists', type=int, default=None, help="k-means clusters (default: 4 * sqrt(recipes))")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--embedding-dir', default=embedding_dir)
+    parser.add_argument('--benchmark', action='store_true', help="report recall@10 against exact search")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine, index = build_ann_index(processed_table_path, args.embedding_dir, args.num_lists, args.seed)
+    print(f"Built an index of {index.num_lists} lists over {engine.num_recipes} recipes in {time.perf_counter() - started:.1f}s")
+
+    if args.benchmark:
+        similarity = RecipeSimilarity(engine.recipe_matrix, engine.recipe_labels, index, min_recipes=0)
+        for result in benchmark_recall(similarity, index):
+            print(f"nprobe={result['nprobe']:>5}  recall@10={result['recall']:.3f}  {result['ms_per_query']:.2f} ms/query")
@@ -0,0 +1,152 @@
+# backend/core/artifacts.py
+
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+from .quantization import quantize_embeddings
+from .scoring import recipe_entities
+
+# Trained model, serving embeddings, ANN index, score tables and precomputed rankings: written by
+# the offline steps and read by the API, so both sides must use this one directory
+embedding_dir = os.environ.get('EMBEDDING_DIR', '/app/FoodRecomandationSystem/embedding')
+# Pickled PyKEEN pipeline result written by core/train.py
+model_file = os.path.join(embedding_dir, 'LargerDataQuatE_model.pkl')
+# Source CSV, processed recipe table, vocabularies and triples: written by core/data_processing.py
+# and read by training, the offline index builders and the API
+data_dir = os.environ.get('DATA_DIR', '/app/FoodRecomandationSystem/data')
+
+# Recipe rows of the entity embeddings in serving order: values, int8 scales and labels
+recipe_embedding_files = ['recipe_embeddings.npy', 'recipe_scales.npy', 'recipe_labels.npy']
+
+# Function to write a file under a temporary name and rename it into place, so processes
+# that memory-map the previous version keep reading it undisturbed
+def write_atomically(file_path, write):
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, file_path)
+
+# Function to save a NumPy array as a .npy file
+def save_array(array, file_path):
+    write_atomically(file_path, lambda f: np.save(f, array, allow_pickle=False))
+
+# Function to save the recipe table as an uncompressed Arrow IPC (Feather v2) file,
+# which can be memory-mapped and shared between worker processes
+def save_recipe_table(df, file_path):
+    write_atomically(file_path, lambda f: feather.write_feather(df, f, compression='uncompressed'))
+
+# Function to load the recipe table from a memory-mapped Arrow IPC file. Arrow-backed columns keep
+# reading the mapped pages, which every worker shares; arrow_backed=False converts them to NumPy
+# and Python objects (private copies) for code that edits the table.
+def load_recipe_table(file_path, arrow_backed=True):
+    table = feather.read_table(file_path, memory_map=True)
+    return table.to_pandas(types_mapper=pd.ArrowDtype) if arrow_backed else table.to_pandas()
+
+# Function to read the recipe names of a processed recipe table; None when it has not been built
+def load_recipe_names(file_path):
+    if not os.path.exists(file_path):
+        return None
+    return load_recipe_table(file_path)['Name']
+
+# Function to save a list of labels (vocabulary, unique values) as a NumPy string array
+def save_labels(labels, file_path):
+    save_array(np.array(labels, dtype=str), file_path)
+
+# Function to load a list of labels saved with save_labels
+def load_labels(file_path):
+    return np.load(file_path, allow_pickle=False).tolist()
+
+# Function to save integer triples as a raw .npy array that can be memory-mapped
+def save_mapped_triples(mapped_triples, file_path):
+    save_array(np.ascontiguousarray(mapped_triples, dtype=np.int32), file_path)
+
+# Function to memory-map integer triples; pages are shared between processes reading the same file
+def load_mapped_triples(file_path):
+    return np.load(file_path, mmap_mode='r', allow_pickle=False)
+
+# Function to extract the serving embeddings from a trained PyKEEN QuatE model
+def extract_model_embeddings(model, triples_factory):
+    import torch
+
+    with torch.no_grad():
+        # Calling the representations applies their normalizers (QuatE normalizes relations)
+        entity_embeddings = model.entity_representations[0](indices=None).cpu().numpy()
+        relation_embeddings = model.relation_representations[0](indices=None).cpu().numpy()
+        table = model.interaction.table.cpu().numpy()
+    return {
+        'entity_embeddings': entity_embeddings,
+        'relation_embeddings': relation_embeddings,
+        'table': table,
+        'entity_to_id': dict(triples_factory.entity_to_id),
+        'relation_to_id': dict(triples_factory.relation_to_id),
+    }
+
+# Function to write the serving embeddings and their label maps as plain NumPy files.
+# Entity embeddings can be stored as float16, or as int8 with per-row scales (entity_scales.npy).
+# With the recipe names of the processed table, the recipe rows are also written in serving order
+# (recipe_embeddings.npy), so the API memory-maps them instead of copying them out per worker.
+def save_embedding_artifacts(embeddings, directory, precision='float32', recipe_names=None):
+    os.makedirs(directory, exist_ok=True)
+    values, scales = quantize_embeddings(embeddings['entity_embeddings'], precision)
+    if scales is not None:
+        save_array(scales, os.path.join(directory, 'entity_scales.npy'))
+    save_array(np.ascontiguousarray(values), os.path.join(directory, 'entity_embeddings.npy'))
+    save_recipe_embeddings(values, scales, embeddings['entity_to_id'], recipe_names, directory)
+    save_array(np.ascontiguousarray(embeddings['relation_embeddings'], dtype=np.float32), os.path.join(directory, 'relation_embeddings.npy'))
+    save_array(np.asarray(embeddings['table'], dtype=np.float32), os.path.join(directory, 'quaternion_table.npy'))
+    # Labels are stored in ID order, so position i holds the label of ID i
+    save_labels(sorted(embeddings['entity_to_id'], key=embeddings['entity_to_id'].get), os.path.join(directory, 'entity_labels.npy'))
+    save_labels(sorted(embeddings['relation_to_id'], key=embeddings['relation_to_id'].get), os.path.join(directory, 'relation_labels.npy'))
+
+# Function to write the recipe rows of the entity embeddings in serving order, or to remove the
+# previous ones when the recipe names are unknown (they would hold the vectors of an older model)
+def save_recipe_embeddings(values, scales, entity_to_id, recipe_names, directory):
+    paths = [os.path.join(directory, name) for name in recipe_embedding_files]
+    if recipe_names is None:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return
+    recipe_labels, recipe_ids = recipe_entities(recipe_names, entity_to_id)
+    save_array(np.ascontiguousarray(values[recipe_ids]), paths[0])
+    if scales is not None:
+        save_array(scales[recipe_ids], paths[1])
+    elif os.path.exists(paths[1]):
+        os.remove(paths[1])
+    save_labels(recipe_labels, paths[2])
+
+# Function to memory-map the recipe rows written by save_recipe_embeddings; (None, None, None) when
+# there are none or they were stored in another precision than the entity embeddings
+def load_recipe_embeddings(directory, dtype):
+    embeddings_path, scales_path, labels_path = [os.path.join(directory, name) for name in recipe_embedding_files]
+    if not (os.path.exists(embeddings_path) and os.path.exists(labels_path)):
+        return None, None, None
+    recipe_embeddings = np.load(embeddings_path, mmap_mode='r')
+    if recipe_embeddings.dtype != dtype:
+        return None, None, None
+    recipe_scales = np.load(scales_path) if dtype == np.int8 else None
+    return recipe_embeddings, recipe_scales, load_labels(labels_path)
+
+# Function to load the serving embeddings; needs neither PyKEEN nor a triples factory.
+# Entity embeddings are memory-mapped in their stored precision; entity_scales is None unless int8.
+def load_embedding_artifacts(directory):
+    entity_labels = load_labels(os.path.join(directory, 'entity_labels.npy'))
+    relation_labels = load_labels(os.path.join(directory, 'relation_labels.npy'))
+    entity_embeddings = np.load(os.path.join(directory, 'entity_embeddings.npy'), mmap_mode='r')
+    entity_scales = None
+    if entity_embeddings.dtype == np.int8:
+        entity_scales = np.load(os.path.join(directory, 'entity_scales.npy'))
+    recipe_embeddings, recipe_scales, recipe_labels = load_recipe_embeddings(directory, entity_embeddings.dtype)
+    return {
+        'entity_embeddings': entity_embeddings,
+        'entity_scales': entity_scales,
+        'recipe_embeddings': recipe_embeddings,
+        'recipe_scales': recipe_scales,
+        'recipe_labels': recipe_labels,
+        'relation_embeddings': np.load(os.path.join(directory, 'relation_embeddings.npy')),
+        'table': np.load(os.path.join(directory, 'quaternion_table.npy')),
+        'entity_to_id': {label: i for i, label in enumerate(entity_labels)},
+        'relation_to_id': {label: i for i, label in enumerate(relation_labels)},
+    }
+
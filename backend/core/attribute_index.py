@@ -0,0 +1,90 @@
+# backend/core/attribute_index.py
+#
+# Inverted attribute index: the sorted recipe rows of every (relation, tail) fact in the triples.
+# Queries on exact attributes (a country plus a few ingredients) get their candidates from the
+# posting lists, so embedding scoring only runs on those recipes instead of the whole catalogue.
+
+import os
+import numpy as np
+
+# Candidate selection: 'intersect' (recipes having every attribute), 'union' (recipes having
+# attributes worth at least HYBRID_UNION_MIN_SHARE of the criteria weight) or 'off'
+HYBRID_RETRIEVAL = os.environ.get('HYBRID_RETRIEVAL', 'intersect')
+# With fewer candidates the pure embedding ranking is used, which also ranks near misses
+HYBRID_MIN_CANDIDATES = int(os.environ.get('HYBRID_MIN_CANDIDATES', 50))
+# With candidates making up more than this share of the recipes, pruning saves little
+HYBRID_MAX_FRACTION = float(os.environ.get('HYBRID_MAX_FRACTION', 0.2))
+HYBRID_UNION_MIN_SHARE = float(os.environ.get('HYBRID_UNION_MIN_SHARE', 0.5))
+
+HYBRID_MODES = ('off', 'intersect', 'union')
+
+# Posting lists of recipe rows (rows of the scoring engine's recipe matrix) by (relation, tail),
+# stored as one array of rows plus the span of every list in it
+class AttributeIndex:
+    def __init__(self, spans, rows, num_recipes):
+        self.spans = spans
+        self.rows = rows
+        self.num_recipes = num_recipes
+
+    def __len__(self):
+        return len(self.spans)
+
+    # Build the index from integer triples; recipe_labels are the recipe names of the engine's rows
+    @classmethod
+    def build(cls, mapped_triples, entity_labels, relation_labels, recipe_labels):
+        num_recipes = len(recipe_labels)
+        row_of = {label: row for row, label in enumerate(recipe_labels)}
+        # Entity ID -> recipe row, -1 for entities that are not recipes
+        entity_rows = np.array([row_of.get(label, -1) for label in entity_labels], dtype=np.int64)
+
+        mapped_triples = np.asarray(mapped_triples)
+        heads = entity_rows[mapped_triples[:, 0]]
+        is_recipe = heads >= 0
+        keys = mapped_triples[is_recipe, 1].astype(np.int64) * len(entity_labels) + mapped_triples[is_recipe, 2]
+        # One sort orders the lists by key and every list by row, and drops repeated facts
+        entries = np.unique(keys * num_recipes + heads[is_recipe])
+        keys, rows = entries // num_recipes, (entries % num_recipes).astype(np.int32)
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        spans = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            relation_id, tail_id = divmod(int(keys[start]), len(entity_labels))
+            spans[(relation_labels[relation_id], entity_labels[tail_id])] = (start, end)
+        return cls(spans, rows, num_recipes)
+
+    # Function to get the sorted recipe rows having the (relation, tail) fact
+    def postings(self, relation, tail):
+        start, end = self.spans.get((relation, tail), (0, 0))
+        return self.rows[start:end]
+
+    # Function to select the candidate rows for (tail, relation, weight) criteria, or None when the
+    # whole catalogue should be ranked: no criteria, too few candidates or too many to be worth it
+    def candidates(self, criteria, mode=HYBRID_RETRIEVAL, min_candidates=HYBRID_MIN_CANDIDATES,
+                   max_fraction=HYBRID_MAX_FRACTION, union_min_share=HYBRID_UNION_MIN_SHARE):
+        if mode == 'off' or not criteria:
+            return None
+        lists = [self.postings(relation, tail) for tail, relation, _ in criteria]
+
+        if mode == 'intersect':
+            # Start from the shortest list, so every step only shrinks a small array
+            lists.sort(key=len)
+            candidates = lists[0]
+            for postings in lists[1:]:
+                if len(candidates) < min_candidates:
+                    break
+                candidates = np.intersect1d(candidates, postings, assume_unique=True)
+        elif mode == 'union':
+            weights = np.array([weight for _, _, weight in criteria], dtype=np.float32)
+            if weights.sum() <= 0:
+                return None
+            matched = np.zeros(self.num_recipes, dtype=np.float32)
+            for postings, weight in zip(lists, weights):
+                matched[postings] += weight
+            candidates = np.flatnonzero(matched >= union_min_share * weights.sum()).astype(np.int32)
+        else:
+            raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {HYBRID_MODES}")
+
+        if len(candidates) < min_candidates or len(candidates) > max_fraction * self.num_recipes:
+            return None
+        return candidates
@@ -0,0 +1,117 @@
+# backend/core/batching.py
+#
+# Request coalescing: scoring requests that arrive within a short window are handed to the
+# inference executor as one batch, so their criteria are deduplicated and scored in a single
+# matrix product (see recommender.computed_pages) instead of one small product per request.
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from .executor import inference_executor
+from .metrics import Histogram, Profile, current_profile, profiling, record_stage
+from .recommender import computed_pages
+
+# How long the first request of a batch waits for others (milliseconds); 0 disables batching
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', 2))
+# A batch is dispatched as soon as it holds this many requests
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 32))
+
+BATCH_SIZE = Histogram('batch_size', "Requests per coalesced scoring batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+# Collects items on the event loop and runs run_batch(items) -> results (same order) on the executor.
+# A batch is one executor job, so INFERENCE_QUEUE_DEPTH bounds batches rather than requests.
+class RequestCoalescer:
+    def __init__(self, run_batch, executor, window_ms=BATCH_WINDOW_MS, max_size=BATCH_MAX_SIZE):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._pending = []
+        self._flush_handle = None
+        # Batch tasks in flight; the event loop only keeps weak references to tasks
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    # Wait for the result of one item, scored together with the items submitted around it
+    async def submit(self, item):
+        if self.window <= 0 or self.max_size <= 1:
+            return (await self._run_items([item]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # The request's profile (if any) gets the batch window wait and the stages of its batch
+        self._pending.append((item, future, current_profile(), time.perf_counter()))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            flushed = time.perf_counter()
+            for _, _, profile, submitted in batch:
+                with profiling(profile):
+                    record_stage('batch_window', flushed - submitted)
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(functools.partial(self._finished, batch))
+
+    # Drop the reference to a finished batch task. Requests still waiting on it (the task was
+    # cancelled, or failed outside the scoring call) get its cancellation or error.
+    def _finished(self, batch, task):
+        self._tasks.discard(task)
+        error = None if task.cancelled() else task.exception()
+        for _, future, _, _ in batch:
+            if future.done():
+                continue
+            if error is None:
+                future.cancel()
+            else:
+                future.set_exception(error)
+
+    async def _run(self, batch):
+        # Stages of the batch are timed once and added to the profile of every request in it
+        # (the task would otherwise inherit the context, and profile, of whichever request flushed)
+        with profiling(Profile()) as batch_profile:
+            try:
+                results = await self._run_items([item for item, _, _, _ in batch])
+            except Exception as e:
+                # Overload (503) or a scoring error fails every request of the batch
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for (_, future, profile, _), result in zip(batch, results):
+            if profile is not None:
+                profile.merge(batch_profile)
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_items(self, items):
+        with self._lock:
+            self.batches += 1
+            self.requests += len(items)
+        BATCH_SIZE.observe(len(items))
+        return await self.executor.run(self.run_batch, items)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'window_ms': self.window * 1000,
+                'max_size': self.max_size,
+                'batches': self.batches,
+                'requests': self.requests,
+                'mean_batch_size': self.requests / self.batches if self.batches else None,
+            }
+
+# Coalesces the scoring of concurrent /recommend requests
+recommendation_batcher = RequestCoalescer(computed_pages, inference_executor)
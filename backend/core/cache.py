@@ -0,0 +1,76 @@
+# backend/core/cache.py
+
+import os
+import threading
+from cachetools import TTLCache
+
+# Cache sizes (entries) and time-to-live (seconds), overridable per deployment
+RANKING_CACHE_SIZE = int(os.environ.get('RANKING_CACHE_SIZE', 1024))
+RANKING_CACHE_TTL = float(os.environ.get('RANKING_CACHE_TTL', 600))
+SCORE_CACHE_SIZE = int(os.environ.get('SCORE_CACHE_SIZE', 256))
+SCORE_CACHE_TTL = float(os.environ.get('SCORE_CACHE_TTL', 3600))
+# Score ranges are two floats each, so many more of them are kept than score rows
+SCORE_RANGE_CACHE_SIZE = int(os.environ.get('SCORE_RANGE_CACHE_SIZE', 65536))
+
+# Every cache created here, so all of them can be dropped when artifacts are reloaded
+_caches = []
+
+# Thread-safe LRU cache with TTL eviction and hit/miss counters
+class ResultCache:
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+# Function to build an order-insensitive cache key from (tail, relation, weight) criteria
+def criteria_key(criteria):
+    return tuple(sorted((relation, tail, float(weight)) for tail, relation, weight in criteria))
+
+# Function to invalidate every cache, e.g. after the model or data artifacts are reloaded
+def clear_all_caches():
+    for cache in _caches:
+        cache.clear()
+
+# Function to report the counters of every cache
+def cache_stats():
+    return [cache.stats() for cache in _caches]
+
+# Ranked recipe rows per (artifact version, canonical criteria tuple)
+ranking_cache = ResultCache('ranking', RANKING_CACHE_SIZE, RANKING_CACHE_TTL)
+# Normalized recipe score vector per (artifact version, relation, tail), reused across overlapping queries
+score_cache = ResultCache('criterion_scores', SCORE_CACHE_SIZE, SCORE_CACHE_TTL)
+# (low, span) of the raw model scores over all recipes per (artifact version, relation, tail)
+score_range_cache = ResultCache('score_ranges', SCORE_RANGE_CACHE_SIZE, SCORE_CACHE_TTL)
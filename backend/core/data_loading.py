@@ -3,49 +3,68 @@
 import pandas as pd
 import pickle
 import os
+from .recipe_index import RecipeIndex, build_recipe_index
+from .artifacts import load_recipe_table, load_labels, load_mapped_triples, data_dir
 
 # Define file paths
-processed_data_path = '/app/FastAPI/data/processed_recipes_df.csv'
-unique_regions_path = '/app/FastAPI/data/unique_regions.pkl'
-unique_countries_path = '/app/FastAPI/data/unique_countries.pkl'
-unique_ingredients_path = '/app/FastAPI/data/unique_ingredients.pkl'
-recipes_dict_path = '/app/FastAPI/data/recipes_dict.pkl'
-graph_file_path = '/app/FastAPI/data/graph.pkl'
+processed_data_path = os.path.join(data_dir, 'processed_recipes_df.csv')
+unique_regions_path = os.path.join(data_dir, 'unique_regions.pkl')
+unique_countries_path = os.path.join(data_dir, 'unique_countries.pkl')
+unique_ingredients_path = os.path.join(data_dir, 'unique_ingredients.pkl')
+recipes_dict_path = os.path.join(data_dir, 'recipes_dict.pkl')
+graph_file_path = os.path.join(data_dir, 'graph.pkl')
+
+# Binary artifacts written by data_processing.py; preferred over the CSV/pickle files above
+processed_table_path = os.path.join(data_dir, 'processed_recipes.arrow')
+unique_regions_array_path = os.path.join(data_dir, 'unique_regions.npy')
+unique_countries_array_path = os.path.join(data_dir, 'unique_countries.npy')
+unique_ingredients_array_path = os.path.join(data_dir, 'unique_ingredients.npy')
+# Formatted RecipeInfo fields, written with the recipe table (see core/recipe_index.py)
+recipe_index_path = os.path.join(data_dir, 'recipe_info.arrow')
+# Integer triples and their vocabularies, for the inverted attribute index (core/attribute_index.py)
+mapped_triples_path = os.path.join(data_dir, 'triples.npy')
+entity_labels_path = os.path.join(data_dir, 'entity_labels.npy')
+relation_labels_path = os.path.join(data_dir, 'relation_labels.npy')
+
+# Files whose change means a new data version (see core/registry.py)
+data_files = [
+    processed_table_path, processed_data_path, recipe_index_path,
+    unique_regions_array_path, unique_regions_path,
+    unique_countries_array_path, unique_countries_path,
+    unique_ingredients_array_path, unique_ingredients_path,
+    mapped_triples_path, entity_labels_path, relation_labels_path,
+]
+
+# Function to load a list of unique labels, preferring the .npy artifact over the pickle
+def load_unique_labels(array_path, pickle_path, description):
+    if os.path.exists(array_path):
+        return load_labels(array_path)
+    if os.path.exists(pickle_path):
+        with open(pickle_path, 'rb') as f:
+            return pickle.load(f)
+    raise FileNotFoundError(f"{description} file not found at {array_path} or {pickle_path}")
 
 # Load processed recipes DataFrame
 def load_processed_recipes_df():
+    if os.path.exists(processed_table_path):
+        return load_recipe_table(processed_table_path)
     if os.path.exists(processed_data_path):
         df = pd.read_csv(processed_data_path)
         return df
     else:
-        raise FileNotFoundError(f"Processed recipes DataFrame not found at {processed_data_path}")
+        raise FileNotFoundError(f"Processed recipes DataFrame not found at {processed_table_path} or {processed_data_path}")
 
 # Load unique regions
 def load_unique_regions():
-    if os.path.exists(unique_regions_path):
-        with open(unique_regions_path, 'rb') as f:
-            unique_regions = pickle.load(f)
-        return unique_regions
-    else:
-        raise FileNotFoundError(f"Unique regions file not found at {unique_regions_path}")
+    return load_unique_labels(unique_regions_array_path, unique_regions_path, "Unique regions")
 
 # Load unique countries
 def load_unique_countries():
-    if os.path.exists(unique_countries_path):
-        with open(unique_countries_path, 'rb') as f:
-            unique_countries = pickle.load(f)
-        return unique_countries
-    else:
-        raise FileNotFoundError(f"Unique countries file not found at {unique_countries_path}")
+    return load_unique_labels(unique_countries_array_path, unique_countries_path, "Unique countries")
 
 # Load unique ingredients
 def load_unique_ingredients():
-    if os.path.exists(unique_ingredients_path):
-        with open(unique_ingredients_path, 'rb') as f:
-            unique_ingredients = pickle.load(f)
-        return unique_ingredients
-    else:
-        raise FileNotFoundError(f"Unique ingredients file not found at {unique_ingredients_path}")
+    return load_unique_labels(unique_ingredients_array_path, unique_ingredients_path, "Unique ingredients")
 
 # Load recipes dictionary
 def load_recipes_dict():
@@ -65,10 +84,35 @@ def load_graph():
     else:
         raise FileNotFoundError(f"Graph file not found at {graph_file_path}")
 
-# Load all data
-recipes_df = load_processed_recipes_df()
-unique_regions = load_unique_regions()
-unique_countries = load_unique_countries()
-unique_ingredients = load_unique_ingredients()
-recipes = load_recipes_dict()
+# Function to load the integer triples and their vocabularies; None when they have not been built
+def load_triples_data():
+    if not all(os.path.exists(path) for path in (mapped_triples_path, entity_labels_path, relation_labels_path)):
+        return None
+    return {
+        'mapped_triples': load_mapped_triples(mapped_triples_path),
+        'entity_labels': load_labels(entity_labels_path),
+        'relation_labels': load_labels(relation_labels_path),
+    }
+
+# Function to load the formatted recipe index, memory-mapped; built in memory from the recipe table
+# when the data was processed before the index file existed
+def load_recipe_index(recipes_df):
+    if os.path.exists(recipe_index_path):
+        return RecipeIndex.load(recipe_index_path)
+    return build_recipe_index(recipes_df)
+
+# Function to load everything the API serves from the data artifacts; called on every (re)load,
+# see core/registry.py
+def load_serving_data():
+    recipes_df = load_processed_recipes_df()
+    return {
+        'recipes_df': recipes_df,
+        'unique_regions': load_unique_regions(),
+        'unique_countries': load_unique_countries(),
+        'unique_ingredients': load_unique_ingredients(),
+        # Preformatted RecipeInfo fields keyed by recipe name
+        'recipe_index': load_recipe_index(recipes_df),
+        'triples': load_triples_data(),
+    }
+# recipes = load_recipes_dict()  # Not needed for serving; the triples hold the same facts
 # G = load_graph()  # Uncomment if you need the graph
@@ -1,170 +1,221 @@
 # backend/core/data_processing.py
 
+import argparse
 import os
 import pandas as pd
-import numpy as np
-import ast
 import pickle
-from .utils import create_node_label, UNKNOWN_PLACEHOLDER
-from .graph_triples import create_graph_and_triples, save_triples, save_graph
-
-def process_list_column(x):
-    if pd.isna(x) or x == '':
-        return ''
-    # Split the string on commas
-    items = [item.strip() for item in x.split(',')]
-    return ','.join([create_node_label(item) for item in items])
-
-# Function to preprocess the data
-def preprocess_data(file_path):
-    # Load data
-    df = pd.read_csv(file_path)
-    df = df.drop_duplicates(subset='Name', keep='first')  # Ensure unique recipes
-    df = df.reset_index(drop=True)
-    
+from .utils import create_node_labels
+from .graph_triples import create_triples, TripleEncoder, create_graph, save_triples, save_graph
+from .artifacts import save_recipe_table, save_labels, save_mapped_triples, data_dir
+from .recipe_index import save_recipe_index
+
+# Comma-separated columns that hold lists of labels
+LIST_COLUMNS = ['RecipeIngredientParts', 'Healthy_Type', 'meal_type', 'Diet_Types', 'RegionPart', 'CountryPart', 'Best_foodentityname']
+
+# Rows read from the source CSV at a time; only one chunk's tokens and triples are held at once
+CHUNK_SIZE = 100_000
+
+# Function to split a list column into one labelled token per row (index = recipe row)
+def tokenize_list_column(series):
+    tokens = series.fillna('').astype(str).str.split(',').explode().str.strip()
+    return create_node_labels(tokens)
+
+# Function to preprocess one chunk of source rows; returns the chunk and its list column tokens
+def preprocess_chunk(df):
     # Process the dataframe and clean labels
-    df['Name'] = df['Name'].apply(create_node_label)
-        
-    list_columns = ['RecipeIngredientParts', 'Healthy_Type', 'meal_type', 'Diet_Types', 'RegionPart', 'CountryPart', 'Best_foodentityname']
-    for col in list_columns:
-        df[col] = df[col].apply(process_list_column)
-    
-    df['cook_time'] = df['cook_time'].apply(create_node_label)
+    df['Name'] = create_node_labels(df['Name'])
+
+    tokens = {}
+    for col in LIST_COLUMNS:
+        # Tokenize once: the tokens are reused for the recipes dict, vocabularies and triples
+        tokens[col] = tokenize_list_column(df[col])
+        df[col] = tokens[col].groupby(level=0).agg(','.join)
+
+    df['cook_time'] = create_node_labels(df['cook_time'])
+    return df, tokens
+
+# Function to give numeric columns the dtype read_csv would have inferred (int, or float with blanks)
+def infer_numeric_columns(df):
+    for col in df.columns:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            pass
     return df
 
-# Function to get unique regions from RegionPart column
-def get_unique_regions(df):
-    regions_set = set()
-    for regions in df['RegionPart']:
-        if regions:
-            for region in regions.split(','):
-                regions_set.add(region.strip())
-    unique_regions = [''] + sorted(regions_set)
+# Function to read the source CSV in chunks of unique recipes, each row tagged with a hash of its raw content
+def read_source_chunks(file_path, chunksize=CHUNK_SIZE):
+    seen_names = set()
+    # Read as text: the hash must not depend on the dtypes guessed per chunk ("100" vs "100.0")
+    for df in pd.read_csv(file_path, chunksize=chunksize, dtype=str):
+        # Ensure unique recipes, also across chunks
+        df = df[~df['Name'].isin(seen_names)].drop_duplicates(subset='Name', keep='first').copy()
+        seen_names.update(df['Name'])
+        # Lets incremental builds detect new and changed recipes
+        content_hash = pd.util.hash_pandas_object(df.fillna(''), index=False).to_numpy()
+        df = infer_numeric_columns(df)
+        df['content_hash'] = content_hash
+        yield df
+
+# Function to preprocess the source CSV chunk by chunk; yields (df, tokens) per chunk with the rows
+# numbered across chunks. keep_rows optionally selects the raw rows to process.
+def preprocess_chunks(file_path, chunksize=CHUNK_SIZE, keep_rows=None):
+    next_row = 0
+    for df in read_source_chunks(file_path, chunksize):
+        if keep_rows is not None:
+            df = df[keep_rows(df)].copy()
+        df.index = pd.RangeIndex(next_row, next_row + len(df))
+        next_row += len(df)
+        yield preprocess_chunk(df)
+
+# Function to preprocess the data into one table and its tokens; keep_rows optionally selects the
+# raw rows to process. Holds every chunk, so it suits small selections (see core/incremental.py);
+# full builds use build_artifacts.
+def preprocess_data(file_path, chunksize=CHUNK_SIZE, keep_rows=None):
+    chunks = []
+    chunk_tokens = {col: [] for col in LIST_COLUMNS}
+    for df, tokens in preprocess_chunks(file_path, chunksize, keep_rows):
+        chunks.append(df)
+        for col in LIST_COLUMNS:
+            chunk_tokens[col].append(tokens[col])
+
+    df = pd.concat(chunks)
+    tokens = {col: pd.concat(chunk_tokens[col]) for col in LIST_COLUMNS}
+    return df, tokens
+
+# Function to drop the empty tokens left by empty cells and stray commas
+def non_empty(tokens):
+    return tokens[tokens != '']
+
+# Function to get unique regions from the RegionPart tokens of every chunk
+def get_unique_regions(regions):
+    unique_regions = [''] + sorted(regions)
     return unique_regions
 
-# Function to get unique countries from CountryPart column
-def get_unique_countries(df):
-    countries_set = set()
-    for countries in df['CountryPart']:
-        if countries:
-            for country in countries.split(','):
-                if country:
-                    countries_set.add(country.strip())
-    unique_countries = [''] + sorted(countries_set)
+# Function to get unique countries from the CountryPart tokens of every chunk
+def get_unique_countries(countries):
+    unique_countries = [''] + sorted(countries)
     return unique_countries
 
-# Function to get unique ingredients from Best_foodentityname column
-def get_unique_ingredients(df):
-    ingredients_set = set()
-    for ingredients in df['Best_foodentityname']:
-        if ingredients:
-            for ingredient in ingredients.split(','):
-                ingredients_set.add(ingredient.strip())
-    unique_ingredients = sorted(ingredients_set)
+# Function to get unique ingredients from the Best_foodentityname tokens of every chunk
+def get_unique_ingredients(ingredients):
+    unique_ingredients = sorted(ingredients)
     return unique_ingredients
 
+# Function to regroup the tokens of a column into one list per recipe row
+def tokens_per_row(tokens, index):
+    lists = tokens.groupby(level=0).agg(list).reindex(index)
+    return [value if isinstance(value, list) else [] for value in lists]
+
 # Function to create the recipes dictionary
-def create_recipes_dict(df):
+def create_recipes_dict(df, tokens):
+    columns = {
+        "ingredients": tokens_per_row(non_empty(tokens['Best_foodentityname']), df.index),
+        # Diet types keep empty labels, as the triples step filters them out
+        "diet_types": tokens_per_row(tokens['Diet_Types'], df.index),
+        "meal_type": tokens_per_row(non_empty(tokens['meal_type']), df.index),
+        "cook_time": df['cook_time'].tolist(),
+        "regions": tokens_per_row(non_empty(tokens['RegionPart']), df.index),
+        "countries": tokens_per_row(non_empty(tokens['CountryPart']), df.index),
+        "healthy_types": tokens_per_row(non_empty(tokens['Healthy_Type']), df.index),
+    }
+
+    # Construct the recipe dictionary
     recipes = {}
-    for _, row in df.iterrows():
-        recipe_name = create_node_label(row['Name'])
-        
-        # Process ingredients
-        Best_foodentityname = [
-            create_node_label(ing.strip()) 
-            for ing in row['Best_foodentityname'].split(',') 
-            if ing.strip() != ''
-        ]
-        
-        # Process healthy types
-        healthy_types = [
-            create_node_label(ht.strip()) 
-            for ht in row['Healthy_Type'].split(',') 
-            if ht.strip() != ''
-        ]
-        
-        # Process meal types
-        meal_types = [
-            create_node_label(mt.strip()) 
-            for mt in row['meal_type'].split(',') 
-            if mt.strip() != ''
-        ]
-        
-        # Process cook_time
-        cook_time = create_node_label(row['cook_time'])
-        
-        # Process diet types
-        diet_types = [
-            create_node_label(dt.strip()) 
-            for dt in row['Diet_Types'].split(',')
-        ] if row['Diet_Types'] != UNKNOWN_PLACEHOLDER else [UNKNOWN_PLACEHOLDER]
-        
-        # Process regions
-        regions = [
-            create_node_label(rc.strip()) 
-            for rc in row['RegionPart'].split(',') 
-            if rc.strip() != ''
-        ]
-        
-        # Process countries
-        countries = [
-            create_node_label(cc.strip()) 
-            for cc in row['CountryPart'].split(',') 
-            if cc.strip() != ''
-        ]
-        
-        # Construct the recipe dictionary
-        recipes[recipe_name] = {
-            "ingredients": Best_foodentityname,
-            "diet_types": diet_types,
-            "meal_type": meal_types,
-            "cook_time": cook_time,
-            "regions": regions,
-            "countries": countries,
-            "healthy_types": healthy_types,
-        }
+    for row, recipe_name in enumerate(df['Name']):
+        recipes[recipe_name] = {key: values[row] for key, values in columns.items()}
     return recipes
 
 # Adjust the file paths as needed
-file_path = '/app/FoodRecomandationSystem/data/dataFullLargerRegionAndCountry.csv'
-triples_file_path = '/app/FoodRecomandationSystem/data/triples_df.csv'
-graph_file_path = '/app/FoodRecomandationSystem/data/graph.pkl'
-
-# Preprocess data
-recipes_df = preprocess_data(file_path)
-
-# Get unique regions, countries, ingredients
-unique_regions = get_unique_regions(recipes_df)
-unique_countries = get_unique_countries(recipes_df)
-unique_ingredients = get_unique_ingredients(recipes_df)
-
-# Create recipes dictionary
-recipes = create_recipes_dict(recipes_df)
-
-# Create the graph and triples
-G, triples_array = create_graph_and_triples(recipes)
-
-# Save triples DataFrame to CSV
-save_triples(triples_array, triples_file_path)
-
-# Save the graph
-save_graph(G, graph_file_path)
-
-# Save processed recipes_df to a CSV file
-recipes_df.to_csv('/app/FoodRecomandationSystem/data/processed_recipes_df.csv', index=False)
-
-# Save unique regions, countries, ingredients
-with open('/app/FoodRecomandationSystem/data/unique_regions.pkl', 'wb') as f:
-    pickle.dump(unique_regions, f)
-
-with open('/app/FoodRecomandationSystem/data/unique_countries.pkl', 'wb') as f:
-    pickle.dump(unique_countries, f)
-
-with open('/app/FoodRecomandationSystem/data/unique_ingredients.pkl', 'wb') as f:
-    pickle.dump(unique_ingredients, f)
-
-# Save recipes dictionary
-with open('/app/FoodRecomandationSystem/data/recipes_dict.pkl', 'wb') as f:
-    pickle.dump(recipes, f)
-
-print("Data preprocessing completed.")
+file_path = os.path.join(data_dir, 'dataFullLargerRegionAndCountry.csv')
+triples_file_path = os.path.join(data_dir, 'triples_df.csv')
+graph_file_path = os.path.join(data_dir, 'graph.pkl')
+mapped_triples_path = os.path.join(data_dir, 'triples.npy')
+entity_labels_path = os.path.join(data_dir, 'entity_labels.npy')
+relation_labels_path = os.path.join(data_dir, 'relation_labels.npy')
+processed_data_path = os.path.join(data_dir, 'processed_recipes_df.csv')
+processed_table_path = os.path.join(data_dir, 'processed_recipes.arrow')
+recipe_index_path = os.path.join(data_dir, 'recipe_info.arrow')
+recipes_dict_path = os.path.join(data_dir, 'recipes_dict.pkl')
+unique_paths = {
+    'regions': os.path.join(data_dir, 'unique_regions'),
+    'countries': os.path.join(data_dir, 'unique_countries'),
+    'ingredients': os.path.join(data_dir, 'unique_ingredients'),
+}
+
+# Function to save integer-encoded triples (memory-mappable) and their entity/relation vocabularies
+def save_mapped_triples_artifacts(mapped_triples, entity_labels, relation_labels):
+    save_mapped_triples(mapped_triples, mapped_triples_path)
+    save_labels(entity_labels, entity_labels_path)
+    save_labels(relation_labels, relation_labels_path)
+
+# Function to save the triples as CSV and as memory-mappable integer IDs with their vocabularies
+def save_triples_artifacts(triples, mapped_triples, entity_labels, relation_labels):
+    # Save triples DataFrame to CSV
+    save_triples(triples, triples_file_path)
+    save_mapped_triples_artifacts(mapped_triples, entity_labels, relation_labels)
+
+# Function to save the processed recipes, the unique vocabularies and the recipes dictionary
+def save_recipe_artifacts(recipes_df, unique_regions, unique_countries, unique_ingredients, recipes):
+    # Save processed recipes_df to a CSV file
+    recipes_df.to_csv(processed_data_path, index=False)
+    # ...and as a memory-mappable Arrow file for fast loading
+    save_recipe_table(recipes_df, processed_table_path)
+    # ...and the formatted RecipeInfo fields the API serves, memory-mapped by every worker
+    save_recipe_index(recipes_df, recipe_index_path)
+
+    # Save unique regions, countries, ingredients
+    for key, values in [('regions', unique_regions), ('countries', unique_countries), ('ingredients', unique_ingredients)]:
+        with open(unique_paths[key] + '.pkl', 'wb') as f:
+            pickle.dump(values, f)
+        save_labels(values, unique_paths[key] + '.npy')
+
+    # Save recipes dictionary
+    with open(recipes_dict_path, 'wb') as f:
+        pickle.dump(recipes, f)
+
+# Function to build and save every data artifact from the source CSV. The vocabularies, recipes
+# dict and triples are derived per chunk and merged (triples are appended to the CSV and
+# integer-encoded), so only one chunk's tokens and labeled triples are in memory at a time.
+# The processed table is still kept whole, as it is saved as one Arrow file.
+def build_artifacts(source_path=file_path, chunksize=CHUNK_SIZE, with_graph=False):
+    chunks = []
+    regions, countries, ingredients = set(), set(), set()
+    recipes = {}
+    encoder = TripleEncoder()
+    graph_triples = []
+
+    for i, (df, tokens) in enumerate(preprocess_chunks(source_path, chunksize)):
+        chunks.append(df)
+        regions.update(non_empty(tokens['RegionPart']))
+        countries.update(non_empty(tokens['CountryPart']))
+        ingredients.update(non_empty(tokens['Best_foodentityname']))
+        recipes.update(create_recipes_dict(df, tokens))
+
+        # Create the triples straight from the list tokens
+        triples = create_triples(df, tokens)
+        save_triples(triples, triples_file_path, append=i > 0)
+        encoder.add(triples)
+        if with_graph:
+            graph_triples.append(triples)
+
+    save_mapped_triples_artifacts(*encoder.finish())
+
+    # Create and save the graph (opt-in; serving never loads it)
+    if with_graph:
+        save_graph(create_graph(pd.concat(graph_triples, ignore_index=True)), graph_file_path)
+
+    save_recipe_artifacts(
+        pd.concat(chunks), get_unique_regions(regions), get_unique_countries(countries),
+        get_unique_ingredients(ingredients), recipes,
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the recipe, vocabulary and triples artifacts")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="source CSV rows read at a time")
+    parser.add_argument('--graph', action='store_true', help="also build and pickle the NetworkX graph")
+    args = parser.parse_args()
+
+    build_artifacts(file_path, args.chunksize, args.graph)
+
+    print("Data preprocessing completed.")
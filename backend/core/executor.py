@@ -0,0 +1,120 @@
+# backend/core/executor.py
+#
+# Dedicated executor for CPU-heavy scoring, kept apart from Starlette's default threadpool.
+# Admission is bounded: once INFERENCE_QUEUE_DEPTH requests are queued or running, new ones
+# are rejected right away with OverloadedError (a retryable 503) instead of piling up.
+
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import record_stage
+
+# Scoring threads per worker process
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', min(4, os.cpu_count() or 1)))
+# Requests admitted at once (running + waiting); beyond this requests get a 503
+INFERENCE_QUEUE_DEPTH = int(os.environ.get('INFERENCE_QUEUE_DEPTH', 64))
+# Requests that waited longer than this (seconds) are dropped before running: the client has
+# likely given up, and running them would only delay the requests behind them
+INFERENCE_QUEUE_TIMEOUT = float(os.environ.get('INFERENCE_QUEUE_TIMEOUT', 5))
+# BLAS/OpenMP (and torch) threads per worker process; INFERENCE_WORKERS * NATIVE_THREADS
+# should not exceed the cores given to the worker
+NATIVE_THREADS = int(os.environ.get('NATIVE_THREADS', 1))
+
+# Raised when the inference queue is full or a request waited too long in it
+class OverloadedError(RuntimeError):
+    pass
+
+# Function to cap the threads of native thread pools (OpenBLAS/MKL/OpenMP, and torch when
+# it is loaded) so concurrent requests do not oversubscribe the cores
+def limit_native_threads(num_threads=NATIVE_THREADS):
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        pass
+    else:
+        threadpool_limits(limits=num_threads)
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(num_threads)
+
+class InferenceExecutor:
+    def __init__(self, max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_DEPTH, queue_timeout=INFERENCE_QUEUE_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+
+    # Create the worker threads and pin native thread pools; called once at startup
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                limit_native_threads()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, enqueued, fn, args, kwargs):
+        waited = time.monotonic() - enqueued
+        record_stage('queue_wait', waited)
+        if waited > self.queue_timeout:
+            with self._lock:
+                self.expired += 1
+            raise OverloadedError("Request waited too long for an inference worker")
+        return fn(*args, **kwargs)
+
+    # Release the admission slot of a job once it has finished or was cancelled before running
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            if not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    # Run fn(*args, **kwargs) on an inference thread, or raise OverloadedError when the queue is full.
+    # The slot is held by the job, not by the awaiting request: a request cancelled (e.g. by a client
+    # disconnect) while its job is already running keeps the slot until the job finishes.
+    async def run(self, fn, *args, **kwargs):
+        self.start()
+        with self._lock:
+            if self.in_flight >= self.max_queue:
+                self.rejected += 1
+                raise OverloadedError("Too many requests in the inference queue")
+            self.in_flight += 1
+        call = functools.partial(self._call, time.monotonic(), fn, args, kwargs)
+        # Run in a copy of the caller's context, so stage timers reach the request's profile
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, call)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        # Cancelling the wrapper cancels the job if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'expired': self.expired,
+            }
+
+# Shared by the routers of this worker process
+inference_executor = InferenceExecutor()
@@ -0,0 +1,34 @@
+# backend/core/export_embeddings.py
+#
+# Offline step: writes only what serving needs from the trained pipeline result
+# (entity/relation embeddings, quaternion table and label-to-ID maps).
+# Usage: python -m core.export_embeddings [--model-file ...] [--output-dir ...] [--precision float32|float16|int8]
+
+import argparse
+import os
+import pickle
+from .artifacts import extract_model_embeddings, save_embedding_artifacts, load_recipe_names, embedding_dir, model_file, data_dir
+from .quantization import EMBEDDING_PRECISIONS
+
+# Processed recipe table; its recipe rows are also exported in serving order
+processed_table_path = os.path.join(data_dir, 'processed_recipes.arrow')
+
+# Function to export the serving embeddings of a pickled PyKEEN pipeline result
+def export_embeddings(model_path, output_dir, precision='float32', table_path=processed_table_path):
+    with open(model_path, 'rb') as f:
+        result = pickle.load(f)
+    embeddings = extract_model_embeddings(result.model, result.training)
+    save_embedding_artifacts(embeddings, output_dir, precision, load_recipe_names(table_path))
+    return embeddings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export inference-only QuatE embeddings")
+    parser.add_argument('--model-file', default=model_file)
+    parser.add_argument('--output-dir', default=embedding_dir)
+    parser.add_argument('--precision', choices=EMBEDDING_PRECISIONS, default='float32',
+                        help="storage of the entity embeddings (int8 uses one scale per entity)")
+    args = parser.parse_args()
+
+    embeddings = export_embeddings(args.model_file, args.output_dir, args.precision)
+    print(f"Exported {len(embeddings['entity_to_id'])} entity and "
+          f"{len(embeddings['relation_to_id'])} relation embeddings to {args.output_dir}")
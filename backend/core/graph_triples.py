@@ -6,74 +6,152 @@ import pickle
 import pandas as pd
 from .utils import UNKNOWN_PLACEHOLDER
 
-def create_graph_and_triples(recipes):
+# Processed list columns, the recipes dict key they map to and the relation they produce,
+# in the order the triples of one recipe are emitted
+LIST_COLUMN_RELATIONS = [
+    ('Best_foodentityname', 'ingredients', 'contains'),
+    ('Diet_Types', 'diet_types', 'hasDietType'),
+    ('meal_type', 'meal_type', 'isForMealType'),
+    ('cook_time', 'cook_time', 'needTimeToCook'),
+    ('RegionPart', 'regions', 'isFromRegion'),
+    ('CountryPart', 'countries', 'isFromCountry'),
+    ('Healthy_Type', 'healthy_types', None),  # relation depends on the healthy type, see below
+]
+
+# Function to generalize healthy types to HasProteinLevel, HasCarbLevel, etc. (first match wins)
+def classify_healthy_types(elements):
+    contains = lambda part: elements.str.contains(part, regex=False)
+    conditions = [
+        contains('protein'),
+        contains('carb'),
+        contains('fat') & ~contains('saturated'),
+        contains('saturated_fat'),
+        contains('calorie'),
+        contains('sodium'),
+        contains('sugar'),
+        contains('fiber'),
+        contains('cholesterol'),
+    ]
+    relations = [
+        'HasProteinLevel',
+        'HasCarbLevel',
+        'HasFatLevel',
+        'HasSaturatedFatLevel',
+        'HasCalorieLevel',
+        'HasSodiumLevel',
+        'HasSugarLevel',
+        'HasFiberLevel',
+        'HasCholesterolLevel',
+    ]
+    # For other health attributes
+    return np.select(conditions, relations, default='HasHealthAttribute')
+
+# Function to build the labeled triples straight from the processed recipes and their list tokens.
+# Returns a DataFrame with Head, Relation, Tail and the tail's node type.
+def create_triples(df, tokens):
+    # Like the recipes dict, a recipe name seen twice keeps the facts of its last row
+    # but the position of its first row
+    names = df['Name']
+    name_order = pd.Series(pd.factorize(names)[0], index=df.index)
+    kept_rows = df.index[~names.duplicated(keep='last')]
+
+    parts = []
+    for column_order, (column, node_type, relation) in enumerate(LIST_COLUMN_RELATIONS):
+        elements = df['cook_time'] if column == 'cook_time' else tokens[column]
+        elements = elements[elements.index.isin(kept_rows)]
+        elements = elements[(elements != UNKNOWN_PLACEHOLDER) & (elements != '')]
+
+        part = pd.DataFrame({
+            'row': elements.index,
+            'column_order': column_order,
+            'Head': names.loc[elements.index].to_numpy(),
+            'Tail': elements.to_numpy(),
+        })
+        if relation is None:
+            part['Relation'] = classify_healthy_types(elements).tolist()
+            part['node_type'] = part['Relation']
+        else:
+            part['Relation'] = relation
+            part['node_type'] = node_type
+        part['name_order'] = name_order.loc[elements.index].to_numpy()
+        parts.append(part)
+
+    triples = pd.concat(parts, ignore_index=True)
+    # Stable sort keeps the token order within each column
+    triples = triples.sort_values(['name_order', 'column_order'], kind='stable', ignore_index=True)
+    return triples[['Head', 'Relation', 'Tail', 'node_type']]
+
+# Function to integer-encode labeled triples into (head, relation, tail) IDs plus vocabularies.
+# IDs follow sorted label order, which is the order PyKEEN's TriplesFactory assigns.
+def encode_triples(triples):
+    entity_ids, entity_labels = pd.factorize(
+        np.concatenate([triples['Head'].to_numpy(), triples['Tail'].to_numpy()]), sort=True
+    )
+    relation_ids, relation_labels = pd.factorize(triples['Relation'].to_numpy(), sort=True)
+    num_triples = len(triples)
+    mapped_triples = np.stack(
+        [entity_ids[:num_triples], relation_ids, entity_ids[num_triples:]], axis=1
+    ).astype(np.int32)
+    return mapped_triples, list(entity_labels), list(relation_labels)
+
+# Integer-encodes labeled triples chunk by chunk, so only the IDs of earlier chunks are kept.
+# finish() renumbers the IDs in sorted label order, giving the same result as encode_triples.
+class TripleEncoder:
+    def __init__(self):
+        self.entity_ids = {}
+        self.relation_ids = {}
+        self.chunks = []
+
+    # Function to map labels to IDs, giving unseen labels the next free ID
+    @staticmethod
+    def _encode(labels, ids):
+        codes, uniques = pd.factorize(np.asarray(labels, dtype=object))
+        unique_ids = np.array([ids.setdefault(label, len(ids)) for label in uniques], dtype=np.int64)
+        return unique_ids[codes]
+
+    def add(self, triples):
+        self.chunks.append(np.stack([
+            self._encode(triples['Head'], self.entity_ids),
+            self._encode(triples['Relation'], self.relation_ids),
+            self._encode(triples['Tail'], self.entity_ids),
+        ], axis=1).astype(np.int32))
+
+    def finish(self):
+        entity_labels, entity_remap = self._sorted(self.entity_ids)
+        relation_labels, relation_remap = self._sorted(self.relation_ids)
+        mapped_triples = np.concatenate(self.chunks) if self.chunks else np.zeros((0, 3), dtype=np.int32)
+        mapped_triples = np.stack([
+            entity_remap[mapped_triples[:, 0]],
+            relation_remap[mapped_triples[:, 1]],
+            entity_remap[mapped_triples[:, 2]],
+        ], axis=1).astype(np.int32)
+        return mapped_triples, entity_labels, relation_labels
+
+    # Function to get the labels in sorted order and the first-seen ID -> sorted ID mapping
+    @staticmethod
+    def _sorted(ids):
+        labels = np.array(list(ids), dtype=object)
+        order = np.argsort(labels.astype(str), kind='stable')
+        remap = np.empty(len(labels), dtype=np.int64)
+        remap[order] = np.arange(len(labels))
+        return labels[order].tolist(), remap
+
+# Function to build the NetworkX graph of the triples (opt-in; serving never loads it)
+def create_graph(triples):
     G = nx.Graph()
-    triples = []
-
-    for recipe, details in recipes.items():
-        G.add_node(recipe, type='recipe')
-        for relation_type, elements in details.items():
-            if isinstance(elements, list):  # Handle lists
-                for element in elements:
-                    if element != UNKNOWN_PLACEHOLDER and element != '':
-                        if relation_type == 'healthy_types':
-                            # Generalize the relation to HasProteinLevel, HasCarbLevel, etc.
-                            if 'protein' in element:
-                                relation = 'HasProteinLevel'
-                            elif 'carb' in element:
-                                relation = 'HasCarbLevel'
-                            elif 'fat' in element and 'saturated' not in element:
-                                relation = 'HasFatLevel'
-                            elif 'saturated_fat' in element:
-                                relation = 'HasSaturatedFatLevel'
-                            elif 'calorie' in element:
-                                relation = 'HasCalorieLevel'
-                            elif 'sodium' in element:
-                                relation = 'HasSodiumLevel'
-                            elif 'sugar' in element:
-                                relation = 'HasSugarLevel'
-                            elif 'fiber' in element:
-                                relation = 'HasFiberLevel'
-                            elif 'cholesterol' in element:
-                                relation = 'HasCholesterolLevel'
-                            else:
-                                relation = 'HasHealthAttribute'  # For other health attributes
-                            G.add_node(element, type=relation)
-                        else:
-                            G.add_node(element, type=relation_type)
-                            relation = {
-                                'ingredients': 'contains',
-                                'diet_types': 'hasDietType',
-                                'meal_type': 'isForMealType',
-                                'cook_time': 'needTimeToCook',
-                                'regions': 'isFromRegion',
-                                'countries': 'isFromCountry',
-                            }.get(relation_type, 'hasAttribute')
-                        G.add_edge(recipe, element, relation=relation)
-                        triples.append((recipe, relation, element))
-            else:  # Handle single elements like cook_time
-                element = elements
-                if element != UNKNOWN_PLACEHOLDER and element != '':
-                    G.add_node(element, type=relation_type)
-                    relation = {
-                        'cook_time': 'needTimeToCook',
-                        'ingredients': 'contains',
-                        'diet_types': 'hasDietType',
-                        'meal_type': 'isForMealType',
-                        'regions': 'isFromRegion',
-                        'countries': 'isFromCountry',
-                    }.get(relation_type, 'hasAttribute')
-                    G.add_edge(recipe, element, relation=relation)
-                    triples.append((recipe, relation, element))
-
-    return G, np.array(triples, dtype=str)
-
-# Function to save triples to CSV
-def save_triples(triples_array, file_path):
-    # Convert the triples array into a pandas DataFrame
-    triples_df = pd.DataFrame(triples_array, columns=['Head', 'Relation', 'Tail'])
-    # Save triples DataFrame to CSV
-    triples_df.to_csv(file_path, index=False)
+    G.add_nodes_from(triples['Head'].unique(), type='recipe')
+    for node_type, tails in triples.groupby('node_type', sort=False)['Tail']:
+        G.add_nodes_from(tails.unique(), type=node_type)
+    G.add_edges_from(
+        (head, tail, {'relation': relation})
+        for head, relation, tail in triples[['Head', 'Relation', 'Tail']].itertuples(index=False)
+    )
+    return G
+
+# Function to save triples to CSV; with append, the triples are added below the existing rows
+def save_triples(triples, file_path, append=False):
+    # Save the labeled triples DataFrame to CSV
+    triples[['Head', 'Relation', 'Tail']].to_csv(file_path, index=False, mode='a' if append else 'w', header=not append)
 
 # Function to save the graph
 def save_graph(G, file_path):
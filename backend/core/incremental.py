@@ -0,0 +1,210 @@
+# backend/core/incremental.py
+#
+# Incremental artifact update: only recipes that are new or whose source row changed
+# (by Name and content hash) are reprocessed, and new entities get embeddings by an
+# inductive fold-in that leaves the trained vectors frozen.
+# Usage: python -m core.incremental [--chunksize N] [--skip-embeddings]
+
+import argparse
+import pickle
+import numpy as np
+import pandas as pd
+from .data_processing import (
+    CHUNK_SIZE, file_path, processed_table_path, mapped_triples_path, entity_labels_path,
+    relation_labels_path, recipes_dict_path, unique_paths, preprocess_data, non_empty,
+    create_recipes_dict, save_triples_artifacts, save_recipe_artifacts,
+)
+from .graph_triples import create_triples
+from .artifacts import (
+    load_recipe_table, load_recipe_names, load_labels, load_mapped_triples, load_embedding_artifacts, save_embedding_artifacts, embedding_dir,
+)
+from .utils import create_node_labels
+from .ann import build_ann_index
+from .score_tables import build_score_tables
+from .quantization import dequantize_embeddings, embedding_precision
+
+# Function to encode labels with an existing vocabulary (a list, extended in place).
+# Unseen labels are appended at the end, so existing IDs and embeddings stay valid.
+def extend_vocabulary(labels, vocabulary):
+    label_to_id = {label: i for i, label in enumerate(vocabulary)}
+    codes, uniques = pd.factorize(np.asarray(labels, dtype=object))
+    unique_ids = np.empty(len(uniques), dtype=np.int64)
+    for i, label in enumerate(uniques):
+        if label not in label_to_id:
+            label_to_id[label] = len(vocabulary)
+            vocabulary.append(label)
+        unique_ids[i] = label_to_id[label]
+    return unique_ids[codes]
+
+# Function to merge newly seen tokens into a sorted unique list
+def merge_unique(values, tokens, with_empty):
+    merged = sorted((set(values) | set(non_empty(tokens))) - {''})
+    return [''] + merged if with_empty else merged
+
+# Function to update all data artifacts in place from the source CSV.
+# Returns counts of new, changed and removed recipes and the labels of new entities.
+def update_artifacts(source_path=file_path, chunksize=CHUNK_SIZE):
+    old_df = load_recipe_table(processed_table_path, arrow_backed=False)
+    if 'content_hash' not in old_df.columns:
+        raise ValueError("The previous build has no content hashes; run a full build with core.data_processing first")
+    old_hashes = (
+        old_df.drop_duplicates(subset='Name', keep='last')
+        .set_index('Name')['content_hash']
+        .astype('UInt64')
+    )
+    source_names = set()
+
+    # Only new recipes and recipes whose raw row changed are reprocessed
+    def keep_new_or_changed(df):
+        names = create_node_labels(df['Name'])
+        source_names.update(names)
+        previous = names.map(old_hashes)
+        return (previous != df['content_hash'].astype('UInt64')).fillna(True).to_numpy(dtype=bool)
+
+    delta_df, delta_tokens = preprocess_data(source_path, chunksize, keep_rows=keep_new_or_changed)
+
+    old_names = set(old_df['Name'])
+    delta_names = set(delta_df['Name'])
+    removed_names = old_names - source_names
+    stale_names = delta_names | removed_names
+
+    # Recipe table: drop stale rows and append the reprocessed ones
+    recipes_df = pd.concat([old_df[~old_df['Name'].isin(stale_names)], delta_df], ignore_index=True)
+
+    # Triples: drop the facts of stale recipes and append the new ones
+    entity_labels = load_labels(entity_labels_path)
+    relation_labels = load_labels(relation_labels_path)
+    num_old_entities = len(entity_labels)
+    mapped_triples = np.asarray(load_mapped_triples(mapped_triples_path))
+    entity_to_id = {label: i for i, label in enumerate(entity_labels)}
+    stale_ids = [entity_to_id[name] for name in stale_names if name in entity_to_id]
+    mapped_triples = mapped_triples[~np.isin(mapped_triples[:, 0], stale_ids)]
+
+    new_triples = create_triples(delta_df, delta_tokens)
+    new_mapped = np.stack([
+        extend_vocabulary(new_triples['Head'], entity_labels),
+        extend_vocabulary(new_triples['Relation'], relation_labels),
+        extend_vocabulary(new_triples['Tail'], entity_labels),
+    ], axis=1).astype(np.int32)
+    mapped_triples = np.concatenate([mapped_triples, new_mapped])
+
+    entity_array = np.array(entity_labels, dtype=object)
+    relation_array = np.array(relation_labels, dtype=object)
+    triples = pd.DataFrame({
+        'Head': entity_array[mapped_triples[:, 0]],
+        'Relation': relation_array[mapped_triples[:, 1]],
+        'Tail': entity_array[mapped_triples[:, 2]],
+    })
+    save_triples_artifacts(triples, mapped_triples, entity_labels, relation_labels)
+
+    # Unique vocabularies only grow; recipes dictionary entries are replaced
+    unique_regions = merge_unique(load_labels(unique_paths['regions'] + '.npy'), delta_tokens['RegionPart'], True)
+    unique_countries = merge_unique(load_labels(unique_paths['countries'] + '.npy'), delta_tokens['CountryPart'], True)
+    unique_ingredients = merge_unique(load_labels(unique_paths['ingredients'] + '.npy'), delta_tokens['Best_foodentityname'], False)
+
+    with open(recipes_dict_path, 'rb') as f:
+        recipes = pickle.load(f)
+    for name in stale_names:
+        recipes.pop(name, None)
+    recipes.update(create_recipes_dict(delta_df, delta_tokens))
+
+    save_recipe_artifacts(recipes_df, unique_regions, unique_countries, unique_ingredients, recipes)
+
+    return {
+        'new': len(delta_names - old_names),
+        'changed': len(delta_names & old_names),
+        'removed': len(removed_names),
+        'new_entities': entity_labels[num_old_entities:],
+    }
+
+# Function to embed entities missing from the trained model while keeping the trained vectors frozen.
+# QuatE scores are linear in the head (and in the tail), so the embedding that best fits an entity's
+# known facts points along the sum of their query vectors; it is scaled to the median entity norm.
+# Entities only linked to other new entities are resolved in later passes.
+def fold_in_embeddings(embeddings, mapped_triples, entity_labels, relation_labels, max_passes=3):
+    trained = dequantize_embeddings(embeddings['entity_embeddings'], embeddings.get('entity_scales'))
+    entity_to_id = dict(embeddings['entity_to_id'])
+    new_labels = [label for label in entity_labels if label not in entity_to_id]
+    if not new_labels:
+        return embeddings, 0
+    for label in new_labels:
+        entity_to_id[label] = len(entity_to_id)
+
+    entity_embeddings = np.concatenate([trained, np.zeros((len(new_labels),) + trained.shape[1:], dtype=np.float32)])
+    relation_embeddings = embeddings['relation_embeddings']
+    table = embeddings['table']
+
+    # Translate the triples into embedding IDs; relations the model never saw cannot be used
+    to_embedding_id = np.array([entity_to_id[label] for label in entity_labels], dtype=np.int64)
+    to_relation_id = np.array([embeddings['relation_to_id'].get(label, -1) for label in relation_labels], dtype=np.int64)
+    heads = to_embedding_id[mapped_triples[:, 0]]
+    relations = to_relation_id[mapped_triples[:, 1]]
+    tails = to_embedding_id[mapped_triples[:, 2]]
+    known_relation = relations >= 0
+    heads, relations, tails = heads[known_relation], relations[known_relation], tails[known_relation]
+
+    pending = np.zeros(len(entity_embeddings), dtype=bool)
+    pending[len(trained):] = True
+    target_norm = np.median(np.linalg.norm(trained.reshape(len(trained), -1), axis=1))
+
+    for _ in range(max_passes):
+        directions = np.zeros_like(entity_embeddings)
+        counts = np.zeros(len(entity_embeddings), dtype=np.int64)
+
+        # New heads of facts whose tail is known: score(h) = <h, q(r, t)>
+        head_side = pending[heads] & ~pending[tails]
+        if head_side.any():
+            queries = -np.einsum(
+                'ndj,ndk,ijk->ndi',
+                relation_embeddings[relations[head_side]], entity_embeddings[tails[head_side]], table,
+            )
+            np.add.at(directions, heads[head_side], queries)
+            np.add.at(counts, heads[head_side], 1)
+
+        # New tails of facts whose head is known: score(t) = <t, p(h, r)>
+        tail_side = pending[tails] & ~pending[heads]
+        if tail_side.any():
+            queries = -np.einsum(
+                'ndi,ndj,ijk->ndk',
+                entity_embeddings[heads[tail_side]], relation_embeddings[relations[tail_side]], table,
+            )
+            np.add.at(directions, tails[tail_side], queries)
+            np.add.at(counts, tails[tail_side], 1)
+
+        resolved = np.flatnonzero(counts > 0)
+        if len(resolved) == 0:
+            break
+        norms = np.linalg.norm(directions[resolved].reshape(len(resolved), -1), axis=1)
+        entity_embeddings[resolved] = directions[resolved] / np.maximum(norms, 1e-12)[:, None, None] * target_norm
+        pending[resolved] = False
+
+    folded = int((~pending[len(trained):]).sum())
+    return {**embeddings, 'entity_embeddings': entity_embeddings, 'entity_scales': None, 'entity_to_id': entity_to_id}, folded
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Incrementally update the data and embedding artifacts")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="source CSV rows read at a time")
+    parser.add_argument('--embedding-dir', default=embedding_dir)
+    parser.add_argument('--skip-embeddings', action='store_true', help="only update the data artifacts")
+    args = parser.parse_args()
+
+    summary = update_artifacts(file_path, args.chunksize)
+    print(f"Recipes: {summary['new']} new, {summary['changed']} changed, {summary['removed']} removed; "
+          f"{len(summary['new_entities'])} new entities")
+
+    if not args.skip_embeddings:
+        stored = load_embedding_artifacts(args.embedding_dir)
+        embeddings, folded = fold_in_embeddings(
+            stored,
+            np.asarray(load_mapped_triples(mapped_triples_path)),
+            load_labels(entity_labels_path),
+            load_labels(relation_labels_path),
+        )
+        # Keep the stored precision of the entity embeddings
+        save_embedding_artifacts(
+            embeddings, args.embedding_dir, embedding_precision(stored['entity_embeddings']), load_recipe_names(processed_table_path),
+        )
+        print(f"Folded in embeddings for {folded} new entities")
+        # The similar-recipe index and the score tables cover the recipe rows, rebuild them too
+        build_ann_index(processed_table_path, args.embedding_dir)
+        build_score_tables(processed_table_path, args.embedding_dir)
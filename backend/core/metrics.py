@@ -0,0 +1,179 @@
+# backend/core/metrics.py
+#
+# In-process metrics rendered in the Prometheus text format (GET /metrics), and per-request stage
+# profiles. Pipeline code wraps its stages in `with stage('name'):`, which feeds a latency
+# histogram and, when the request asked for a profile, the request's stage breakdown.
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Let clients request a stage breakdown with the X-Profile header (returned as Server-Timing)
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', '1') == '1'
+
+# Seconds; from sub-millisecond stages up to slow artifact loads
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Every metric created here, in creation order
+_metrics = []
+
+# Function to format the label set of a sample, escaping values as the text format requires
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+# Function to format a sample value
+def _value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+class Counter:
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        position = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_value(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+# Metric whose samples are read from the owning component when rendered: collect() returns
+# [(label values, value)] for the label names, e.g. the counters kept by the caches
+class CallbackMetric:
+    def __init__(self, name, description, kind, collect, labelnames=()):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+        _metrics.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.collect():
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_value(value)}")
+        return lines
+
+# Function to render every metric in the Prometheus text exposition format
+def render_metrics():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Stage durations of one request (or one artifact load), in the order they ran
+class Profile:
+    def __init__(self):
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.stages.append((name, seconds))
+
+    # Function to add the stages of another profile, e.g. of the batch a request was scored in
+    def merge(self, other):
+        with other._lock:
+            stages = list(other.stages)
+        with self._lock:
+            self.stages.extend(stages)
+
+    # Function to sum the seconds per stage, in the order the stages first ran
+    def totals(self):
+        totals = {}
+        with self._lock:
+            for name, seconds in self.stages:
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    # Function to format the stages as a Server-Timing header value (durations in milliseconds)
+    def server_timing(self, total=None):
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.totals().items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.3f}")
+        return ', '.join(parts)
+
+_current_profile = contextvars.ContextVar('current_profile', default=None)
+
+# Function to get the profile collecting the stages of the running request, if any
+def current_profile():
+    return _current_profile.get()
+
+# Collect the stages run in this context (and in executor jobs started from it) into `profile`
+@contextmanager
+def profiling(profile):
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+# Time spent per stage of the recommendation pipeline
+STAGE_SECONDS = Histogram('recommender_stage_seconds', "Time spent per recommendation pipeline stage", ['stage'])
+
+# Function to record a stage duration measured elsewhere
+def record_stage(name, seconds, histogram=STAGE_SECONDS):
+    histogram.observe(seconds, stage=name)
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+# Time the enclosed block as one stage
+@contextmanager
+def stage(name, histogram=STAGE_SECONDS):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, histogram)
@@ -2,38 +2,36 @@
 
 import os
 import pickle
-from pykeen.pipeline import pipeline
-from pykeen.triples import TriplesFactory
-import pandas as pd
+from .artifacts import load_embedding_artifacts, extract_model_embeddings, embedding_dir, model_file, recipe_embedding_files
 
-# Load triples and create a TriplesFactory
-triples_df = pd.read_csv('/app/FoodRecomandationSystem/data/triples_df.csv')  # Adjusted file path
-triples = triples_df[['Head', 'Relation', 'Tail']].values
-triples_factory = TriplesFactory.from_labeled_triples(triples)
+# Serving reads the inference-only embeddings from embedding_dir, where core/export_embeddings.py
+# and core/train.py write them. Files whose change means a new model version (see core/registry.py)
+model_files = [model_file] + [
+    os.path.join(embedding_dir, name)
+    for name in ('entity_embeddings.npy', 'entity_scales.npy', 'relation_embeddings.npy', 'quaternion_table.npy', 'entity_labels.npy', 'relation_labels.npy')
+] + [os.path.join(embedding_dir, name) for name in recipe_embedding_files]
+# Similar-recipe index built by core/ann.py
+ann_index_path = os.path.join(embedding_dir, 'recipe_ann_index.npz')
+model_files.append(ann_index_path)
+# Precomputed score tables built by core/score_tables.py
+model_files += [os.path.join(embedding_dir, 'score_table.npy'), os.path.join(embedding_dir, 'score_table_meta.npz')]
+# Rankings of known queries written by core/precompute.py
+model_files.append(os.path.join(embedding_dir, 'precomputed_rankings.npz'))
 
-# Train the model using PyKEEN
-def train_model(triples_factory):
-    model_file = '/app/FoodRecomandationSystem/embedding/LargerDataQuatE_model.pkl'  # Adjusted file path
+# Raised when a request needs the model before it has finished loading
+class ModelNotReadyError(RuntimeError):
+    pass
+
+# Function to load the embeddings used for serving; training only happens offline (core/train.py)
+def load_serving_embeddings():
+    if os.path.exists(os.path.join(embedding_dir, 'entity_embeddings.npy')):
+        # Plain NumPy arrays: no PyKEEN, torch or triples factory needed
+        return load_embedding_artifacts(embedding_dir)
     if os.path.exists(model_file):
-        # Load the existing model
+        # Fall back to the full pickled pipeline result (needs PyKEEN installed)
         with open(model_file, 'rb') as f:
             result = pickle.load(f)
-    else:
-        # Train the model
-        result = pipeline(
-            model='QuatE',
-            training=triples_factory,
-            testing=triples_factory,
-            validation=triples_factory,
-            epochs=400,
-            stopper='early',
-        )
-        # Save the model
-        with open(model_file, 'wb') as f:
-            pickle.dump(result, f)
-    return result
-
-# Load or train the model
-result = train_model(triples_factory)
-
-print("Train complated")
\ No newline at end of file
+        return extract_model_embeddings(result.model, result.training)
+    raise FileNotFoundError(
+        f"No model found at {embedding_dir} or {model_file}; train one offline with `python -m core.train`"
+    )
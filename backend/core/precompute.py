@@ -0,0 +1,103 @@
+# backend/core/precompute.py
+#
+# Offline bulk rankings for known queries (landing page combinations and the like). Reads a JSONL
+# file of RecommendationRequest bodies, ranks their distinct criteria across a process pool and
+# writes the rankings to the key-value artifact in core/ranking_store.py, which the API serves
+# from. Run it after each model or data release; the API picks the file up on its next reload.
+# Usage: python -m core.precompute queries.jsonl [--workers 4] [--depth 500] [--chunk-size 64]
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pydantic import ValidationError
+from models.schemas import RecommendationRequest
+from .recommender import (
+    load_snapshot, current_artifact_version, request_to_criteria, batch_scoring_inputs, compute_ranking,
+    RANKING_DEPTH,
+)
+from .ranking_store import save_rankings, ranking_key, ranking_store_file
+from .executor import limit_native_threads
+from .model import embedding_dir
+
+# Queries ranked together in one batch: their criteria are deduplicated and scored in one product
+PRECOMPUTE_CHUNK_SIZE = int(os.environ.get('PRECOMPUTE_CHUNK_SIZE', 64))
+
+# Loaded once in the parent process; forked workers share its memory
+_snapshot = None
+
+# Function to read the queries of a JSONL file into {key: (criteria, depth)}: queries with the same
+# criteria are ranked once, as deep as the deepest page asked for. Invalid lines are reported and skipped.
+def read_queries(path, depth=RANKING_DEPTH):
+    queries, num_lines = {}, 0
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            num_lines += 1
+            try:
+                request = RecommendationRequest.model_validate_json(line)
+            except ValidationError as e:
+                print(f"Skipping line {line_number}: {e.error_count()} validation error(s)")
+                continue
+            criteria = request_to_criteria(request)
+            if not criteria:
+                continue
+            key = ranking_key(criteria)
+            _, previous_depth = queries.get(key, (None, 0))
+            queries[key] = (criteria, max(previous_depth, depth, request.offset + request.limit))
+    return queries, num_lines
+
+# Function to rank one chunk of (key, criteria, depth) queries in a worker process
+def rank_chunk(chunk):
+    items = [(criteria, _snapshot) for _, criteria, _ in chunk]
+    candidates, score_rows = batch_scoring_inputs(items)
+    rankings = {}
+    for (key, criteria, depth), rows in zip(chunk, candidates):
+        ranking = compute_ranking(_snapshot, criteria, depth, score_rows[_snapshot.version], rows)
+        rankings[key] = (ranking.rows, ranking.scores, ranking.total)
+    return rankings
+
+# Function to rank every query with `workers` processes (in this process for 1); returns {key: (rows, scores, total)}
+def precompute_rankings(snapshot, queries, workers=os.cpu_count(), chunk_size=PRECOMPUTE_CHUNK_SIZE):
+    global _snapshot
+    _snapshot = snapshot
+    # Sorted keys put queries sharing criteria in the same chunk, so their rows are scored once
+    ordered = [(key, *queries[key]) for key in sorted(queries)]
+    chunks = [ordered[start:start + chunk_size] for start in range(0, len(ordered), chunk_size)]
+
+    rankings = {}
+    if workers <= 1:
+        for chunk in chunks:
+            rankings.update(rank_chunk(chunk))
+        return rankings
+    # Forked workers inherit the loaded snapshot instead of each loading the artifacts again;
+    # one native thread each, the processes already use the cores
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=limit_native_threads, initargs=(1,)) as pool:
+        for chunk_rankings in pool.map(rank_chunk, chunks):
+            rankings.update(chunk_rankings)
+    return rankings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute the rankings of known recommendation queries")
+    parser.add_argument('queries', help="JSONL file, one RecommendationRequest body per line")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--depth', type=int, default=RANKING_DEPTH, help="recipes kept per query (at least the deepest requested page)")
+    parser.add_argument('--chunk-size', type=int, default=PRECOMPUTE_CHUNK_SIZE)
+    parser.add_argument('--output-dir', default=embedding_dir, help="where the API loads its embeddings from")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    snapshot = load_snapshot(current_artifact_version())
+    queries, num_lines = read_queries(args.queries, args.depth)
+    print(f"{len(queries)} distinct criteria in {num_lines} queries; artifacts loaded in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    rankings = precompute_rankings(snapshot, queries, args.workers, args.chunk_size)
+    seconds = time.perf_counter() - started
+    save_rankings(rankings, snapshot.engine, snapshot.score_table, args.output_dir)
+    size = os.path.getsize(os.path.join(args.output_dir, ranking_store_file))
+    print(f"Ranked {len(rankings)} queries in {seconds:.1f}s ({len(rankings) / max(seconds, 1e-9):.0f}/s) "
+          f"with {args.workers} workers; wrote {size / 2**20:.1f} MiB to {args.output_dir}/{ranking_store_file}")
@@ -0,0 +1,53 @@
+# backend/core/profiling.py
+#
+# Sampling profiler for a running worker: the stacks of selected threads are sampled at a fixed
+# interval and counted in the collapsed format ("outer;inner;leaf count") read by flamegraph.pl
+# and speedscope. Sampling runs in its own thread and only reads frames, so requests keep running.
+
+import collections
+import sys
+import threading
+import time
+
+# Longest profile that can be requested (seconds)
+MAX_PROFILE_SECONDS = 60
+
+# Only one profile at a time: two samplers would slow each other's threads and distort the result
+_sampling = threading.Lock()
+
+# Function to describe one frame as "function (file:line)"
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})"
+
+# Function to get the stack of a frame, outermost call first
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+# Function to sample the stacks of the threads whose name starts with thread_name_prefix (all
+# threads but the sampler when empty) every `interval` seconds. Returns (collapsed stacks, samples)
+# or None when another profile is already running.
+def sample_stacks(seconds, interval=0.005, thread_name_prefix=''):
+    if not _sampling.acquire(blocking=False):
+        return None
+    try:
+        counts = collections.Counter()
+        samples = 0
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, '')
+                if thread_id != own_id and name.startswith(thread_name_prefix):
+                    counts[f"{name};{_stack(frame)}"] += 1
+            samples += 1
+            time.sleep(interval)
+        lines = [f"{stack} {count}" for stack, count in counts.most_common()]
+        return '\n'.join(lines) + '\n', samples
+    finally:
+        _sampling.release()
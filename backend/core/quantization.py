@@ -0,0 +1,168 @@
+# backend/core/quantization.py
+#
+# Reduced-precision entity embeddings: float16, or int8 with one float32 scale per row.
+# Scoring reads the quantized rows block by block and dequantizes each block right before the
+# product, so the full float32 matrix is never materialized.
+# Usage: python -m core.quantization [--k 10] [--queries 200]
+
+import argparse
+import os
+import time
+import numpy as np
+
+EMBEDDING_PRECISIONS = ('float32', 'float16', 'int8')
+
+# Function to quantize embeddings (any shape, one row per entity) to the given precision.
+# Returns (values, scales); scales is None except for int8, where row = values * scale.
+def quantize_embeddings(embeddings, precision):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if precision == 'float32':
+        return embeddings, None
+    if precision == 'float16':
+        return embeddings.astype(np.float16), None
+    if precision == 'int8':
+        flat = embeddings.reshape(len(embeddings), -1)
+        scales = np.abs(flat).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        values = np.clip(np.rint(flat / scales[:, None]), -127, 127).astype(np.int8)
+        return values.reshape(embeddings.shape), scales.astype(np.float32)
+    raise ValueError(f"Unknown embedding precision {precision!r}, expected one of {EMBEDDING_PRECISIONS}")
+
+# Function to turn quantized embeddings back into float32
+def dequantize_embeddings(values, scales=None):
+    embeddings = np.asarray(values, dtype=np.float32)
+    if scales is not None:
+        embeddings = embeddings * np.asarray(scales, dtype=np.float32).reshape((-1,) + (1,) * (embeddings.ndim - 1))
+    return embeddings
+
+# Function to name the precision of stored embedding values
+def embedding_precision(values):
+    return {np.dtype(np.float16): 'float16', np.dtype(np.int8): 'int8'}.get(np.asarray(values[:0]).dtype, 'float32')
+
+# Row matrix of flattened embeddings kept in their stored precision. Indexing returns float32
+# rows; products are computed block by block on dequantized copies of the rows.
+class EmbeddingMatrix:
+    def __init__(self, values, scales=None, block_size=4096):
+        self.values = values.reshape(len(values), -1)
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+        self.block_size = block_size
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def precision(self):
+        return embedding_precision(self.values)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    # Rows (index, slice or index array) as float32
+    def __getitem__(self, index):
+        rows = self.values[index].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[index][..., None]
+        return rows
+
+    # New matrix holding only the given rows, still quantized
+    def take(self, rows):
+        return EmbeddingMatrix(
+            np.ascontiguousarray(self.values[rows]),
+            None if self.scales is None else self.scales[rows],
+            self.block_size,
+        )
+
+    # Function to compute queries @ matrix.T: (num_queries, width) -> (num_queries, rows),
+    # or (width,) -> (rows,)
+    def dot(self, queries):
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.values.dtype == np.float32:
+            return queries @ self.values.T
+        out = np.empty(queries.shape[:-1] + (len(self),), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block = self.values[start:start + self.block_size].astype(np.float32)
+            out[..., start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    # Function to compute the L2 norm of every row
+    def norms(self):
+        norms = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            block = self.values[start:start + self.block_size].astype(np.float32)
+            norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        if self.scales is not None:
+            norms *= self.scales
+        return norms
+
+# Function to compare rankings on quantized embeddings against full precision: queries of random
+# (relation, tail) pairs are scored by every engine and the overlap of their top-k recipes is averaged
+def benchmark_precisions(embeddings, recipe_names, pairs, k=10, num_queries=200, criteria_per_query=3, seed=0):
+    from .scoring import ScoringEngine
+    from .aggregation import aggregate_scores, top_k
+
+    rng = np.random.default_rng(seed)
+    engines = {}
+    for precision in EMBEDDING_PRECISIONS:
+        values, scales = quantize_embeddings(embeddings['entity_embeddings'], precision)
+        engines[precision] = ScoringEngine(
+            values, embeddings['relation_embeddings'], embeddings['table'],
+            embeddings['entity_to_id'], embeddings['relation_to_id'], recipe_names, entity_scales=scales,
+        )
+
+    pairs = [
+        (relation, tail) for relation, tail in pairs
+        if relation in embeddings['relation_to_id'] and tail in embeddings['entity_to_id']
+    ]
+    queries = [
+        [(pairs[i][1], pairs[i][0], 1.0) for i in rng.choice(len(pairs), min(criteria_per_query, len(pairs)), replace=False)]
+        for _ in range(num_queries)
+    ]
+
+    def rank(engine, criteria):
+        combined, survivors = aggregate_scores(engine.score(criteria), [weight for _, _, weight in criteria])
+        return top_k(combined, survivors, k)
+
+    reference = [set(rank(engines['float32'], criteria).tolist()) for criteria in queries]
+    results = []
+    for precision, engine in engines.items():
+        started = time.perf_counter()
+        ranked = [rank(engine, criteria) for criteria in queries]
+        elapsed = time.perf_counter() - started
+        overlaps = [len(expected.intersection(rows.tolist())) / max(1, len(expected)) for expected, rows in zip(reference, ranked)]
+        results.append({
+            'precision': precision,
+            'recipe_matrix_mib': engine.recipe_matrix.nbytes / 2**20,
+            'ms_per_query': elapsed * 1000 / len(queries),
+            'mean_overlap': float(np.mean(overlaps)),
+            'min_overlap': float(np.min(overlaps)),
+        })
+    return results
+
+if __name__ == '__main__':
+    from .artifacts import load_embedding_artifacts, load_recipe_table, load_mapped_triples, load_labels, embedding_dir, data_dir
+
+    parser = argparse.ArgumentParser(description="Compare top-k rankings of quantized embeddings with full precision")
+    parser.add_argument('--embedding-dir', default=embedding_dir)
+    parser.add_argument('--data-dir', default=data_dir)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    embeddings = load_embedding_artifacts(args.embedding_dir)
+    embeddings['entity_embeddings'] = dequantize_embeddings(embeddings['entity_embeddings'], embeddings['entity_scales'])
+    recipe_names = load_recipe_table(os.path.join(args.data_dir, 'processed_recipes.arrow'))['Name']
+    # Query with the (relation, tail) pairs that occur in the graph
+    entity_labels = load_labels(os.path.join(args.data_dir, 'entity_labels.npy'))
+    relation_labels = load_labels(os.path.join(args.data_dir, 'relation_labels.npy'))
+    pair_ids = np.unique(np.asarray(load_mapped_triples(os.path.join(args.data_dir, 'triples.npy')))[:, 1:], axis=0)
+    pairs = [(relation_labels[relation_id], entity_labels[tail_id]) for relation_id, tail_id in pair_ids]
+    for result in benchmark_precisions(embeddings, recipe_names, pairs, args.k, args.queries):
+        print(f"{result['precision']:>8}  {result['recipe_matrix_mib']:8.1f} MiB  {result['ms_per_query']:6.2f} ms/query  "
+              f"top-{args.k} overlap mean {result['mean_overlap']:.3f} min {result['min_overlap']:.2f}")
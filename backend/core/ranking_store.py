@@ -0,0 +1,96 @@
+# backend/core/ranking_store.py
+#
+# Precomputed rankings of known queries (written by core/precompute.py), stored as one compact
+# key-value artifact: the canonical criteria key of every query and its ranked recipe rows and
+# scores, concatenated into flat arrays. The API serves requests whose criteria match a key
+# straight from it (see recommender.cached_page).
+
+import json
+import os
+import numpy as np
+from .attribute_index import HYBRID_RETRIEVAL, HYBRID_MIN_CANDIDATES, HYBRID_MAX_FRACTION, HYBRID_UNION_MIN_SHARE
+from .artifacts import write_atomically
+from .ann import vector_fingerprint
+from .cache import criteria_key
+
+ranking_store_file = 'precomputed_rankings.npz'
+
+# Version of the stored scores: 2 normalizes candidate scores over all recipes, like the full path
+RANKING_FORMAT = 2
+
+# Function to describe the candidate selection settings; rankings computed with other settings
+# would differ from what the API computes online, so they are not served
+def retrieval_settings():
+    return f"{RANKING_FORMAT}:{HYBRID_RETRIEVAL}:{HYBRID_MIN_CANDIDATES}:{HYBRID_MAX_FRACTION}:{HYBRID_UNION_MIN_SHARE}"
+
+# Function to fingerprint what the rankings were scored with: the recipe vectors and the score
+# table in use, if any (see ScoreTable.state)
+def ranking_fingerprint(recipe_matrix, score_table):
+    table_state = 'none' if score_table is None else score_table.state()
+    return f"{vector_fingerprint(recipe_matrix)}:{table_state}"
+
+# Function to get the stored key of (tail, relation, weight) criteria, as text
+def ranking_key(criteria):
+    return json.dumps(criteria_key(criteria), separators=(',', ':'))
+
+class RankingStore:
+    def __init__(self, keys, offsets, rows, scores, totals, recipe_labels, fingerprint, settings):
+        self.index_of = {key: i for i, key in enumerate(keys)}
+        self.offsets = offsets
+        self.rows = rows
+        self.scores = scores
+        self.totals = totals
+        self.recipe_labels = np.asarray(recipe_labels, dtype=object)
+        self.fingerprint = str(fingerprint)
+        self.settings = str(settings)
+
+    def __len__(self):
+        return len(self.index_of)
+
+    # Function to get the stored (rows, scores, total) of the criteria, or None
+    def get(self, criteria):
+        i = self.index_of.get(ranking_key(criteria))
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.rows[start:end], self.scores[start:end], int(self.totals[i])
+
+    # Function to check the rankings were computed on exactly these recipe rows, vectors and score
+    # table, with the candidate selection settings of this process
+    def matches(self, recipe_matrix, recipe_labels, score_table):
+        return (
+            self.settings == retrieval_settings()
+            and len(self.recipe_labels) == len(recipe_labels)
+            and bool(np.array_equal(self.recipe_labels, recipe_labels))
+            and self.fingerprint == ranking_fingerprint(recipe_matrix, score_table)
+        )
+
+    # Function to load the stored rankings; None when there are none
+    @classmethod
+    def load(cls, directory):
+        path = os.path.join(directory, ranking_store_file)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as store:
+            return cls(
+                store['keys'].tolist(), store['offsets'], store['rows'], store['scores'], store['totals'],
+                store['recipe_labels'], store['fingerprint'], store['settings'],
+            )
+
+# Function to save {key: (rows, scores, total)} rankings computed on the engine's recipe rows
+# and the score table (None when there was none)
+def save_rankings(rankings, engine, score_table, directory):
+    keys = sorted(rankings)
+    lengths = [len(rankings[key][0]) for key in keys]
+    concat = lambda arrays, dtype: np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+    write_atomically(os.path.join(directory, ranking_store_file), lambda f: np.savez_compressed(
+        f,
+        keys=np.array(keys, dtype=str),
+        offsets=np.r_[0, np.cumsum(lengths, dtype=np.int64)],
+        rows=concat([rankings[key][0] for key in keys], np.int32),
+        scores=concat([rankings[key][1] for key in keys], np.float32),
+        totals=np.array([rankings[key][2] for key in keys], dtype=np.int64),
+        recipe_labels=np.array(engine.recipe_labels, dtype=str),
+        fingerprint=np.array(ranking_fingerprint(engine.recipe_matrix, score_table)),
+        settings=np.array(retrieval_settings()),
+    ))
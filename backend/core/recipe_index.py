@@ -0,0 +1,106 @@
+# backend/core/recipe_index.py
+
+import ast
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from .artifacts import write_atomically
+
+# Function to read a field of a recipe row, treating empty CSV cells (NaN, or null in Arrow-backed tables) as missing
+def _field(info, key, default=''):
+    value = info.get(key, default)
+    if value is None or value is pd.NA or (isinstance(value, float) and pd.isna(value)):
+        return default
+    return value
+
+# Function to turn a comma-separated label column into titled display labels
+def _titled_labels(value):
+    return [label.replace('_', ' ').title() for label in str(value).split(',') if label]
+
+# Function to flatten the stringified (possibly nested) list of image URLs
+def _parse_images(images_str):
+    if not images_str or images_str == '[]':
+        return []
+    try:
+        # Parse the string as a list of lists
+        image_urls_nested = ast.literal_eval(images_str)
+        # Flatten the nested list
+        return [url for sublist in image_urls_nested for url in (sublist if isinstance(sublist, list) else [sublist]) if url]
+    except Exception:
+        return []
+
+# Function to format one processed recipe row into the RecipeInfo fields
+def format_recipe_info(info):
+    # Nutrition facts
+    nutrition_facts = {
+        'Calories': f"{_field(info, 'Calories', 'N/A')} kcal",
+        'FatContent': f"{_field(info, 'FatContent', 'N/A')} g",
+        'CarbohydrateContent': f"{_field(info, 'CarbohydrateContent', 'N/A')} g",
+        'ProteinContent': f"{_field(info, 'ProteinContent', 'N/A')} g",
+        'FiberContent': f"{_field(info, 'FiberContent', 'N/A')} g",
+        'SugarContent': f"{_field(info, 'SugarContent', 'N/A')} g",
+        'SodiumContent': f"{_field(info, 'SodiumContent', 'N/A')} mg",
+        'CholesterolContent': f"{_field(info, 'CholesterolContent', 'N/A')} mg",
+        'SaturatedFatContent': f"{_field(info, 'SaturatedFatContent', 'N/A')} g",
+    }
+
+    return {
+        "name": info['Name'].replace('_', ' ').title(),
+        "description": _field(info, 'Description', 'N/A'),
+        "meal_type": _titled_labels(_field(info, 'meal_type')),
+        "diet_type": _titled_labels(_field(info, 'Diet_Types')),
+        "health_type": _titled_labels(_field(info, 'Healthy_Type')),
+        "region": _titled_labels(_field(info, 'RegionPart')),
+        "country": _titled_labels(_field(info, 'CountryPart')),
+        "cook_time": str(_field(info, 'cook_time')).replace('_', ' ').title(),
+        "ingredients": str(_field(info, 'ScrapedIngredients')).split(','),
+        "instructions": str(_field(info, 'RecipeInstructions')),
+        "nutrition_facts": nutrition_facts,
+        "images": _parse_images(_field(info, 'Images')),
+    }
+
+# Formatted RecipeInfo fields of every recipe, stored as one JSON document per name in an Arrow
+# table. Loaded from the file written at build time the table is memory-mapped, so the worker
+# processes share its pages instead of each holding every recipe as Python objects; a lookup is a
+# dict hit for the row and one json.loads.
+class RecipeIndex:
+    def __init__(self, table):
+        self.row_of = {name: row for row, name in enumerate(table.column('key').to_pylist())}
+        self.infos = table.column('info')
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def __contains__(self, recipe_name):
+        return recipe_name in self.row_of
+
+    # Function to get the formatted RecipeInfo fields of a recipe, or None
+    def get(self, recipe_name):
+        row = self.row_of.get(recipe_name)
+        if row is None:
+            return None
+        return json.loads(self.infos[row].as_py())
+
+    # Function to memory-map the index written by save_recipe_index
+    @classmethod
+    def load(cls, file_path):
+        return cls(feather.read_table(file_path, memory_map=True))
+
+# Function to format every recipe into a (key, info) Arrow table, keeping the first row per name
+# like the original DataFrame lookup did
+def recipe_info_table(recipes_df):
+    keys, infos = [], []
+    for info in recipes_df.drop_duplicates(subset='Name').to_dict('records'):
+        keys.append(info['Name'])
+        infos.append(json.dumps(format_recipe_info(info), separators=(',', ':')))
+    return pa.table({'key': pa.array(keys, pa.string()), 'info': pa.array(infos, pa.string())})
+
+# Function to build the name -> formatted recipe info index in memory, e.g. when no index file was written
+def build_recipe_index(recipes_df):
+    return RecipeIndex(recipe_info_table(recipes_df))
+
+# Function to save the formatted recipe index as an uncompressed Arrow IPC file the API memory-maps
+def save_recipe_index(recipes_df, file_path):
+    table = recipe_info_table(recipes_df)
+    write_atomically(file_path, lambda f: feather.write_feather(table, f, compression='uncompressed'))
@@ -1,12 +1,90 @@
 # backend/core/recommender.py
 
-from sklearn.preprocessing import MinMaxScaler
-from pykeen.predict import predict_target
-from .utils import create_node_label, UNKNOWN_PLACEHOLDER
-from .data_loading import recipes_df, recipes
-from .model import result
-import pandas as pd
-import ast
+from .utils import create_node_label
+from .data_loading import load_serving_data, data_files
+from .model import load_serving_embeddings, model_files, ann_index_path, embedding_dir
+from .ann import RecipeSimilarity, load_ann_index
+from .score_tables import ScoreTable
+from .attribute_index import AttributeIndex
+from .ranking_store import RankingStore
+from .vocabulary import build_vocabularies
+from .registry import ArtifactRegistry, artifact_version
+from .scoring import ScoringEngine
+from .aggregation import row_ranges, normalize_rows, combine_scores, top_k
+from .cache import ranking_cache, score_cache, score_range_cache, criteria_key, clear_all_caches
+from .metrics import Counter, Histogram, stage
+from collections import namedtuple
+import numpy as np
+
+# Cached rankings keep at least this many rows so later pages are served from the cache
+RANKING_DEPTH = 500
+
+# Ranked recipe rows for one criteria tuple; `complete` when every survivor is included
+Ranking = namedtuple('Ranking', ['rows', 'scores', 'total', 'complete'])
+
+# Everything a request reads, loaded together so a swap never mixes two artifact versions
+Snapshot = namedtuple('Snapshot', ['version', 'engine', 'score_table', 'attribute_index', 'similarity', 'recipe_index', 'unique_regions', 'unique_countries', 'unique_ingredients', 'vocabularies', 'precomputed'])
+
+# Time per step of loading and building a snapshot
+LOAD_SECONDS = Histogram('artifact_load_seconds', "Time spent per artifact loading step", ['stage'])
+# Rankings computed from scratch, by whether they scored all recipes or attribute candidates only
+RANKINGS = Counter('recommender_rankings_total', "Rankings computed, by scored rows", ['path'])
+# Criterion score rows by where they came from
+SCORE_ROWS = Counter('recommender_score_rows_total', "Criterion score rows fetched, by source", ['source'])
+# Ranking cache misses looked up in the precomputed rankings, by whether the criteria were stored
+PRECOMPUTED_LOOKUPS = Counter('recommender_precomputed_lookups_total', "Lookups in the precomputed rankings", ['result'])
+
+# Function to fingerprint the data and model files currently on disk
+def current_artifact_version():
+    return artifact_version(data_files + model_files)
+
+# Function to assemble a snapshot from loaded data (see data_loading.load_serving_data) and
+# embeddings: a scoring engine, attribute index and similar-recipe search over the recipe heads
+def build_snapshot(version, data, embeddings, ann_index=None, score_table=None, precomputed=None):
+    with stage('build_engine', LOAD_SECONDS):
+        engine = ScoringEngine(recipe_names=data['recipes_df']['Name'], **embeddings)
+        similarity = RecipeSimilarity(engine.recipe_matrix, engine.recipe_labels, ann_index)
+    # Precomputed criterion rows, unless they were built for other recipes or embeddings
+    if score_table is not None and not score_table.matches(engine.recipe_matrix, engine.recipe_labels):
+        score_table = None
+    # Rankings of known queries (see core/precompute.py), unless computed on other recipes, embeddings,
+    # score table or settings
+    if precomputed is not None and not precomputed.matches(engine.recipe_matrix, engine.recipe_labels, score_table):
+        precomputed = None
+    # Posting lists of the facts, over the same recipe rows as the engine
+    attribute_index = None
+    if data.get('triples') is not None:
+        triples = data['triples']
+        with stage('attribute_index', LOAD_SECONDS):
+            attribute_index = AttributeIndex.build(
+                triples['mapped_triples'], triples['entity_labels'], triples['relation_labels'], engine.recipe_labels,
+            )
+    # Typeahead indexes and precomputed list bodies (see core/vocabulary.py)
+    with stage('vocabularies', LOAD_SECONDS):
+        vocabularies = build_vocabularies(data, attribute_index)
+    return Snapshot(
+        version, engine, score_table, attribute_index, similarity, data['recipe_index'],
+        data['unique_regions'], data['unique_countries'], data['unique_ingredients'], vocabularies, precomputed,
+    )
+
+# Function to load one snapshot from the artifacts on disk
+def load_snapshot(version):
+    with stage('load_data', LOAD_SECONDS):
+        data = load_serving_data()
+    with stage('load_embeddings', LOAD_SECONDS):
+        embeddings = load_serving_embeddings()
+    with stage('load_ann_index', LOAD_SECONDS):
+        ann_index = load_ann_index(ann_index_path)
+    with stage('load_score_table', LOAD_SECONDS):
+        score_table = ScoreTable.load(embedding_dir)
+    with stage('load_precomputed', LOAD_SECONDS):
+        precomputed = RankingStore.load(embedding_dir)
+    return build_snapshot(version, data, embeddings, ann_index, score_table, precomputed)
+
+# Loaded in the background at application startup and reloaded on demand (see main.py, routers/admin.py)
+registry = ArtifactRegistry(load_snapshot, current_artifact_version)
+# Cache keys carry the version, so this only frees memory held by the previous version
+registry.add_swap_listener(lambda previous, current: clear_all_caches())
 
 # Function to map user input to criteria
 def map_user_input_to_criteria(meal_type, calories, carbs, protein, fat, diet_type, region, cook_time, ingredients, weights, country):
@@ -55,116 +133,253 @@ def map_user_input_to_criteria(meal_type, calories, carbs, protein, fat, diet_ty
 
     return criteria
 
-# Function to normalize a column of scores
-def normalize_scores(predictions):
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    predictions['normalized_score'] = scaler.fit_transform(predictions[['score']])
-    return predictions
-
-# Function to get matching recipes based on criteria
-def get_matching_recipes(criteria):
-    all_predictions = []
-
-    for tail_entity, relation, weight in criteria:
-        # Get the predictions for the current criterion
-        predicted_heads = predict_target(
-            model=result.model,
-            relation=relation,
-            tail=tail_entity,
-            triples_factory=result.training,  # Use the training triples factory
-        ).df
-
-        # Normalize the scores to ensure a balanced result
-        predicted_heads = normalize_scores(predicted_heads)
-
-        # Apply the weight to the normalized score
-        predicted_heads['weighted_score'] = predicted_heads['normalized_score'] * weight
-        all_predictions.append(predicted_heads[['head_label', 'weighted_score']])
-
-    if not all_predictions:
-        return []
-
-    # Intersect predictions for multiple criteria (strict matching)
-    merged_predictions = all_predictions[0][['head_label', 'weighted_score']]
-
-    for preds in all_predictions[1:]:
-        # Use inner join to keep only common results
-        merged_predictions = merged_predictions.merge(
-            preds[['head_label', 'weighted_score']],
-            on='head_label',
-            how='inner',
-            suffixes=('', '_y')
+# Function to map a RecommendationRequest to (tail, relation, weight) criteria; shared by the API,
+# the precompute job and the benchmarks so they all rank the same criteria for a request
+def request_to_criteria(request):
+    with stage('map_criteria'):
+        return map_user_input_to_criteria(
+            request.meal_type,
+            request.calories,
+            request.carbs,
+            request.protein,
+            request.fat,
+            request.diet_type,
+            request.region,
+            request.cook_time,
+            request.ingredients,
+            request.weights,
+            request.country
         )
 
-        # Sum weighted scores
-        if 'weighted_score_y' in merged_predictions.columns:
-            merged_predictions['weighted_score'] += merged_predictions['weighted_score_y']
-            merged_predictions = merged_predictions.drop(columns=['weighted_score_y'])
+# Function to get the normalized recipe score row of every (relation, tail) pair: precomputed rows
+# are read from the score table, other pairs come from the cache or are scored (deduplicated)
+# in one batched product
+def criterion_score_rows(snapshot, pairs):
+    score_rows, stored, missing = {}, [], []
+    for pair in dict.fromkeys(pairs):
+        if snapshot.score_table is not None and pair in snapshot.score_table:
+            stored.append(pair)
+            continue
+        row = score_cache.get((snapshot.version,) + pair)
+        if row is None:
+            missing.append(pair)
+        else:
+            score_rows[pair] = row
 
-    # Filter predictions to include only valid recipe names from the dataset
-    valid_recipe_names = set(recipes_df['Name'])
-    final_predictions_filtered = merged_predictions[merged_predictions['head_label'].isin(valid_recipe_names)]
+    SCORE_ROWS.inc(len(score_rows), source='cache')
 
-    # Sort by combined weighted score
-    final_predictions_sorted = final_predictions_filtered.sort_values(by='weighted_score', ascending=False)
+    if stored:
+        SCORE_ROWS.inc(len(stored), source='score_table')
+        with stage('score_table'):
+            score_rows.update(zip(stored, snapshot.score_table.rows(stored)))
 
-    recipe_names = final_predictions_sorted['head_label'].tolist()
+    if missing:
+        SCORE_ROWS.inc(len(missing), source='model')
+        with stage('model_scoring'):
+            fresh_rows = snapshot.engine.score([(tail, relation, 1.0) for relation, tail in missing])
+        with stage('normalize'):
+            ranges = row_ranges(fresh_rows)
+            fresh_rows = normalize_rows(fresh_rows, ranges)
+        cache_score_ranges(snapshot, missing, ranges)
+        for pair, row in zip(missing, fresh_rows):
+            row.flags.writeable = False
+            score_cache.put((snapshot.version,) + pair, row)
+            score_rows[pair] = row
+    return score_rows
 
-    return recipe_names
+# Function to remember the (lows, spans) ranges of the full score rows of the pairs
+def cache_score_ranges(snapshot, pairs, ranges):
+    lows, spans = ranges
+    for pair, low, span in zip(pairs, lows[:, 0].tolist(), spans[:, 0].tolist()):
+        score_range_cache.put((snapshot.version,) + pair, (low, span))
+
+# Function to get the (lows, spans) ranges of the raw model scores of the pairs over all recipes.
+# Pairs seen for the first time are scored on every recipe once, in one batched product.
+def criterion_score_ranges(snapshot, pairs):
+    ranges, missing = {}, []
+    for pair in dict.fromkeys(pairs):
+        score_range = score_range_cache.get((snapshot.version,) + pair)
+        if score_range is None:
+            missing.append(pair)
+        else:
+            ranges[pair] = score_range
+    if missing:
+        with stage('score_ranges'):
+            lows, spans = row_ranges(snapshot.engine.score([(tail, relation, 1.0) for relation, tail in missing]))
+        cache_score_ranges(snapshot, missing, (lows, spans))
+        ranges.update(zip(missing, zip(lows[:, 0].tolist(), spans[:, 0].tolist())))
+    lows, spans = zip(*(ranges[pair] for pair in pairs))
+    return np.array(lows, dtype=np.float32)[:, None], np.array(spans, dtype=np.float32)[:, None]
 
-# Function to fetch and format recipe information
-def fetch_recipe_info(recipe_name):
-    # Check if the recipe exists in the dataframe
-    matched_recipes = recipes_df[recipes_df['Name'] == recipe_name]
-    if matched_recipes.empty:
+# Function to get the normalized recipe score rows for the criteria; score_rows can hold rows
+# already fetched for a whole batch of requests
+def normalized_criterion_scores(snapshot, criteria, score_rows=None):
+    pairs = [(relation, tail_entity) for tail_entity, relation, _ in criteria]
+    if score_rows is None:
+        score_rows = criterion_score_rows(snapshot, pairs)
+    return np.vstack([score_rows[pair] for pair in pairs])
+
+# Function to get the candidate recipe rows that have the requested attributes (see
+# core/attribute_index.py), or None to rank the whole catalogue by embedding score
+def hybrid_candidates(snapshot, criteria):
+    if snapshot.attribute_index is None:
         return None
+    return snapshot.attribute_index.candidates(criteria)
+
+# Function to score the criteria on the candidate rows only. Rows are normalized over all recipes,
+# like on the full path, so a recipe gets the same score whichever path ranks it (precomputed
+# table rows already are; model scores use the range of their full row)
+def candidate_criterion_scores(snapshot, criteria, candidates):
+    pairs = [(relation, tail_entity) for tail_entity, relation, _ in criteria]
+    scores = np.empty((len(criteria), len(candidates)), dtype=np.float32)
+    stored = [i for i, pair in enumerate(pairs) if snapshot.score_table is not None and pair in snapshot.score_table]
+    scored = [i for i in range(len(pairs)) if i not in stored]
+    if stored:
+        scores[stored] = snapshot.score_table.rows([pairs[i] for i in stored], candidates)
+    if scored:
+        ranges = criterion_score_ranges(snapshot, [pairs[i] for i in scored])
+        scores[scored] = normalize_rows(snapshot.engine.score([criteria[i] for i in scored], candidates), ranges)
+    return scores
+
+# Function to rank the surviving recipes up to `depth` rows (all of them when depth is None).
+# With candidates (from hybrid_candidates) only those rows are scored and ranked. The total counts
+# the recipes in the ranking (see RecommendationResponse.total); scores are on the same scale on both paths.
+def compute_ranking(snapshot, criteria, depth=None, score_rows=None, candidates=None):
+    # Normalize, weight and intersect the criteria on integer recipe rows
+    weights = [weight for _, _, weight in criteria]
+    if candidates is None:
+        RANKINGS.inc(path='full')
+        normalized = normalized_criterion_scores(snapshot, criteria, score_rows)
+    else:
+        RANKINGS.inc(path='candidates')
+        with stage('candidate_scoring'):
+            normalized = candidate_criterion_scores(snapshot, criteria, candidates)
+    with stage('combine'):
+        combined_scores, survivors = combine_scores(normalized, weights)
+
+    # Only order the rows up to the requested depth instead of sorting every survivor
+    with stage('top_k'):
+        ranked_rows = top_k(combined_scores, survivors, depth)
+    total = int(survivors.sum())
+    scores = combined_scores[ranked_rows]
+    if candidates is not None:
+        ranked_rows = candidates[ranked_rows]
+    return Ranking(ranked_rows, scores, total, len(ranked_rows) == total)
+
+# Function to check a ranking holds every row up to `end` (None: all rows)
+def ranking_covers(ranking, end):
+    return ranking.complete or (end is not None and end <= len(ranking.rows))
+
+# Function to cut one page (names, scores, total) out of a ranking
+def ranking_page(snapshot, ranking, offset, end):
+    ranked_rows = ranking.rows[offset:end]
+    recipe_names = snapshot.engine.recipe_labels[ranked_rows].tolist()
+    scores = ranking.scores[offset:end].tolist()
+    return recipe_names, scores, ranking.total
+
+# Function to serve a page from the ranking cache or the precomputed rankings; None when it needs scoring.
+# Cheap enough to run on the event loop before dispatching to the inference executor.
+def cached_page(criteria, limit=None, offset=0, snapshot=None):
+    if not criteria:
+        return [], [], 0
+
+    snapshot = snapshot or registry.get()
+    end = None if limit is None else offset + limit
+    ranking = ranking_cache.get((snapshot.version,) + criteria_key(criteria))
+    if ranking is None or not ranking_covers(ranking, end):
+        # Known queries are served from the precomputed rankings (see core/precompute.py)
+        ranking = precomputed_ranking(snapshot, criteria)
+    if ranking is None or not ranking_covers(ranking, end):
+        return None
+    return ranking_page(snapshot, ranking, offset, end)
+
+# Function to prepare the ranking of a batch of (criteria, snapshot) items: the attribute candidates
+# of every item, and per artifact version the full score rows of the criteria of the items without
+# candidates, fetched together (one batched product for the rows that need scoring)
+def batch_scoring_inputs(items):
+    # Requests with exact-attribute candidates only score those; the others share full score rows
+    with stage('candidates'):
+        candidates = [hybrid_candidates(snapshot, criteria) for criteria, snapshot in items]
+    pairs_by_version = {}
+    for (criteria, snapshot), rows in zip(items, candidates):
+        _, pairs = pairs_by_version.setdefault(snapshot.version, (snapshot, []))
+        if rows is None:
+            pairs.extend((relation, tail_entity) for tail_entity, relation, _ in criteria)
+    score_rows = {version: criterion_score_rows(snapshot, pairs) for version, (snapshot, pairs) in pairs_by_version.items()}
+    return candidates, score_rows
+
+# Function to get the precomputed ranking of the criteria, or None when they were not precomputed
+def precomputed_ranking(snapshot, criteria):
+    if snapshot.precomputed is None:
+        return None
+    stored = snapshot.precomputed.get(criteria)
+    PRECOMPUTED_LOOKUPS.inc(result='miss' if stored is None else 'hit')
+    if stored is None:
+        return None
+    rows, scores, total = stored
+    return Ranking(rows, scores, total, len(rows) == total)
+
+# Function to score and rank a batch of (criteria, limit, offset, snapshot) requests, caching the
+# rankings. The criteria of all requests are scored together in one product per artifact version,
+# and identical criteria are ranked once (CPU-heavy, see core/executor.py and core/batching.py).
+def computed_pages(requests):
+    candidates, score_rows = batch_scoring_inputs([(criteria, snapshot) for criteria, _, _, snapshot in requests])
+
+    pages, rankings = [], {}
+    for (criteria, limit, offset, snapshot), rows in zip(requests, candidates):
+        if not criteria:
+            pages.append(([], [], 0))
+            continue
+        end = None if limit is None else offset + limit
+        key = (snapshot.version,) + criteria_key(criteria)
+        ranking = rankings.get(key)
+        if ranking is None or not ranking_covers(ranking, end):
+            ranking = compute_ranking(snapshot, criteria, None if end is None else max(end, RANKING_DEPTH), score_rows[snapshot.version], rows)
+            ranking_cache.put(key, ranking)
+            rankings[key] = ranking
+        pages.append(ranking_page(snapshot, ranking, offset, end))
+    return pages
+
+# Function to score and rank the criteria of one request, caching the ranking
+def computed_page(criteria, limit=None, offset=0, snapshot=None):
+    return computed_pages([(criteria, limit, offset, snapshot or registry.get())])[0]
+
+# Function to rank recipes for the criteria: one page of names, their scores and the total match count.
+# Pass the snapshot to keep several calls of one request on the same artifact version.
+def rank_recipes(criteria, limit=None, offset=0, snapshot=None):
+    if not criteria:
+        return [], [], 0
+
+    snapshot = snapshot or registry.get()
+    page = cached_page(criteria, limit, offset, snapshot)
+    if page is None:
+        page = computed_page(criteria, limit, offset, snapshot)
+    return page
+
+# Function to find the recipes most similar to one or more liked recipes.
+# Returns (names, scores, missing) where missing lists the unknown input names.
+def find_similar_recipes(recipe_names, k=10, exact=False):
+    return registry.get().similarity.search(recipe_names, k, exact)
+
+# Function to get matching recipes based on criteria
+def get_matching_recipes(criteria, limit=None, offset=0):
+    recipe_names, _, _ = rank_recipes(criteria, limit, offset)
+    return recipe_names
+
+# Function to fetch formatted recipe information from the snapshot's index
+def fetch_recipe_info(recipe_name, snapshot=None):
+    return (snapshot or registry.get()).recipe_index.get(recipe_name)
 
-    info = matched_recipes.iloc[0]
-    # Process fields
-    meal_type = [mt.replace('_', ' ').title() for mt in info.get('meal_type', '').split(',') if mt]
-    diet_type = [dt.replace('_', ' ').title() for dt in info.get('Diet_Types', '').split(',') if dt]
-    health_type = [ht.replace('_', ' ').title() for ht in info.get('Healthy_Type', '').split(',') if ht]
-    region = [rc.replace('_', ' ').title() for rc in info.get('RegionPart', '').split(',') if rc]
-    country = [cc.replace('_', ' ').title() for cc in info.get('CountryPart', '').split(',') if cc]
-    cook_time = info.get('cook_time', '').replace('_', ' ').title()
-    ingredients = info.get('ScrapedIngredients', '').split(',')
-    instructions = info.get('RecipeInstructions', '')
-    # Nutrition facts
-    nutrition_facts = {
-        'Calories': f"{info.get('Calories', 'N/A')} kcal",
-        'FatContent': f"{info.get('FatContent', 'N/A')} g",
-        'CarbohydrateContent': f"{info.get('CarbohydrateContent', 'N/A')} g",
-        'ProteinContent': f"{info.get('ProteinContent', 'N/A')} g",
-        'FiberContent': f"{info.get('FiberContent', 'N/A')} g",
-        'SugarContent': f"{info.get('SugarContent', 'N/A')} g",
-        'SodiumContent': f"{info.get('SodiumContent', 'N/A')} mg",
-        'CholesterolContent': f"{info.get('CholesterolContent', 'N/A')} mg",
-        'SaturatedFatContent': f"{info.get('SaturatedFatContent', 'N/A')} g",
-    }
-    # Images
-    images = []
-    if info.get('Images') and info.get('Images') != '[]':
-        try:
-            image_urls_str = info['Images']
-            # Parse the string as a list of lists
-            image_urls_nested = ast.literal_eval(image_urls_str)
-            # Flatten the nested list
-            images = [url for sublist in image_urls_nested for url in (sublist if isinstance(sublist, list) else [sublist]) if url]
-        except Exception as e:
-            images = []
-
-    recipe_info = {
-        "name": info['Name'].replace('_', ' ').title(),
-        "description": info.get('Description', 'N/A'),
-        "meal_type": meal_type,
-        "diet_type": diet_type,
-        "health_type": health_type,
-        "region": region,
-        "country": country,
-        "cook_time": cook_time,
-        "ingredients": ingredients,
-        "instructions": instructions,
-        "nutrition_facts": nutrition_facts,
-        "images": images
-    }
-    return recipe_info
+# Function to fetch many recipes at once, optionally keeping only some fields
+def fetch_recipe_infos(recipe_names, fields=None, snapshot=None):
+    recipe_index = (snapshot or registry.get()).recipe_index
+    found, missing = {}, []
+    for recipe_name in dict.fromkeys(recipe_names):
+        info = recipe_index.get(recipe_name)
+        if info is None:
+            missing.append(recipe_name)
+        elif fields is None:
+            found[recipe_name] = info
+        else:
+            found[recipe_name] = {field: info[field] for field in fields}
+    return found, missing
@@ -0,0 +1,195 @@
+# backend/core/registry.py
+#
+# Versioned registry for the serving artifacts (data tables and embeddings). A new version is
+# loaded in the background and swapped in with a single reference assignment: new requests see
+# the new version while requests that already hold the previous one finish on it.
+
+import hashlib
+import os
+import threading
+import time
+from .model import ModelNotReadyError
+
+# Reload automatically when artifact files change (see ArtifactRegistry.watch)
+ARTIFACT_WATCH = os.environ.get('ARTIFACT_WATCH', '0') == '1'
+# Seconds without further file changes before a watched change triggers a reload
+ARTIFACT_WATCH_DEBOUNCE = float(os.environ.get('ARTIFACT_WATCH_DEBOUNCE', 2))
+
+# File events that can change an artifact (watchdog also reports opened/closed files)
+_CHANGE_EVENTS = ('created', 'modified', 'moved', 'deleted')
+
+# Function to fingerprint artifact files by path, size and modification time; rewriting any file
+# (the build scripts replace files atomically) gives a new version
+def artifact_version(file_paths):
+    digest = hashlib.sha1()
+    for file_path in sorted(file_paths):
+        if os.path.exists(file_path):
+            stat = os.stat(file_path)
+            digest.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+# Holds the current artifact snapshot. load_fn(version) builds a snapshot with a `version`
+# attribute; version_fn() returns the version currently on disk.
+class ArtifactRegistry:
+    def __init__(self, load_fn, version_fn):
+        self._load_fn = load_fn
+        self._version_fn = version_fn
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._pending = False
+        self._swap_listeners = []
+        self._timer = None
+        self._observer = None
+        self.current = None
+        self.state = 'idle'  # idle -> loading -> ready | failed; reloading while a new version loads behind a ready one
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    # Register fn(previous, current), called after every swap (e.g. to drop cached results)
+    def add_swap_listener(self, fn):
+        self._swap_listeners.append(fn)
+
+    # Start the initial load in the background; no-op while loading or once loaded
+    def start(self):
+        with self._lock:
+            if self.current is not None or self.state in ('loading', 'reloading'):
+                return
+            self._begin(force=False)
+
+    # Load the version on disk in the background and swap it in; unless forced, nothing is loaded
+    # when it is the version already served. Returns False if a load was already running, in
+    # which case another one follows it.
+    def reload(self, force=False):
+        with self._lock:
+            if self.state in ('loading', 'reloading'):
+                self._pending = True
+                return False
+            self._begin(force)
+            return True
+
+    # Called with the lock held
+    def _begin(self, force):
+        self.state = 'loading' if self.current is None else 'reloading'
+        self._done.clear()
+        threading.Thread(target=self._run, args=(force,), name='artifact-loader', daemon=True).start()
+
+    def _run(self, force):
+        while True:
+            version = self._version_fn()
+            current = self.current
+            loaded = False
+            if force or current is None or current.version != version:
+                loaded = self._load(version)
+            force = False
+
+            with self._lock:
+                # Load again if a reload was requested meanwhile or the files changed during the load
+                again = self._pending or (loaded and self._version_fn() != version)
+                self._pending = False
+                if not again:
+                    self.state = 'ready' if self.current is not None else 'failed'
+                    self._done.set()
+                    return
+
+    def _load(self, version):
+        started = time.perf_counter()
+        try:
+            snapshot = self._load_fn(version)
+        except Exception as e:
+            # A failed reload keeps serving the previous version
+            with self._lock:
+                self.error = repr(e)
+            return False
+
+        with self._lock:
+            self.error = None
+            self.load_seconds = time.perf_counter() - started
+        self.swap(snapshot)
+        return True
+
+    # Serve an already built snapshot from now on (benchmarks use this to serve synthetic data)
+    def swap(self, snapshot):
+        previous = self.current
+        # Rebinding one attribute is atomic; requests holding `previous` are unaffected
+        self.current = snapshot
+        with self._lock:
+            self.loaded_at = time.time()
+            if previous is not None:
+                self.reloads += 1
+            if self.state == 'idle':
+                self.state = 'ready'
+        for listener in self._swap_listeners:
+            listener(previous, snapshot)
+
+    # Return the current snapshot, or raise ModelNotReadyError before the first load has finished
+    def get(self):
+        snapshot = self.current
+        if snapshot is None:
+            raise ModelNotReadyError(f"Model is {self.state}")
+        return snapshot
+
+    # Block until the running load has finished (starting one if needed), for scripts and offline jobs
+    def wait(self, timeout=None):
+        self.start()
+        self._done.wait(timeout)
+        return self.get()
+
+    # Reload when files in the directories change and then stay quiet for `debounce` seconds.
+    # Uses watchdog when it is installed and polls the version otherwise.
+    def watch(self, directories, debounce=ARTIFACT_WATCH_DEBOUNCE):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            threading.Thread(target=self._poll, args=(debounce,), name='artifact-poller', daemon=True).start()
+            return
+
+        def schedule(event):
+            if event.event_type not in _CHANGE_EVENTS:
+                return
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = threading.Timer(debounce, self.reload)
+                self._timer.daemon = True
+                self._timer.start()
+
+        handler = FileSystemEventHandler()
+        handler.on_any_event = schedule
+        observer = Observer()
+        observer.daemon = True
+        for directory in directories:
+            if os.path.isdir(directory):
+                observer.schedule(handler, os.path.realpath(directory), recursive=False)
+        observer.start()
+        self._observer = observer
+
+    def _poll(self, interval):
+        while True:
+            time.sleep(interval)
+            current = self.current
+            if current is not None and self._version_fn() != current.version:
+                self.reload()
+
+    # Stop watching for file changes
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+    def status(self):
+        with self._lock:
+            current = self.current
+            return {
+                'state': self.state,
+                'version': None if current is None else current.version,
+                'error': self.error,
+                'load_seconds': self.load_seconds,
+                'loaded_at': self.loaded_at,
+                'reloads': self.reloads,
+            }
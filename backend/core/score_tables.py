@@ -0,0 +1,144 @@
+# backend/core/score_tables.py
+#
+# Precomputed score tables: the normalized recipe score row of every (relation, tail) pair seen in
+# the triples, quantized and stored as one memory-mapped matrix. Serving then reads rows of the
+# table and only evaluates the model for pairs missing from it.
+# Usage: python -m core.score_tables [--dtype uint8|float16]
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from .artifacts import write_atomically, load_recipe_table, load_embedding_artifacts, load_mapped_triples, load_labels, embedding_dir, data_dir
+from .aggregation import normalize_rows
+from .ann import vector_fingerprint
+from .scoring import ScoringEngine
+
+processed_table_path = os.path.join(data_dir, 'processed_recipes.arrow')
+mapped_triples_path = os.path.join(data_dir, 'triples.npy')
+entity_labels_path = os.path.join(data_dir, 'entity_labels.npy')
+relation_labels_path = os.path.join(data_dir, 'relation_labels.npy')
+score_table_file = 'score_table.npy'
+score_table_meta_file = 'score_table_meta.npz'
+
+# uint8 stores round(score * 255) (error <= 0.002 of the [0, 1] range); float16 keeps ~3 digits
+SCORE_TABLE_DTYPES = {'uint8': np.uint8, 'float16': np.float16}
+
+# Function to quantize normalized [0, 1] score rows
+def quantize(rows, dtype):
+    if dtype == np.uint8:
+        return np.rint(rows * 255).astype(np.uint8)
+    return rows.astype(dtype)
+
+# Normalized score rows by (relation, tail), one row per pair over the recipe rows of the engine
+class ScoreTable:
+    def __init__(self, matrix, relations, tails, recipe_labels, fingerprint):
+        self.matrix = matrix
+        self.row_of = {pair: row for row, pair in enumerate(zip(relations, tails))}
+        self.recipe_labels = np.asarray(recipe_labels, dtype=object)
+        self.fingerprint = str(fingerprint)
+        self.scale = np.float32(1 / 255) if matrix.dtype == np.uint8 else np.float32(1)
+
+    def __contains__(self, pair):
+        return pair in self.row_of
+
+    def __len__(self):
+        return len(self.row_of)
+
+    # Function to dequantize the rows of the given (relation, tail) pairs to float32, optionally
+    # only the given recipe columns
+    def rows(self, pairs, columns=None):
+        indices = [self.row_of[pair] for pair in pairs]
+        if columns is not None:
+            return self.matrix[np.ix_(indices, columns)].astype(np.float32) * self.scale
+        return self.matrix[indices].astype(np.float32) * self.scale
+
+    # Function to check the table was built on exactly these recipe rows and vectors
+    def matches(self, recipe_matrix, recipe_labels):
+        return (
+            len(self.recipe_labels) == len(recipe_labels)
+            and bool(np.array_equal(self.recipe_labels, recipe_labels))
+            and self.fingerprint == vector_fingerprint(recipe_matrix)
+        )
+
+    # Function to describe what the table serves: its precision and the pairs it holds, as
+    # results computed with a uint8 table differ from those of a float16 table or the model
+    def state(self):
+        pairs = sorted(self.row_of, key=self.row_of.get)
+        digest = hashlib.sha1(json.dumps(pairs).encode()).hexdigest()[:16]
+        return f"{self.matrix.dtype}:{len(pairs)}:{digest}"
+
+    # Function to memory-map a table; None when there is none
+    @classmethod
+    def load(cls, directory):
+        table_path = os.path.join(directory, score_table_file)
+        meta_path = os.path.join(directory, score_table_meta_file)
+        if not (os.path.exists(table_path) and os.path.exists(meta_path)):
+            return None
+        with np.load(meta_path, allow_pickle=False) as meta:
+            relations, tails = meta['relations'].tolist(), meta['tails'].tolist()
+            recipe_labels, fingerprint = meta['recipe_labels'], meta['fingerprint']
+        matrix = np.load(table_path, mmap_mode='r')
+        # Table and metadata are replaced one after the other; skip a pair that does not fit together
+        if matrix.shape != (len(relations), len(recipe_labels)):
+            return None
+        return cls(matrix, relations, tails, recipe_labels, fingerprint)
+
+# Function to list the distinct (relation, tail) pairs of the triples that the engine can score
+def triple_pairs(engine, mapped_triples, entity_labels, relation_labels):
+    pair_ids = np.unique(np.asarray(mapped_triples)[:, 1:], axis=0)
+    pairs = [(relation_labels[relation_id], entity_labels[tail_id]) for relation_id, tail_id in pair_ids]
+    return [
+        (relation, tail) for relation, tail in pairs
+        if relation in engine.relation_to_id and tail in engine.entity_to_id
+    ]
+
+# Function to score, normalize and quantize every pair into a .npy matrix, chunk by chunk so
+# memory stays bounded, then save the pair and recipe labels it was built for
+def build_score_table(engine, pairs, directory=embedding_dir, dtype='uint8', chunk_size=256):
+    dtype = SCORE_TABLE_DTYPES[dtype]
+    table_path = os.path.join(directory, score_table_file)
+    tmp_path = f"{table_path}.tmp"
+    matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(len(pairs), engine.num_recipes))
+    for start in range(0, len(pairs), chunk_size):
+        chunk = [(tail, relation, 1.0) for relation, tail in pairs[start:start + chunk_size]]
+        matrix[start:start + len(chunk)] = quantize(normalize_rows(engine.score(chunk)), dtype)
+    matrix.flush()
+    del matrix
+    # Replace the table only when it is complete (processes mapping the old one keep reading it)
+    os.replace(tmp_path, table_path)
+
+    write_atomically(os.path.join(directory, score_table_meta_file), lambda f: np.savez(
+        f,
+        relations=np.array([relation for relation, _ in pairs], dtype=str),
+        tails=np.array([tail for _, tail in pairs], dtype=str),
+        recipe_labels=np.array(engine.recipe_labels, dtype=str),
+        fingerprint=np.array(vector_fingerprint(engine.recipe_matrix)),
+    ))
+
+# Function to build the score table for the recipe table, triples and embeddings in these locations
+def build_score_tables(table_path=processed_table_path, directory=embedding_dir, dtype='uint8'):
+    recipe_names = load_recipe_table(table_path)['Name']
+    engine = ScoringEngine(recipe_names=recipe_names, **load_embedding_artifacts(directory))
+    pairs = triple_pairs(
+        engine,
+        load_mapped_triples(mapped_triples_path),
+        load_labels(entity_labels_path),
+        load_labels(relation_labels_path),
+    )
+    build_score_table(engine, pairs, directory, dtype)
+    return engine, pairs
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute quantized per-criterion recipe score tables")
+    parser.add_argument('--dtype', choices=sorted(SCORE_TABLE_DTYPES), default='uint8')
+    parser.add_argument('--embedding-dir', default=embedding_dir)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine, pairs = build_score_tables(processed_table_path, args.embedding_dir, args.dtype)
+    size = len(pairs) * engine.num_recipes * np.dtype(SCORE_TABLE_DTYPES[args.dtype]).itemsize
+    print(f"Built a {args.dtype} score table of {len(pairs)} criteria x {engine.num_recipes} recipes "
+          f"({size / 2**20:.1f} MiB) in {time.perf_counter() - started:.1f}s")
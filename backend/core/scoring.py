@@ -0,0 +1,86 @@
+# backend/core/scoring.py
+
+import numpy as np
+from .quantization import EmbeddingMatrix
+
+# Function to get the recipe heads of the graph: the labels of the distinct recipe names known to
+# the model, in table order, and their entity IDs. Row i of the recipe matrix is recipe i.
+def recipe_entities(recipe_names, entity_to_id):
+    recipe_labels = [name for name in dict.fromkeys(recipe_names) if name in entity_to_id]
+    return recipe_labels, np.array([entity_to_id[name] for name in recipe_labels], dtype=np.int64)
+
+# Scores recipe heads against (relation, tail) criteria with the QuatE embeddings.
+# The embeddings are extracted from the trained model once (see artifacts.py) and heads
+# are restricted to recipe entities, so a request with N criteria is a single
+# (num_recipes x 4*dim) @ (4*dim x N) product instead of N full-graph predict_target calls.
+# Entity embeddings stay in their stored precision (float32, float16 or int8 with entity_scales,
+# see quantization.py); only the rows being multiplied are dequantized.
+# Recipe rows exported in serving order (recipe_embeddings, see artifacts.py) are used as they are
+# stored, so worker processes memory-map the same pages instead of each copying them.
+class ScoringEngine:
+    def __init__(self, entity_embeddings, relation_embeddings, table, entity_to_id, relation_to_id, recipe_names, entity_scales=None,
+                 recipe_embeddings=None, recipe_scales=None, recipe_labels=None):
+        # entity/relation embeddings: shape (num, dim, 4); table: shape (4, 4, 4)
+        self.entity_matrix = EmbeddingMatrix(entity_embeddings, entity_scales)
+        self.relation_embeddings = np.ascontiguousarray(relation_embeddings, dtype=np.float32)
+        self.table = np.asarray(table, dtype=np.float32)
+        self.entity_to_id = entity_to_id
+        self.relation_to_id = relation_to_id
+
+        # Recipe-only head index: row i of the recipe matrix is recipe_labels[i]
+        labels, self.recipe_ids = recipe_entities(recipe_names, entity_to_id)
+        self.recipe_labels = np.array(labels, dtype=object)
+        if recipe_embeddings is not None and recipe_labels == labels:
+            self.recipe_matrix = EmbeddingMatrix(recipe_embeddings, recipe_scales)
+        else:
+            # Exported for other recipes (or not at all): copy the rows out of the entity matrix
+            self.recipe_matrix = self.entity_matrix.take(self.recipe_ids)
+
+    @property
+    def num_recipes(self):
+        return len(self.recipe_ids)
+
+    # Length of a flattened quaternion embedding (dim * 4)
+    @property
+    def embedding_width(self):
+        return self.relation_embeddings.shape[1] * 4
+
+    # Function to fold each (relation, tail) pair into a single head query vector
+    # QuatE scores are linear in the head embedding:
+    #   score(h, r, t) = -sum_{d,i} h[d,i] * sum_{j,k} r[d,j] * t[d,k] * table[i,j,k]
+    # Returns the query matrix (num_criteria, 4*dim) and a mask of criteria known to the graph.
+    def criterion_vectors(self, criteria):
+        dim = self.relation_embeddings.shape[1]
+        queries = np.zeros((len(criteria), dim, 4), dtype=np.float32)
+        known = np.zeros(len(criteria), dtype=bool)
+
+        rows, tail_ids, relation_ids = [], [], []
+        for row, (tail_entity, relation, _weight) in enumerate(criteria):
+            tail_id = self.entity_to_id.get(tail_entity)
+            relation_id = self.relation_to_id.get(relation)
+            if tail_id is None or relation_id is None:
+                continue
+            rows.append(row)
+            tail_ids.append(tail_id)
+            relation_ids.append(relation_id)
+
+        if rows:
+            queries[rows] = -np.einsum(
+                'cdj,cdk,ijk->cdi',
+                self.relation_embeddings[relation_ids],
+                self.entity_matrix[tail_ids].reshape(len(tail_ids), dim, 4),
+                self.table,
+            )
+            known[rows] = True
+        return queries.reshape(len(criteria), self.embedding_width), known
+
+    # Function to score every recipe (or only the given recipe rows) for all criteria in one batched product
+    # Returns raw scores of shape (num_criteria, num_recipes or len(rows)); unknown criteria rows are NaN.
+    def score(self, criteria, rows=None):
+        queries, known = self.criterion_vectors(criteria)
+        if rows is None:
+            scores = self.recipe_matrix.dot(queries)
+        else:
+            scores = queries @ self.recipe_matrix[rows].T
+        scores[~known] = np.nan
+        return scores
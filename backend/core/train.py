@@ -0,0 +1,265 @@
+# backend/core/train.py
+#
+# Offline QuatE training, kept out of the web process.
+# Usage: python -m core.train [--epochs 400] [--batch-size 1024] [--num-threads 8] [--checkpoint-dir ...]
+#        python -m core.train --throughput [--num-threads 16] [--batch-size 8192] [--eval-sample 2000]
+# Re-running with the same checkpoint name resumes from the last saved checkpoint.
+# --throughput trains for CPU nodes: large-batch sLCWA on a train/validation/test split, early
+# stopping on a sample of the validation triples, and epoch wall-time and triples/s reporting.
+
+import argparse
+import os
+import pickle
+import time
+import pandas as pd
+from .artifacts import (
+    load_mapped_triples, load_labels, load_recipe_names, extract_model_embeddings, save_embedding_artifacts, embedding_dir, model_file, data_dir,
+)
+from .ann import build_ann_index
+from .score_tables import build_score_tables
+from .quantization import EMBEDDING_PRECISIONS
+
+try:
+    from pykeen.training.callbacks import TrainingCallback
+except ImportError:
+    # Training needs PyKEEN; without it the module still imports (e.g. for its settings)
+    TrainingCallback = object
+
+triples_file_path = os.path.join(data_dir, 'triples_df.csv')
+mapped_triples_path = os.path.join(data_dir, 'triples.npy')
+entity_labels_path = os.path.join(data_dir, 'entity_labels.npy')
+relation_labels_path = os.path.join(data_dir, 'relation_labels.npy')
+processed_table_path = os.path.join(data_dir, 'processed_recipes.arrow')
+checkpoint_dir = os.path.join(embedding_dir, 'checkpoints')
+
+# Throughput mode defaults: large batches keep every core busy in the matrix products, a few
+# negatives per positive keep the batches informative
+THROUGHPUT_BATCH_SIZE = int(os.environ.get('TRAIN_BATCH_SIZE', 8192))
+THROUGHPUT_NEGATIVES = int(os.environ.get('TRAIN_NEGATIVES', 4))
+THROUGHPUT_LEARNING_RATE = float(os.environ.get('TRAIN_LEARNING_RATE', 0.005))
+# Training / validation / testing shares of the triples
+SPLIT_RATIOS = (0.9, 0.05, 0.05)
+# Fixed, so a resumed checkpoint continues on the same split
+SPLIT_SEED = 0
+# Validation (and final test) triples ranked per evaluation; 0 evaluates all of them
+EVALUATION_SAMPLE = int(os.environ.get('TRAIN_EVAL_SAMPLE', 2000))
+# Epochs between early-stopping evaluations, and evaluations without improvement before stopping
+EVALUATION_FREQUENCY = int(os.environ.get('TRAIN_EVAL_FREQUENCY', 10))
+EVALUATION_PATIENCE = int(os.environ.get('TRAIN_EVAL_PATIENCE', 3))
+# Triples ranked per evaluation batch. Rank-based evaluation scores every entity for each triple, so
+# this is kept apart from the training batch size; 0 lets PyKEEN find the largest that fits in memory
+EVALUATION_BATCH_SIZE = int(os.environ.get('TRAIN_EVAL_BATCH_SIZE', 0))
+
+# Function to create the TriplesFactory, from the memory-mapped integer triples when available
+def load_triples_factory():
+    import torch
+    from pykeen.triples import TriplesFactory
+
+    if os.path.exists(mapped_triples_path):
+        entity_to_id = {label: i for i, label in enumerate(load_labels(entity_labels_path))}
+        relation_to_id = {label: i for i, label in enumerate(load_labels(relation_labels_path))}
+        mapped_triples = torch.from_numpy(load_mapped_triples(mapped_triples_path).astype('int64'))
+        return TriplesFactory(mapped_triples=mapped_triples, entity_to_id=entity_to_id, relation_to_id=relation_to_id)
+    triples_df = pd.read_csv(triples_file_path)
+    triples = triples_df[['Head', 'Relation', 'Tail']].values
+    return TriplesFactory.from_labeled_triples(triples)
+
+# Function to size torch's thread pools: intra-op threads run one matrix product in parallel,
+# inter-op threads run independent operators side by side
+def configure_threads(num_threads=None, interop_threads=None):
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Only possible before torch runs its first parallel operator
+            print(f"Inter-op threads already started, keeping {torch.get_num_interop_threads()}")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+# Function to split the triples into training, validation and testing factories sharing the
+# entity/relation IDs; every entity is kept in training, so all of them get trained embeddings
+def split_triples(triples_factory, ratios=SPLIT_RATIOS, random_state=SPLIT_SEED):
+    return triples_factory.split(list(ratios), random_state=random_state)
+
+# Function to keep a random sample of num_triples triples (all of them for 0 or a smaller factory)
+def sample_triples(triples_factory, num_triples, random_state=SPLIT_SEED):
+    import torch
+
+    if not num_triples or num_triples >= triples_factory.num_triples:
+        return triples_factory
+    generator = torch.Generator().manual_seed(random_state)
+    keep = torch.randperm(triples_factory.num_triples, generator=generator)[:num_triples]
+    return triples_factory.clone_and_exchange_triples(triples_factory.mapped_triples[keep])
+
+# PyKEEN training callback printing every epoch's wall-time and training triples per second.
+# It runs before the early stopper, so the time of an evaluation is counted in the epoch after
+# it (marked "+eval"); epoch_seconds keeps the epochs without one.
+class ThroughputCallback(TrainingCallback):
+    def __init__(self, num_triples, evaluation_frequency):
+        super().__init__()
+        self.num_triples = num_triples
+        self.evaluation_frequency = evaluation_frequency
+        self.started = self.last = time.perf_counter()
+        self.epoch_seconds = []
+
+    def post_epoch(self, epoch, epoch_loss, **kwargs):
+        now = time.perf_counter()
+        seconds, self.last = now - self.last, now
+        evaluated = epoch > 1 and (epoch - 1) % self.evaluation_frequency == 0
+        if not evaluated:
+            self.epoch_seconds.append(seconds)
+        print(f"Epoch {epoch}: loss {epoch_loss:.4f}, {seconds:.1f}s{' +eval' if evaluated else ''}, "
+              f"{self.num_triples / seconds:,.0f} triples/s, {now - self.started:.0f}s elapsed", flush=True)
+
+# Train the model using PyKEEN
+def train_model(triples_factory, epochs=400, batch_size=None, num_threads=None, random_seed=None,
+                checkpoint_directory=checkpoint_dir, checkpoint_name='quate_checkpoint.pt', checkpoint_frequency=30):
+    from pykeen.pipeline import pipeline
+
+    configure_threads(num_threads)
+
+    # An existing checkpoint with the same name is loaded and training resumes from it
+    training_kwargs = dict(
+        checkpoint_directory=checkpoint_directory,
+        checkpoint_name=checkpoint_name,
+        checkpoint_frequency=checkpoint_frequency,
+        checkpoint_on_failure=True,
+    )
+    if batch_size:
+        training_kwargs['batch_size'] = batch_size
+
+    return pipeline(
+        model='QuatE',
+        training=triples_factory,
+        testing=triples_factory,
+        validation=triples_factory,
+        epochs=epochs,
+        stopper='early',
+        training_kwargs=training_kwargs,
+        random_seed=random_seed,
+    )
+
+# Train the model for CPU throughput: sLCWA with large batches and basic negative sampling on the
+# training split, early stopping on a sample of the validation split every evaluation_frequency
+# epochs, and the final evaluation on a sample of the testing split. Checkpoints also hold the
+# random state, so resuming (same name, same seed) continues the same run.
+def train_model_throughput(triples_factory, epochs=400, batch_size=THROUGHPUT_BATCH_SIZE, num_negatives=THROUGHPUT_NEGATIVES,
+                           learning_rate=THROUGHPUT_LEARNING_RATE, num_threads=None, interop_threads=None,
+                           evaluation_sample=EVALUATION_SAMPLE, evaluation_frequency=EVALUATION_FREQUENCY,
+                           patience=EVALUATION_PATIENCE, evaluation_batch_size=EVALUATION_BATCH_SIZE,
+                           random_seed=SPLIT_SEED, checkpoint_directory=checkpoint_dir,
+                           checkpoint_name='quate_throughput_checkpoint.pt', checkpoint_frequency=30):
+    from pykeen.pipeline import pipeline
+
+    threads, interop = configure_threads(num_threads, interop_threads)
+    training, validation, testing = split_triples(triples_factory)
+    print(f"{threads} intra-op / {interop} inter-op threads; {training.num_triples} training, "
+          f"{validation.num_triples} validation, {testing.num_triples} testing triples")
+
+    callback = ThroughputCallback(training.num_triples, evaluation_frequency)
+    evaluation_batch_size = evaluation_batch_size or None
+    started = time.perf_counter()
+    result = pipeline(
+        model='QuatE',
+        training=training,
+        validation=sample_triples(validation, evaluation_sample),
+        testing=sample_triples(testing, evaluation_sample),
+        training_loop='sLCWA',
+        negative_sampler='basic',
+        negative_sampler_kwargs=dict(num_negs_per_pos=num_negatives),
+        optimizer='Adam',
+        optimizer_kwargs=dict(lr=learning_rate),
+        epochs=epochs,
+        stopper='early',
+        stopper_kwargs=dict(frequency=evaluation_frequency, patience=patience, evaluation_batch_size=evaluation_batch_size),
+        evaluator_kwargs=dict(batch_size=evaluation_batch_size),
+        training_kwargs=dict(
+            batch_size=batch_size,
+            checkpoint_directory=checkpoint_directory,
+            checkpoint_name=checkpoint_name,
+            checkpoint_frequency=checkpoint_frequency,
+            checkpoint_on_failure=True,
+            callbacks=callback,
+        ),
+        random_seed=random_seed,
+    )
+
+    seconds = time.perf_counter() - started
+    if callback.epoch_seconds:
+        mean_seconds = sum(callback.epoch_seconds) / len(callback.epoch_seconds)
+        print(f"Trained {len(result.losses)} epochs in {seconds:.0f}s: {mean_seconds:.1f}s per epoch "
+              f"without evaluation, {training.num_triples / mean_seconds:,.0f} triples/s")
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the QuatE model offline")
+    parser.add_argument('--epochs', type=int, default=400)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--num-threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--interop-threads', type=int, default=None, help="torch inter-op threads (--throughput)")
+    parser.add_argument('--random-seed', type=int, default=None)
+    parser.add_argument('--throughput', action='store_true', help="CPU throughput mode (see the top of this file)")
+    parser.add_argument('--negatives', type=int, default=THROUGHPUT_NEGATIVES, help="negatives per positive (--throughput)")
+    parser.add_argument('--learning-rate', type=float, default=THROUGHPUT_LEARNING_RATE, help="Adam learning rate (--throughput)")
+    parser.add_argument('--eval-sample', type=int, default=EVALUATION_SAMPLE, help="validation triples per evaluation, 0: all (--throughput)")
+    parser.add_argument('--eval-frequency', type=int, default=EVALUATION_FREQUENCY, help="epochs between evaluations (--throughput)")
+    parser.add_argument('--patience', type=int, default=EVALUATION_PATIENCE, help="evaluations without improvement before stopping (--throughput)")
+    parser.add_argument('--eval-batch-size', type=int, default=EVALUATION_BATCH_SIZE, help="triples per evaluation batch, 0: automatic (--throughput)")
+    parser.add_argument('--checkpoint-dir', default=checkpoint_dir)
+    parser.add_argument('--checkpoint-name', default=None, help="default: quate_checkpoint.pt (quate_throughput_checkpoint.pt with --throughput)")
+    parser.add_argument('--checkpoint-frequency', type=int, default=30, help="minutes between checkpoints (0: every epoch)")
+    parser.add_argument('--fresh', action='store_true', help="discard an existing checkpoint instead of resuming")
+    parser.add_argument('--model-file', default=model_file)
+    parser.add_argument('--export-dir', default=embedding_dir, help="where to write the serving embeddings")
+    parser.add_argument('--precision', choices=EMBEDDING_PRECISIONS, default='float32', help="storage of the serving entity embeddings")
+    args = parser.parse_args()
+    if args.checkpoint_name is None:
+        args.checkpoint_name = 'quate_throughput_checkpoint.pt' if args.throughput else 'quate_checkpoint.pt'
+
+    checkpoint_path = os.path.join(args.checkpoint_dir, args.checkpoint_name)
+    if args.fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    if args.throughput:
+        result = train_model_throughput(
+            load_triples_factory(),
+            epochs=args.epochs,
+            batch_size=args.batch_size or THROUGHPUT_BATCH_SIZE,
+            num_negatives=args.negatives,
+            learning_rate=args.learning_rate,
+            num_threads=args.num_threads,
+            interop_threads=args.interop_threads,
+            evaluation_sample=args.eval_sample,
+            evaluation_frequency=args.eval_frequency,
+            patience=args.patience,
+            evaluation_batch_size=args.eval_batch_size,
+            random_seed=SPLIT_SEED if args.random_seed is None else args.random_seed,
+            checkpoint_directory=args.checkpoint_dir,
+            checkpoint_name=args.checkpoint_name,
+            checkpoint_frequency=args.checkpoint_frequency,
+        )
+    else:
+        result = train_model(
+            load_triples_factory(),
+            epochs=args.epochs,
+            batch_size=args.batch_size,
+            num_threads=args.num_threads,
+            random_seed=args.random_seed,
+            checkpoint_directory=args.checkpoint_dir,
+            checkpoint_name=args.checkpoint_name,
+            checkpoint_frequency=args.checkpoint_frequency,
+        )
+
+    # Save the full pipeline result and the inference-only embeddings used by the API
+    with open(args.model_file, 'wb') as f:
+        pickle.dump(result, f)
+    save_embedding_artifacts(
+        extract_model_embeddings(result.model, result.training), args.export_dir, args.precision, load_recipe_names(processed_table_path),
+    )
+    # The similar-recipe index and the score tables are tied to the embeddings, rebuild them too
+    build_ann_index(directory=args.export_dir)
+    build_score_tables(directory=args.export_dir)
+    print("Train complated")
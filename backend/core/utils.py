@@ -6,3 +6,20 @@ def create_node_label(label):
     if isinstance(label, str):
         return label.replace(" ", "_").replace("-", "_").replace(">", "").replace("<", "less_than_").strip().lower()
     return str(label)
+
+# Vectorized create_node_label for a pandas Series
+def create_node_labels(series):
+    try:
+        labels = (
+            series.str.replace(" ", "_", regex=False)
+            .str.replace("-", "_", regex=False)
+            .str.replace(">", "", regex=False)
+            .str.replace("<", "less_than_", regex=False)
+            .str.strip()
+            .str.lower()
+        )
+    except AttributeError:
+        # No string values at all
+        return series.astype(str)
+    # Non-string values (NaN, numbers) are stringified as-is, like create_node_label does
+    return labels.where(labels.notna(), series.astype(str))
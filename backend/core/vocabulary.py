@@ -0,0 +1,86 @@
+# backend/core/vocabulary.py
+#
+# Serving forms of the unique ingredient/region/country lists, built once per snapshot:
+# a prefix index for typeahead suggestions ranked by how many recipes use each label, and the
+# full list as a precomputed JSON body (plain and gzipped) with an ETag for conditional GETs.
+
+import gzip
+import hashlib
+import json
+from collections import namedtuple
+import numpy as np
+
+# Relation whose facts count the recipes using a label of each vocabulary
+VOCABULARY_RELATIONS = {
+    'ingredients': 'contains',
+    'regions': 'isFromRegion',
+    'countries': 'isFromCountry',
+}
+
+Vocabulary = namedtuple('Vocabulary', ['labels', 'suggest', 'body'])
+
+# Function to normalize labels and typed queries alike: "Olive_Oil " -> "olive oil"
+def suggest_key(text):
+    return ' '.join(str(text).replace('_', ' ').lower().split())
+
+# Sorted array of keys for prefix search: every label is indexed from each of its words, so
+# "oil" finds "olive_oil". Matches are ordered by recipe count, then alphabetically.
+class SuggestIndex:
+    def __init__(self, labels, counts):
+        self.labels = np.array(labels, dtype=object)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        keys, owners = [], []
+        for i, label in enumerate(labels):
+            words = suggest_key(label).split()
+            for start in range(len(words)):
+                keys.append(' '.join(words[start:]))
+                owners.append(i)
+        keys = np.array(keys, dtype=str)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.owners = np.array(owners, dtype=np.int64)[order]
+        # Labels by recipe count (descending), then alphabetically; also the answer to an empty query
+        self.by_popularity = np.lexsort((self.labels.astype(str), -self.counts)) if len(labels) else np.zeros(0, dtype=np.int64)
+        self.popularity_rank = np.empty(len(labels), dtype=np.int64)
+        self.popularity_rank[self.by_popularity] = np.arange(len(labels))
+
+    def __len__(self):
+        return len(self.labels)
+
+    # Function to order label rows like by_popularity
+    def rank(self, rows):
+        return rows[np.argsort(self.popularity_rank[rows])]
+
+    # Function to get the k best labels starting (at a word) with the query. Returns (labels, counts).
+    def suggest(self, query, k=10):
+        prefix = suggest_key(query)
+        if not prefix:
+            rows = self.by_popularity[:k]
+        else:
+            # Every key starting with the prefix sorts between the prefix and the prefix + the highest code point
+            start = np.searchsorted(self.keys, prefix, side='left')
+            end = np.searchsorted(self.keys, prefix + '\U0010ffff', side='left')
+            rows = self.rank(np.unique(self.owners[start:end]))[:k]
+        return self.labels[rows].tolist(), self.counts[rows].tolist()
+
+# Precomputed JSON response body of a static list, with its gzip encoding and entity tags
+class StaticBody:
+    def __init__(self, values):
+        self.body = json.dumps(values, separators=(',', ':')).encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        # Each encoding is a different representation, so it gets its own tag
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+# Function to build the vocabularies of a snapshot; recipe counts come from the attribute index
+# posting lists (all zero without one, leaving suggestions alphabetical)
+def build_vocabularies(data, attribute_index=None):
+    vocabularies = {}
+    for name, relation in VOCABULARY_RELATIONS.items():
+        labels = list(data[f'unique_{name}'])
+        # The '' entry of regions/countries is the "any" choice of the select boxes, not a suggestion
+        suggestible = [label for label in labels if label]
+        counts = [0 if attribute_index is None else len(attribute_index.postings(relation, label)) for label in suggestible]
+        vocabularies[name] = Vocabulary(labels, SuggestIndex(suggestible, counts), StaticBody(labels))
+    return vocabularies
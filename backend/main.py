@@ -1,12 +1,36 @@
 # backend/main.py
 
-from fastapi import FastAPI
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
 
 # Relative import statement
-from routers import recommend, recipe_info, unique_items
+from routers import recommend, recipe_info, unique_items, health, admin, similar, metrics
+from core.model import ModelNotReadyError, embedding_dir
+from core.data_loading import processed_table_path
+from core.recommender import registry
+from core.registry import ARTIFACT_WATCH
+from core.executor import inference_executor, OverloadedError
+from core.metrics import Histogram, Profile, profiling, PROFILE_HEADER
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model in the background so the worker comes up in predictable time
+    registry.start()
+    # Scoring threads with pinned BLAS/torch thread counts
+    inference_executor.start()
+    # Optionally pick up rebuilt artifacts without a restart (POST /admin/reload also works)
+    if ARTIFACT_WATCH:
+        registry.watch([os.path.dirname(processed_table_path), embedding_dir])
+    yield
+    registry.stop()
+    inference_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow all origins (adjust in production)
 app.add_middleware(
@@ -15,9 +39,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "Server-Timing"],
 )
 
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', "Time to the end of the response, by route", ['route', 'method', 'status'])
+
+# Times every request by route template (not raw path, which would give one series per recipe name).
+# Requests sent with an X-Profile header get their stage breakdown back in a Server-Timing header.
+# A plain ASGI middleware: @app.middleware("http") would run every request in an extra task.
+class RequestTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        profile = Profile() if PROFILE_HEADER and any(name == b'x-profile' for name, _ in scope['headers']) else None
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if profile is not None:
+                    MutableHeaders(scope=message).append('Server-Timing', profile.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            with profiling(profile):
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get('route')
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                route=route.path if route is not None else 'unmatched', method=scope['method'], status=status,
+            )
+
+app.add_middleware(RequestTimingMiddleware)
+
+# Requests that need the model before it is loaded get a retryable 503
+@app.exception_handler(ModelNotReadyError)
+async def model_not_ready_handler(request: Request, exc: ModelNotReadyError):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "5"})
+
+# Backpressure: a full inference queue sheds load with a retryable 503
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
 # Include routers
 app.include_router(recommend.router)
 app.include_router(recipe_info.router)
+app.include_router(similar.router)
 app.include_router(unique_items.router)
+app.include_router(health.router)
+app.include_router(admin.router)
+app.include_router(metrics.router)
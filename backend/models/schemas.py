@@ -1,7 +1,7 @@
 # backend/models/schemas.py
 
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, List, Optional, Dict
 
 class RecommendationRequest(BaseModel):
     meal_type: Optional[str] = None
@@ -15,6 +15,23 @@ class RecommendationRequest(BaseModel):
     ingredients: Optional[List[str]] = None
     country: Optional[str] = None
     weights: Dict[str, float]
+    limit: int = Field(default=20, ge=1, le=500)
+    offset: int = Field(default=0, ge=0)
+    include_scores: bool = False
+
+class RecommendationResponse(BaseModel):
+    recipes: List[str]
+    scores: Optional[List[float]] = Field(default=None, description=(
+        "Weighted sum of the per-criterion scores, each min-max normalized over the whole catalogue, "
+        "so a recipe's score does not depend on which recipes were ranked with it"
+    ))
+    total: int = Field(description=(
+        "Number of recipes in the ranking the pages are cut from. When the request's exact attributes "
+        "narrow the catalogue enough, only the recipes matching them are ranked (see HYBRID_RETRIEVAL); "
+        "otherwise every recipe the model scores for all criteria is. The same for the same request and artifacts"
+    ))
+    offset: int
+    next_offset: Optional[int] = None
 
 class RecipeInfo(BaseModel):
     name: str
@@ -29,3 +46,42 @@ class RecipeInfo(BaseModel):
     instructions: str
     nutrition_facts: Dict[str, str]
     images: List[str]
+
+class RecipeBatchRequest(BaseModel):
+    names: List[str] = Field(..., min_length=1, max_length=200)
+    # Subset of RecipeInfo fields to return (e.g. everything but "instructions"); None returns all
+    fields: Optional[List[str]] = None
+
+    @field_validator('fields')
+    @classmethod
+    def check_fields(cls, fields):
+        if fields is not None:
+            unknown = set(fields) - set(RecipeInfo.model_fields)
+            if unknown:
+                raise ValueError(f"Unknown recipe fields: {sorted(unknown)}")
+        return fields
+
+class RecipeBatchResponse(BaseModel):
+    # Formatted recipe info keyed by the requested name
+    recipes: Dict[str, Dict[str, Any]]
+    missing: List[str]
+
+class SimilarRecipesRequest(BaseModel):
+    # One recipe, or several liked recipes whose average taste is matched
+    recipes: List[str] = Field(..., min_length=1, max_length=50)
+    k: int = Field(default=10, ge=1, le=100)
+    # Scan every recipe instead of the approximate index
+    exact: bool = False
+
+class SimilarRecipesResponse(BaseModel):
+    recipes: List[str]
+    scores: List[float]
+    missing: List[str]
+
+class SuggestResponse(BaseModel):
+    field: str
+    query: str
+    # Labels starting (at a word) with the query, most used first
+    suggestions: List[str]
+    # Number of recipes using each suggested label
+    counts: List[int]
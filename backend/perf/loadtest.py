@@ -0,0 +1,128 @@
+# backend/perf/loadtest.py
+#
+# In-process load test: concurrent clients call the FastAPI app through httpx's ASGI transport
+# (no sockets, no uvicorn) with a mix of /recommend, /recommend/details, /recipe and /similar
+# requests on a synthetic catalogue. Reports p50/p95/p99 per endpoint, throughput, status codes
+# (503s are shed load) and RSS. Clients share the process with the app, so absolute numbers are
+# a lower bound on what a separate load generator would see; compare runs with each other.
+# Usage: python -m perf.loadtest [--recipes 100000 | --data-dir DIR] [--concurrency 32] [--requests 5000]
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+from urllib.parse import quote
+import httpx
+import numpy as np
+from main import app
+from core.recommender import registry
+from core.executor import inference_executor
+from core.batching import recommendation_batcher
+from .workload import add_dataset_arguments, open_dataset, random_requests, latency_summary, rss_mib, print_summaries
+
+# Share of each endpoint in the request mix
+DEFAULT_MIX = {'recommend': 0.7, 'details': 0.1, 'recipe': 0.1, 'similar': 0.1}
+
+# Function to parse a mix like "recommend=70,similar=30" into shares summing to 1
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, share = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r}, expected one of {sorted(DEFAULT_MIX)}")
+        mix[name] = float(share)
+    total = sum(mix.values())
+    return {name: share / total for name, share in mix.items()}
+
+# Function to draw the sequence of (endpoint, method, path, body) calls of a run
+def build_calls(snapshot, num_requests, mix, distinct, seed=0):
+    rng = np.random.default_rng(seed)
+    # A fixed pool of distinct bodies: repeats hit the ranking cache like popular queries do
+    bodies = random_requests(snapshot, distinct, seed)
+    names = snapshot.engine.recipe_labels
+    endpoints = rng.choice(list(mix), num_requests, p=list(mix.values()))
+    calls = []
+    for endpoint in endpoints:
+        if endpoint in ('recommend', 'details'):
+            path = '/recommend' if endpoint == 'recommend' else '/recommend/details'
+            calls.append((endpoint, 'POST', path, bodies[rng.integers(len(bodies))]))
+        elif endpoint == 'recipe':
+            calls.append((endpoint, 'GET', f"/recipe/{quote(str(rng.choice(names)))}", None))
+        else:
+            calls.append((endpoint, 'GET', f"/similar/{quote(str(rng.choice(names)))}?k=10", None))
+    return calls
+
+# Function to sample the RSS until `stop` is set; returns the samples
+async def sample_rss(stop, interval=0.1):
+    samples = [rss_mib()]
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        samples.append(rss_mib())
+    return samples
+
+# Function to replay the calls with `concurrency` clients; returns latencies and status codes per endpoint
+async def run_load(calls, concurrency):
+    latencies = collections.defaultdict(list)
+    statuses = collections.defaultdict(collections.Counter)
+    queue = collections.deque(calls)
+
+    async def client_loop(client):
+        while queue:
+            endpoint, method, path, body = queue.popleft()
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies[endpoint].append(time.perf_counter() - started)
+            statuses[endpoint][response.status_code] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://perf', timeout=60) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+    return latencies, statuses
+
+async def main(args):
+    snapshot, _ = open_dataset(args)
+    # Serve the synthetic snapshot instead of the artifacts on disk
+    registry.swap(snapshot)
+    calls = build_calls(snapshot, args.requests, args.mix, args.distinct, args.seed)
+    rss_before = rss_mib()
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(stop))
+    started = time.perf_counter()
+    latencies, statuses = await run_load(calls, args.concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    rss_samples = await sampler
+    inference_executor.shutdown()
+
+    summaries = {endpoint: latency_summary(samples) for endpoint, samples in sorted(latencies.items())}
+    summaries['all'] = latency_summary([sample for samples in latencies.values() for sample in samples])
+    print_summaries(summaries)
+    print(f"{len(calls)} requests in {elapsed:.1f}s: {len(calls) / elapsed:.0f} req/s with {args.concurrency} clients")
+    for endpoint, counts in sorted(statuses.items()):
+        print(f"  {endpoint}: " + ', '.join(f"{status} x{count}" for status, count in sorted(counts.items())))
+    print(f"RSS {rss_before:.0f} MiB before, {max(rss_samples):.0f} MiB peak, {rss_samples[-1]:.0f} MiB after")
+    print(f"Inference: {inference_executor.stats()}; batching: {recommendation_batcher.stats()}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'recipes': snapshot.engine.num_recipes,
+                'concurrency': args.concurrency,
+                'throughput_rps': len(calls) / elapsed,
+                'rss_mib': {'before': rss_before, 'peak': max(rss_samples), 'after': rss_samples[-1]},
+                'statuses': {endpoint: dict(counts) for endpoint, counts in statuses.items()},
+                'latency': summaries,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="In-process load test of the recommendation API")
+    add_dataset_arguments(parser)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=500, help="distinct /recommend bodies (fewer: more cache hits)")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help="e.g. recommend=70,details=10,recipe=10,similar=10")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,126 @@
+# backend/perf/micro.py
+#
+# Micro-benchmarks of the request path on a synthetic catalogue: app import and snapshot load
+# time, criteria mapping, model scoring, score table reads, aggregation, ranking, recipe info
+# formatting, typeahead suggestions and similar-recipe search, plus the memory held afterwards.
+# Usage: python -m perf.micro [--recipes 100000 | --data-dir DIR] [--output results.json]
+#        python -m perf.micro ... --baseline results.json [--tolerance 0.25]   (exit 1 on a regression)
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import numpy as np
+from core.recommender import (
+    request_to_criteria, compute_ranking, hybrid_candidates, cached_page, computed_page, fetch_recipe_infos,
+    RANKING_DEPTH,
+)
+from core.aggregation import normalize_rows, combine_scores, top_k
+from core.recipe_index import format_recipe_info
+from core.cache import clear_all_caches
+from core.artifacts import load_recipe_table
+from .synthetic import load_dataset
+from .workload import (
+    add_dataset_arguments, open_dataset, random_requests, parse_requests, latency_summary, time_calls,
+    rss_mib, print_summaries,
+)
+
+# Function to time `python -c "import main"` in fresh interpreters (app import, no artifacts)
+def time_app_import(repeat=3):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import main'], check=True)
+        samples.append(time.perf_counter() - started)
+    return latency_summary(samples)
+
+# Function to rank from scratch, without cached rankings or criterion rows
+def cold_ranking(snapshot, criteria):
+    clear_all_caches()
+    return compute_ranking(snapshot, criteria, RANKING_DEPTH, candidates=hybrid_candidates(snapshot, criteria))
+
+# Function to run every micro-benchmark; returns {name: latency summary}
+def run_benchmarks(snapshot, directory, num_calls=200, seed=0):
+    requests = parse_requests(random_requests(snapshot, num_calls, seed))
+    criteria = [request_to_criteria(request) for request in requests]
+    engine = snapshot.engine
+    summaries = {}
+
+    summaries['app import (subprocess)'] = time_app_import()
+    summaries['snapshot load'] = time_calls(lambda: load_dataset(directory), [()] * 3, warmup=0)
+    summaries['request_to_criteria'] = time_calls(request_to_criteria, [(r,) for r in requests])
+    summaries['model scoring (all criteria)'] = time_calls(engine.score, [(c,) for c in criteria])
+
+    if snapshot.score_table is not None:
+        pairs = [[(relation, tail) for tail, relation, _ in c if (relation, tail) in snapshot.score_table] for c in criteria]
+        summaries['score table rows'] = time_calls(snapshot.score_table.rows, [(p,) for p in pairs if p])
+
+    if snapshot.attribute_index is not None:
+        summaries['attribute candidates'] = time_calls(hybrid_candidates, [(snapshot, c) for c in criteria])
+
+    scores = [engine.score(c) for c in criteria]
+    def aggregate(raw, weights):
+        combined, survivors = combine_scores(normalize_rows(raw), weights)
+        return top_k(combined, survivors, 20)
+    summaries['normalize + combine + top 20'] = time_calls(aggregate, [(s, [w for _, _, w in c]) for s, c in zip(scores, criteria)])
+
+    summaries['ranking (cold)'] = time_calls(cold_ranking, [(snapshot, c) for c in criteria])
+    clear_all_caches()
+    for c in criteria:
+        computed_page(c, 20, 0, snapshot)
+    summaries['ranking page (cached)'] = time_calls(cached_page, [(c, 20, 0, snapshot) for c in criteria])
+
+    records = load_recipe_table(f"{directory}/processed_recipes.arrow").head(num_calls).to_dict('records')
+    summaries['format_recipe_info'] = time_calls(format_recipe_info, [(record,) for record in records])
+    names = engine.recipe_labels
+    rng = np.random.default_rng(seed)
+    pages = [(rng.choice(names, 20).tolist(), None, snapshot) for _ in range(num_calls)]
+    summaries['fetch_recipe_infos (20 names)'] = time_calls(fetch_recipe_infos, pages)
+
+    suggest = snapshot.vocabularies['ingredients'].suggest
+    prefixes = [(label[:length],) for label, length in zip(rng.choice(suggest.labels, num_calls), rng.integers(1, 6, num_calls))]
+    summaries['suggest (ingredients)'] = time_calls(suggest.suggest, prefixes)
+
+    liked = [([name],) for name in rng.choice(names, num_calls).tolist()]
+    summaries['similar recipes'] = time_calls(snapshot.similarity.search, liked)
+    summaries['similar recipes (exact)'] = time_calls(lambda names: snapshot.similarity.search(names, exact=True), liked)
+    return summaries
+
+# Function to list the benchmarks whose median got slower than the baseline by more than `tolerance`
+def find_regressions(summaries, baseline, tolerance):
+    regressions = []
+    for name, summary in summaries.items():
+        previous = baseline.get(name)
+        if previous and summary['count'] and previous.get('count') and summary['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append((name, previous['p50_ms'], summary['p50_ms']))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the recommendation request path")
+    add_dataset_arguments(parser)
+    parser.add_argument('--calls', type=int, default=200, help="timed calls per benchmark")
+    parser.add_argument('--output', help="write the results as JSON (to use as a later --baseline)")
+    parser.add_argument('--baseline', help="results JSON of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p50 slowdown against the baseline")
+    args = parser.parse_args()
+
+    snapshot, directory = open_dataset(args)
+    summaries = run_benchmarks(snapshot, directory, args.calls)
+    print_summaries(summaries)
+    pruned = sum(hybrid_candidates(snapshot, c) is not None for c in (
+        request_to_criteria(request) for request in parse_requests(random_requests(snapshot, args.calls))))
+    print(f"Attribute candidates used for {pruned} of {args.calls} requests")
+    print(f"{snapshot.engine.num_recipes} recipes, score table: {snapshot.score_table is not None}, "
+          f"ANN index: {snapshot.similarity.index is not None}, RSS {rss_mib():.0f} MiB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'recipes': snapshot.engine.num_recipes, 'rss_mib': rss_mib(), 'benchmarks': summaries}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['benchmarks']
+        regressions = find_regressions(summaries, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p50 {before:.3f} ms -> {after:.3f} ms")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,211 @@
+# backend/perf/synthetic.py
+#
+# Synthetic recipe catalogues for benchmarks: source rows in the schema of the recipe CSV, run
+# through the real processing code, plus a deterministic stand-in for the trained QuatE model.
+# Vocabularies grow with the catalogue (about 4 * sqrt(N) ingredients), so 10k to 1M recipes
+# keep realistic criterion selectivity.
+# Usage: python -m perf.synthetic --recipes 100000 --output-dir /tmp/recipes-100k [--score-table] [--ann]
+
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from core.data_processing import preprocess_chunk, non_empty, get_unique_regions, get_unique_countries, get_unique_ingredients
+from core.graph_triples import create_triples, encode_triples
+from core.artifacts import (
+    save_recipe_table, load_recipe_table, save_labels, load_labels, save_mapped_triples, load_mapped_triples,
+    save_embedding_artifacts, load_embedding_artifacts,
+)
+from core.recipe_index import RecipeIndex, save_recipe_index
+from core.ann import IVFIndex, ann_index_file, load_ann_index
+from core.score_tables import ScoreTable, build_score_table, triple_pairs
+from core.scoring import ScoringEngine
+from core.quantization import EMBEDDING_PRECISIONS
+from core.recommender import build_snapshot
+
+MEAL_TYPES = ['Breakfast', 'Lunch', 'Dinner', 'Snack', 'Dessert']
+DIET_TYPES = ['Vegan', 'Vegetarian', 'Keto', 'Paleo', 'Gluten Free', 'Unknown']
+REGIONS = ['Europe', 'Asia', 'Africa', 'North America', 'South America', 'Oceania']
+COOK_TIMES = ['less than 15 mins', '15-30 mins', '30-60 mins', 'more than 60 mins']
+# One level per nutrient; map_user_input_to_criteria asks for e.g. "low_calorie"
+NUTRIENT_LEVELS = [
+    ('low_calorie', 'high_calorie'), ('low_carb', 'high_carb'), ('low_protein', 'high_protein'),
+    ('low_fat', 'high_fat'), ('low_sodium', 'high_sodium'), ('low_sugar', 'high_sugar'),
+]
+COUNTRIES_PER_REGION = 8
+
+# Embedding width of the stand-in model (PyKEEN's QuatE default)
+STAND_IN_DIM = 100
+
+# Function to name the synthetic ingredients and countries of a catalogue of this size
+def synthetic_vocabulary(num_recipes):
+    num_ingredients = max(50, int(4 * np.sqrt(num_recipes)))
+    return {
+        'ingredients': [f"Ingredient {i}" for i in range(num_ingredients)],
+        'countries': [f"{region} Country {i}" for region in REGIONS for i in range(COUNTRIES_PER_REGION)],
+    }
+
+# Function to draw `size` distinct items per row from a Zipf-like popularity, joined by commas
+def sample_lists(rng, items, sizes):
+    weights = 1.0 / np.arange(1, len(items) + 1)
+    weights /= weights.sum()
+    picks = rng.choice(len(items), (len(sizes), sizes.max()), p=weights)
+    return [','.join(dict.fromkeys(items[i] for i in row[:size])) for row, size in zip(picks, sizes)]
+
+# Function to generate source rows (the columns of the recipe CSV) for num_recipes recipes
+def generate_recipes(num_recipes, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = synthetic_vocabulary(num_recipes)
+    ingredients = vocabulary['ingredients']
+    countries = vocabulary['countries']
+
+    region_ids = rng.integers(len(REGIONS), size=num_recipes)
+    country_ids = region_ids * COUNTRIES_PER_REGION + rng.integers(COUNTRIES_PER_REGION, size=num_recipes)
+    # About one recipe in seven has no country, like the real data
+    has_country = rng.random(num_recipes) > 1 / 7
+    levels = rng.integers(2, size=(num_recipes, len(NUTRIENT_LEVELS)))
+    calories = rng.gamma(4.0, 100.0, num_recipes).round(1)
+
+    return pd.DataFrame({
+        'Name': [f"Synthetic Recipe {i}" for i in range(num_recipes)],
+        'RecipeIngredientParts': sample_lists(rng, ingredients, rng.integers(3, 9, num_recipes)),
+        'Healthy_Type': [','.join(NUTRIENT_LEVELS[n][level] for n, level in enumerate(row)) for row in levels],
+        'meal_type': sample_lists(rng, MEAL_TYPES, rng.integers(1, 3, num_recipes)),
+        'Diet_Types': np.array(DIET_TYPES)[rng.integers(len(DIET_TYPES), size=num_recipes)],
+        'RegionPart': np.array(REGIONS)[region_ids],
+        'CountryPart': np.where(has_country, np.array(countries)[country_ids], ''),
+        'Best_foodentityname': sample_lists(rng, ingredients, rng.integers(3, 9, num_recipes)),
+        'cook_time': np.array(COOK_TIMES)[rng.integers(len(COOK_TIMES), size=num_recipes)],
+        'ScrapedIngredients': '1 cup flour,2 tbsp olive oil,1 pinch salt',
+        'RecipeInstructions': '1-) Prepare the ingredients 2-) Cook 3-) Serve',
+        'Description': 'A synthetic recipe',
+        'Images': np.where(np.arange(num_recipes) % 3 == 0, '[]', '[["https://example.com/1.jpg","https://example.com/2.jpg"]]'),
+        'Calories': calories,
+        'FatContent': (calories / 30).round(1),
+        'CarbohydrateContent': (calories / 8).round(1),
+        'ProteinContent': (calories / 20).round(1),
+        'FiberContent': rng.gamma(2.0, 2.0, num_recipes).round(1),
+        'SugarContent': rng.gamma(2.0, 5.0, num_recipes).round(1),
+        'SodiumContent': rng.gamma(3.0, 200.0, num_recipes).round(1),
+        'CholesterolContent': rng.gamma(2.0, 30.0, num_recipes).round(1),
+        'SaturatedFatContent': (calories / 90).round(1),
+    })
+
+# Function to build the QuatE quaternion multiplication table (as in PyKEEN)
+def quaternion_table():
+    table = np.zeros((4, 4, 4), dtype=np.float32)
+    for i, j, k, value in [
+        (0, 0, 0, 1), (0, 1, 1, 1), (0, 2, 2, 1), (0, 3, 3, 1),
+        (1, 0, 1, 1), (2, 0, 2, 1), (3, 0, 3, 1),
+        (1, 1, 0, -1), (2, 2, 0, -1), (3, 3, 0, -1),
+        (1, 2, 3, 1), (1, 3, 2, -1), (2, 1, 3, -1), (2, 3, 1, 1), (3, 1, 2, 1), (3, 2, 1, -1),
+    ]:
+        table[i, j, k] = value
+    return table
+
+# Function to make deterministic stand-in embeddings for the triples: random attribute entities and
+# unit-quaternion relations, and each recipe along the sum of the query vectors of its facts (the
+# fold-in of core/incremental.py) plus noise, so rankings behave like a trained model's
+def stand_in_embeddings(mapped_triples, entity_labels, relation_labels, dim=STAND_IN_DIM, seed=0, noise=0.5, chunk_size=1_000_000):
+    rng = np.random.default_rng(seed)
+    mapped_triples = np.asarray(mapped_triples)
+    table = quaternion_table()
+
+    relation_embeddings = rng.standard_normal((len(relation_labels), dim, 4)).astype(np.float32)
+    relation_embeddings /= np.linalg.norm(relation_embeddings, axis=2, keepdims=True)
+    entity_embeddings = rng.standard_normal((len(entity_labels), dim, 4)).astype(np.float32) / np.sqrt(4 * dim)
+
+    # One query vector per distinct (relation, tail) pair
+    pair_ids, pair_of_triple = np.unique(mapped_triples[:, 1:], axis=0, return_inverse=True)
+    queries = -np.einsum('ndj,ndk,ijk->ndi', relation_embeddings[pair_ids[:, 0]], entity_embeddings[pair_ids[:, 1]], table)
+    queries = queries.reshape(len(pair_ids), -1)
+
+    # Sum the queries of every head with one sort instead of a scatter-add, chunk by chunk
+    order = np.argsort(mapped_triples[:, 0], kind='stable')
+    heads, pair_of_triple = mapped_triples[order, 0], pair_of_triple.ravel()[order]
+    flat = entity_embeddings.reshape(len(entity_labels), -1)
+    start = 0
+    while start < len(heads):
+        # Extend the chunk to the end of its last head so every head is summed in one piece
+        end = int(np.searchsorted(heads, heads[min(len(heads), start + chunk_size) - 1], side='right'))
+        chunk_heads = heads[start:end]
+        starts = np.flatnonzero(np.r_[True, chunk_heads[1:] != chunk_heads[:-1]])
+        sums = np.add.reduceat(queries[pair_of_triple[start:end]], starts)
+        sums /= np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        flat[chunk_heads[starts]] = sums + noise * rng.standard_normal(sums.shape).astype(np.float32) / np.sqrt(sums.shape[1])
+        start = end
+    return {
+        'entity_embeddings': entity_embeddings,
+        'relation_embeddings': relation_embeddings,
+        'table': table,
+        'entity_to_id': {label: i for i, label in enumerate(entity_labels)},
+        'relation_to_id': {label: i for i, label in enumerate(relation_labels)},
+    }
+
+# Function to write the serving artifacts of a synthetic catalogue into one directory: the processed
+# recipe table, vocabularies, triples and stand-in embeddings, optionally with the ANN index and score table
+def build_dataset(num_recipes, directory, seed=0, dim=STAND_IN_DIM, precision='float32', score_table=False, ann=False):
+    os.makedirs(directory, exist_ok=True)
+    recipes_df, tokens = preprocess_chunk(generate_recipes(num_recipes, seed))
+    triples = create_triples(recipes_df, tokens)
+    mapped_triples, entity_labels, relation_labels = encode_triples(triples)
+
+    save_recipe_table(recipes_df, os.path.join(directory, 'processed_recipes.arrow'))
+    save_recipe_index(recipes_df, os.path.join(directory, 'recipe_info.arrow'))
+    save_labels(get_unique_regions(set(non_empty(tokens['RegionPart']))), os.path.join(directory, 'unique_regions.npy'))
+    save_labels(get_unique_countries(set(non_empty(tokens['CountryPart']))), os.path.join(directory, 'unique_countries.npy'))
+    save_labels(get_unique_ingredients(set(non_empty(tokens['Best_foodentityname']))), os.path.join(directory, 'unique_ingredients.npy'))
+    save_mapped_triples(mapped_triples, os.path.join(directory, 'triples.npy'))
+    save_labels(entity_labels, os.path.join(directory, 'entity_labels.npy'))
+    save_labels(relation_labels, os.path.join(directory, 'relation_labels.npy'))
+    save_embedding_artifacts(
+        stand_in_embeddings(mapped_triples, entity_labels, relation_labels, dim, seed), directory, precision, recipes_df['Name'],
+    )
+
+    if score_table or ann:
+        engine = ScoringEngine(recipe_names=recipes_df['Name'], **load_embedding_artifacts(directory))
+        if ann:
+            IVFIndex.build(engine.recipe_matrix, engine.recipe_labels, seed=seed).save(os.path.join(directory, ann_index_file))
+        if score_table:
+            build_score_table(engine, triple_pairs(engine, mapped_triples, entity_labels, relation_labels), directory)
+
+# Function to load a directory written by build_dataset as a serving snapshot (see core/recommender.py)
+def load_dataset(directory, version='synthetic'):
+    recipes_df = load_recipe_table(os.path.join(directory, 'processed_recipes.arrow'))
+    data = {
+        'recipes_df': recipes_df,
+        'unique_regions': load_labels(os.path.join(directory, 'unique_regions.npy')),
+        'unique_countries': load_labels(os.path.join(directory, 'unique_countries.npy')),
+        'unique_ingredients': load_labels(os.path.join(directory, 'unique_ingredients.npy')),
+        'recipe_index': RecipeIndex.load(os.path.join(directory, 'recipe_info.arrow')),
+        'triples': {
+            'mapped_triples': load_mapped_triples(os.path.join(directory, 'triples.npy')),
+            'entity_labels': load_labels(os.path.join(directory, 'entity_labels.npy')),
+            'relation_labels': load_labels(os.path.join(directory, 'relation_labels.npy')),
+        },
+    }
+    return build_snapshot(
+        version, data, load_embedding_artifacts(directory),
+        load_ann_index(os.path.join(directory, ann_index_file)), ScoreTable.load(directory),
+    )
+
+# Function to count the triples of a dataset directory
+def dataset_size(directory):
+    return len(load_mapped_triples(os.path.join(directory, 'triples.npy')))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic recipe catalogue with stand-in embeddings")
+    parser.add_argument('--recipes', type=int, default=10_000)
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dim', type=int, default=STAND_IN_DIM)
+    parser.add_argument('--precision', choices=EMBEDDING_PRECISIONS, default='float32')
+    parser.add_argument('--score-table', action='store_true', help="also precompute the score table")
+    parser.add_argument('--ann', action='store_true', help="also build the similar-recipe ANN index")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build_dataset(args.recipes, args.output_dir, args.seed, args.dim, args.precision, args.score_table, args.ann)
+    print(f"Wrote {args.recipes} recipes ({dataset_size(args.output_dir)} triples) to {args.output_dir} "
+          f"in {time.perf_counter() - started:.1f}s")
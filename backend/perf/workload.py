@@ -0,0 +1,98 @@
+# backend/perf/workload.py
+#
+# Request mixes and measurement helpers shared by the micro-benchmarks and the load test.
+
+import os
+import tempfile
+import time
+import numpy as np
+from models.schemas import RecommendationRequest
+from .synthetic import MEAL_TYPES, DIET_TYPES, COOK_TIMES, STAND_IN_DIM, build_dataset, load_dataset
+
+LEVELS = ['low', 'high']
+
+# Function to add the options selecting the dataset a benchmark runs on
+def add_dataset_arguments(parser):
+    parser.add_argument('--data-dir', help="dataset written by perf.synthetic (default: generate one)")
+    parser.add_argument('--recipes', type=int, default=10_000, help="recipes to generate without --data-dir")
+    parser.add_argument('--dim', type=int, default=STAND_IN_DIM)
+    parser.add_argument('--score-table', action='store_true', help="generate the dataset with a score table")
+    parser.add_argument('--ann', action='store_true', help="generate the dataset with an ANN index")
+
+# Function to open the dataset of the parsed options as a snapshot, generating it into a temporary
+# directory first unless --data-dir is given. Returns (snapshot, directory).
+def open_dataset(args):
+    directory = args.data_dir
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='recipes-')
+        started = time.perf_counter()
+        build_dataset(args.recipes, directory, dim=args.dim, score_table=args.score_table, ann=args.ann)
+        print(f"Generated {args.recipes} recipes in {directory} ({time.perf_counter() - started:.1f}s)")
+    return load_dataset(directory), directory
+
+# Function to make random /recommend request bodies over the vocabularies of a snapshot.
+# Every request sets a meal type and two to four other fields, like the frontend form.
+def random_requests(snapshot, num_requests, seed=0, limit=20):
+    rng = np.random.default_rng(seed)
+    regions = [region for region in snapshot.unique_regions if region]
+    countries = [country for country in snapshot.unique_countries if country]
+    ingredients = list(snapshot.unique_ingredients)
+    optional = {
+        'diet_type': lambda: str(rng.choice(DIET_TYPES[:-1])),
+        'region': lambda: str(rng.choice(regions)),
+        'country': lambda: str(rng.choice(countries)),
+        'cook_time': lambda: str(rng.choice(COOK_TIMES)),
+        'calories': lambda: str(rng.choice(LEVELS)),
+        'protein': lambda: str(rng.choice(LEVELS)),
+        'ingredients': lambda: [str(name) for name in rng.choice(ingredients, rng.integers(1, 4), replace=False)],
+    }
+    requests = []
+    for _ in range(num_requests):
+        request = {'meal_type': str(rng.choice(MEAL_TYPES)), 'weights': {}, 'limit': limit}
+        for field in rng.choice(list(optional), rng.integers(2, 5), replace=False):
+            request[field] = optional[field]()
+        requests.append(request)
+    return requests
+
+# Function to validate request bodies into RecommendationRequest models, as the API does
+def parse_requests(bodies):
+    return [RecommendationRequest.model_validate(body) for body in bodies]
+
+# Function to summarize latencies (seconds) as milliseconds
+def latency_summary(samples):
+    samples = np.asarray(samples, dtype=np.float64) * 1000
+    if len(samples) == 0:
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {'count': len(samples), 'mean_ms': samples.mean(), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': samples.max()}
+
+# Function to time fn(*args) once per argument tuple, after untimed calls on the first `warmup` tuples
+def time_calls(fn, args_list, warmup=3):
+    for args in args_list[:warmup]:
+        fn(*args)
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - started)
+    return latency_summary(samples)
+
+# Function to get the resident set size of this process in MiB (current, or peak without psutil)
+def rss_mib():
+    try:
+        import psutil
+    except ImportError:
+        import resource
+        # ru_maxrss is in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return psutil.Process(os.getpid()).memory_info().rss / 2**20
+
+# Function to print latency summaries as one aligned table
+def print_summaries(summaries):
+    print(f"{'benchmark':<36} {'calls':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    for name, summary in summaries.items():
+        if summary['count'] == 0:
+            print(f"{name:<36} {0:>6}")
+            continue
+        print(f"{name:<36} {summary['count']:>6} {summary['mean_ms']:>9.3f} {summary['p50_ms']:>9.3f} "
+              f"{summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
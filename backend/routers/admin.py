@@ -0,0 +1,55 @@
+# backend/routers/admin.py
+
+import hmac
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from core.recommender import registry
+from core.cache import cache_stats
+from core.executor import inference_executor
+from core.batching import recommendation_batcher
+from core.profiling import sample_stacks, MAX_PROFILE_SECONDS
+
+# Admin requests must send this in the X-Admin-Token header; without it the admin endpoints are closed
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Development only: set ADMIN_OPEN=1 to serve the admin endpoints without a token
+ADMIN_OPEN = os.environ.get('ADMIN_OPEN', '0') == '1'
+
+# Function to reject admin requests without the configured token
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN:
+        if not hmac.compare_digest(x_admin_token or '', ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif not ADMIN_OPEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: set ADMIN_TOKEN")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin_token)])
+
+# Load the artifacts on disk in the background and swap them in; current requests are not interrupted.
+# Unless forced, nothing is loaded when the files have not changed since the last load.
+@router.post("/reload")
+def reload_artifacts(force: bool = False):
+    started = registry.reload(force)
+    return JSONResponse({'started': started, **registry.status()}, status_code=202)
+
+@router.get("/artifacts")
+def artifact_status():
+    return {**registry.status(), 'caches': cache_stats()}
+
+@router.get("/inference")
+def inference_status():
+    return {**inference_executor.stats(), 'batching': recommendation_batcher.stats()}
+
+# Sample the stacks of the worker's threads (by default the inference threads) for a few seconds
+# and return them collapsed, ready for flamegraph.pl or speedscope
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_threads(seconds: float = 5, interval_ms: float = 5, threads: str = 'inference'):
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval_ms <= 0:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}] and interval_ms positive")
+    result = await run_in_threadpool(sample_stacks, seconds, interval_ms / 1000, threads)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    stacks, samples = result
+    return PlainTextResponse(stacks, headers={'X-Profile-Samples': str(samples)})
@@ -0,0 +1,19 @@
+# backend/routers/health.py
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from core.recommender import registry
+
+router = APIRouter()
+
+# Liveness: the process is up and serving HTTP, whether or not the model is loaded
+@router.get("/health")
+def health():
+    return {"status": "ok"}
+
+# Readiness: 200 once a model version is loaded (also while a newer one reloads behind it),
+# 503 while the first one is loading or if it failed
+@router.get("/health/ready")
+def readiness():
+    status = registry.status()
+    return JSONResponse(status, status_code=200 if status['version'] is not None else 503)
@@ -0,0 +1,43 @@
+# backend/routers/metrics.py
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from core.metrics import CallbackMetric, render_metrics
+from core.recommender import registry
+from core.cache import cache_stats
+from core.executor import inference_executor
+from core.batching import recommendation_batcher
+
+router = APIRouter()
+
+# Counters kept by the caches, executor, batcher and registry, read when /metrics is scraped
+CallbackMetric('cache_hits_total', "Cache hits", 'counter',
+               lambda: [((stats['name'],), stats['hits']) for stats in cache_stats()], ['cache'])
+CallbackMetric('cache_misses_total', "Cache misses", 'counter',
+               lambda: [((stats['name'],), stats['misses']) for stats in cache_stats()], ['cache'])
+CallbackMetric('cache_entries', "Entries held per cache", 'gauge',
+               lambda: [((stats['name'],), stats['size']) for stats in cache_stats()], ['cache'])
+
+# Function to read one field of the inference executor stats
+def executor_stat(field):
+    return lambda: [((), inference_executor.stats()[field])]
+
+CallbackMetric('inference_in_flight', "Scoring jobs queued or running", 'gauge', executor_stat('in_flight'))
+CallbackMetric('inference_completed_total', "Scoring jobs completed", 'counter', executor_stat('completed'))
+CallbackMetric('inference_rejected_total', "Scoring jobs rejected with a full queue", 'counter', executor_stat('rejected'))
+CallbackMetric('inference_expired_total', "Scoring jobs dropped after waiting too long", 'counter', executor_stat('expired'))
+CallbackMetric('batcher_batches_total', "Coalesced scoring batches", 'counter',
+               lambda: [((), recommendation_batcher.stats()['batches'])])
+CallbackMetric('batcher_requests_total', "Requests scored in coalesced batches", 'counter',
+               lambda: [((), recommendation_batcher.stats()['requests'])])
+
+CallbackMetric('artifacts_ready', "Whether a snapshot is being served", 'gauge',
+               lambda: [((), int(registry.status()['version'] is not None))])
+CallbackMetric('artifacts_load_seconds', "Duration of the last snapshot load", 'gauge',
+               lambda: [((), registry.status()['load_seconds'])])
+CallbackMetric('artifacts_reloads_total', "Snapshots swapped in after the first", 'counter',
+               lambda: [((), registry.status()['reloads'])])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,8 +1,8 @@
 # backend/routers/recipe_info.py
 
 from fastapi import APIRouter, HTTPException
-from models.schemas import RecipeInfo
-from core.recommender import fetch_recipe_info
+from models.schemas import RecipeInfo, RecipeBatchRequest, RecipeBatchResponse
+from core.recommender import fetch_recipe_info, fetch_recipe_infos
 
 router = APIRouter()
 
@@ -15,3 +15,9 @@ def get_recipe_info(recipe_name: str):
     # Convert info_dict to RecipeInfo model
     recipe_info = RecipeInfo(**info_dict)
     return recipe_info
+
+@router.post("/recipes/batch", response_model=RecipeBatchResponse)
+def get_recipe_info_batch(request: RecipeBatchRequest):
+    # Look up every requested recipe in one pass over the index
+    recipes, missing = fetch_recipe_infos(request.names, request.fields)
+    return RecipeBatchResponse(recipes=recipes, missing=missing)
@@ -1,31 +1,73 @@
 # backend/routers/recommend.py
 
+import json
 from fastapi import APIRouter
-from typing import List
-from models.schemas import RecommendationRequest
-from core.recommender import map_user_input_to_criteria, get_matching_recipes
+from fastapi.responses import StreamingResponse
+from models.schemas import RecommendationRequest, RecommendationResponse
+from core.recommender import request_to_criteria, cached_page, fetch_recipe_info, registry
+from core.batching import recommendation_batcher
+from core.metrics import Histogram, stage
+
+# Shape of the recommendation traffic
+CRITERIA_COUNT = Histogram('recommend_criteria', "Criteria per recommendation request", buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32))
+RESULT_SIZE = Histogram('recommend_result_size', "Recipes returned per recommendation page", buckets=(0, 1, 5, 10, 20, 50, 100, 200, 500))
+TOTAL_MATCHES = Histogram('recommend_total_matches', "Matching recipes per recommendation request",
+                          buckets=(0, 10, 100, 1000, 10000, 100000, 1000000))
 
 router = APIRouter()
 
-@router.post("/recommend", response_model=List[str])
-def recommend_recipes(request: RecommendationRequest):
+# Function to map a recommendation request to criteria and record how many it has
+def observed_criteria(request: RecommendationRequest):
+    criteria = request_to_criteria(request)
+    CRITERIA_COUNT.observe(len(criteria))
+    return criteria
+
+# Function to get one ranked page: cache hits are answered on the event loop, scoring is batched
+# with concurrent requests and runs on the bounded inference executor (a full queue answers 503)
+async def ranked_page(criteria, limit, offset, snapshot):
+    with stage('cache_lookup'):
+        page = cached_page(criteria, limit, offset, snapshot)
+    if page is None:
+        page = await recommendation_batcher.submit((criteria, limit, offset, snapshot))
+    recipe_names, _, total = page
+    RESULT_SIZE.observe(len(recipe_names))
+    TOTAL_MATCHES.observe(total)
+    return page
+
+@router.post("/recommend", response_model=RecommendationResponse, response_model_exclude_none=True)
+async def recommend_recipes(request: RecommendationRequest):
     # Map user input to criteria
-    criteria = map_user_input_to_criteria(
-        request.meal_type,
-        request.calories,
-        request.carbs,
-        request.protein,
-        request.fat,
-        request.diet_type,
-        request.region,
-        request.cook_time,
-        request.ingredients,
-        request.weights,
-        request.country
+    criteria = observed_criteria(request)
+
+    # Rank only the requested page; the recommender never sorts every match
+    recipe_names, scores, total = await ranked_page(criteria, request.limit, request.offset, registry.get())
+
+    next_offset = request.offset + len(recipe_names)
+    return RecommendationResponse(
+        recipes=recipe_names,
+        scores=scores if request.include_scores else None,
+        total=total,
+        offset=request.offset,
+        next_offset=next_offset if next_offset < total else None,
     )
 
-    if criteria:
-        matching_recipes = get_matching_recipes(criteria)
-        return matching_recipes
-    else:
-        return []
+@router.post("/recommend/details")
+async def recommend_recipes_with_details(request: RecommendationRequest):
+    criteria = observed_criteria(request)
+    # Rank and look up details on the same artifact version, even if a reload swaps one in meanwhile
+    snapshot = registry.get()
+    recipe_names, scores, total = await ranked_page(criteria, request.limit, request.offset, snapshot)
+
+    # Emit one NDJSON line per recipe so the first results reach the client right away
+    def stream_recipes():
+        for recipe_name, score in zip(recipe_names, scores):
+            with stage('fetch_info'):
+                info = fetch_recipe_info(recipe_name, snapshot)
+            if info is not None:
+                yield json.dumps({"recipe": recipe_name, "score": score, "info": info}) + "\n"
+
+    return StreamingResponse(
+        stream_recipes(),
+        media_type="application/x-ndjson",
+        headers={"X-Total-Count": str(total)},
+    )
@@ -0,0 +1,23 @@
+# backend/routers/similar.py
+
+from fastapi import APIRouter, HTTPException, Query
+from models.schemas import SimilarRecipesRequest, SimilarRecipesResponse
+from core.recommender import find_similar_recipes
+from core.executor import inference_executor
+
+router = APIRouter()
+
+# Function to run a similar-recipe query on the inference executor, 404 when none of the given recipes is known
+async def similar_response(recipe_names, k, exact):
+    recipes, scores, missing = await inference_executor.run(find_similar_recipes, recipe_names, k, exact)
+    if len(missing) == len(recipe_names):
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return SimilarRecipesResponse(recipes=recipes, scores=scores, missing=missing)
+
+@router.get("/similar/{recipe_name}", response_model=SimilarRecipesResponse)
+async def get_similar_recipes(recipe_name: str, k: int = Query(10, ge=1, le=100), exact: bool = False):
+    return await similar_response([recipe_name], k, exact)
+
+@router.post("/similar", response_model=SimilarRecipesResponse)
+async def post_similar_recipes(request: SimilarRecipesRequest):
+    return await similar_response(request.recipes, request.k, request.exact)
@@ -1,19 +1,76 @@
 # backend/routers/unique_items.py
 
-from fastapi import APIRouter
-from typing import List
-from core.data_loading import unique_ingredients, unique_regions, unique_countries
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import Response
+from typing import List, Literal
+from models.schemas import SuggestResponse
+from core.recommender import registry
 
 router = APIRouter()
 
+# Function to check an If-None-Match header against the entity tags of a body
+def etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return '*' in candidates or bool(candidates & set(etags))
+
+# Function to check an Accept-Encoding header allows gzip: listed as gzip (or x-gzip, or covered by
+# "*") with a non-zero q-value
+def accepts_gzip(accept_encoding):
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+# Function to answer a full-list request from the precomputed body of the vocabulary: 304 when the
+# client's copy is current, gzipped when the client accepts it, never re-serialized or re-validated
+def static_list_response(request: Request, name: str):
+    body = registry.get().vocabularies[name].body
+    gzipped = accepts_gzip(request.headers.get('accept-encoding', ''))
+    headers = {
+        'ETag': body.gzip_etag if gzipped else body.etag,
+        # Clients may keep the list but revalidate it, as a reload can change it
+        'Cache-Control': 'no-cache',
+        # On the 304 too: the ETag differs per encoding
+        'Vary': 'Accept-Encoding',
+    }
+    if etag_matches(request.headers.get('if-none-match'), (body.etag, body.gzip_etag)):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        return Response(body.gzipped, media_type='application/json', headers={**headers, 'Content-Encoding': 'gzip'})
+    return Response(body.body, media_type='application/json', headers=headers)
+
 @router.get("/unique_ingredients", response_model=List[str])
-def get_unique_ingredients_endpoint():
-    return unique_ingredients
+def get_unique_ingredients_endpoint(request: Request):
+    return static_list_response(request, 'ingredients')
 
 @router.get("/unique_regions", response_model=List[str])
-def get_unique_regions_endpoint():
-    return unique_regions
+def get_unique_regions_endpoint(request: Request):
+    return static_list_response(request, 'regions')
 
 @router.get("/unique_countries", response_model=List[str])
-def get_unique_countries_endpoint():
-    return unique_countries
+def get_unique_countries_endpoint(request: Request):
+    return static_list_response(request, 'countries')
+
+# Typeahead: the k most used labels of a vocabulary that start (at a word) with q
+@router.get("/suggest", response_model=SuggestResponse)
+def suggest(
+    q: str = Query('', max_length=100),
+    field: Literal['ingredients', 'regions', 'countries'] = 'ingredients',
+    k: int = Query(10, ge=1, le=100),
+):
+    suggestions, counts = registry.get().vocabularies[field].suggest.suggest(q, k)
+    return SuggestResponse(field=field, query=q, suggestions=suggestions, counts=counts)
@@ -0,0 +1,7 @@
+# backend/tests/conftest.py
+
+import os
+import sys
+
+# Tests import the app modules (core, routers, ...) the way main.py does, from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+# backend/tests/test_artifacts.py
+
+import numpy as np
+from core.artifacts import load_recipe_table, load_embedding_artifacts
+from core.recipe_index import RecipeIndex, format_recipe_info
+from core.scoring import ScoringEngine
+from perf.synthetic import build_dataset
+
+def test_recipe_index_file_holds_the_formatted_recipes(tmp_path):
+    build_dataset(300, str(tmp_path))
+    recipes_df = load_recipe_table(str(tmp_path / 'processed_recipes.arrow'))
+    recipe_index = RecipeIndex.load(str(tmp_path / 'recipe_info.arrow'))
+
+    assert len(recipe_index) == recipes_df['Name'].nunique()
+    for info in recipes_df.head(20).to_dict('records'):
+        assert recipe_index.get(info['Name']) == format_recipe_info(info)
+    assert recipe_index.get('no such recipe') is None
+
+def test_exported_recipe_rows_are_mapped_not_copied(tmp_path):
+    build_dataset(300, str(tmp_path), precision='int8')
+    recipe_names = load_recipe_table(str(tmp_path / 'processed_recipes.arrow'))['Name']
+    embeddings = load_embedding_artifacts(str(tmp_path))
+    engine = ScoringEngine(recipe_names=recipe_names, **embeddings)
+    assert isinstance(engine.recipe_matrix.values, np.memmap)
+
+    # Same rows as copying them out of the entity matrix
+    copied = engine.entity_matrix.take(engine.recipe_ids)
+    assert np.array_equal(engine.recipe_matrix.values, copied.values)
+    assert np.array_equal(engine.recipe_matrix.scales, copied.scales)
+
+    # Recipe rows exported for another table are not used
+    engine = ScoringEngine(recipe_names=recipe_names[::-1], **embeddings)
+    assert not isinstance(engine.recipe_matrix.values, np.memmap)
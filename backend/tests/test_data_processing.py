@@ -0,0 +1,40 @@
+# backend/tests/test_data_processing.py
+
+import pandas as pd
+from core.data_processing import read_source_chunks
+
+# Function to write a small source CSV; the blank Calories cell of the last row makes pandas read
+# that column as float in the chunk holding it
+def write_source(path, descriptions=('x', 'y', 'z', 'w')):
+    pd.DataFrame({
+        'Name': ['a', 'b', 'c', 'd'],
+        'Calories': ['100', '200', '300', ''],
+        'Description': list(descriptions),
+    }).to_csv(path, index=False)
+
+# Function to read the content hash of every recipe
+def content_hashes(path, chunksize):
+    return {
+        name: content_hash
+        for df in read_source_chunks(path, chunksize)
+        for name, content_hash in zip(df['Name'], df['content_hash'])
+    }
+
+def test_content_hash_does_not_depend_on_chunk_size(tmp_path):
+    path = tmp_path / 'recipes.csv'
+    write_source(path)
+    assert content_hashes(path, 2) == content_hashes(path, 4)
+
+def test_content_hash_changes_with_the_row(tmp_path):
+    before, after = tmp_path / 'before.csv', tmp_path / 'after.csv'
+    write_source(before)
+    write_source(after, descriptions=('x', 'changed', 'z', 'w'))
+    changed = {name for name, content_hash in content_hashes(after, 4).items() if content_hashes(before, 4)[name] != content_hash}
+    assert changed == {'b'}
+
+def test_numeric_columns_keep_their_dtype(tmp_path):
+    path = tmp_path / 'recipes.csv'
+    write_source(path)
+    first, second = read_source_chunks(path, 2)
+    assert first['Calories'].dtype == 'int64'
+    assert second['Calories'].dtype == 'float64' and second['Calories'].isna().tolist() == [False, True]
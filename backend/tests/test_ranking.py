@@ -0,0 +1,46 @@
+# backend/tests/test_ranking.py
+
+import numpy as np
+import pytest
+from core.recommender import map_user_input_to_criteria, compute_ranking
+from core.cache import clear_all_caches
+from core.ranking_store import RankingStore, save_rankings
+from core.score_tables import ScoreTable
+from perf.synthetic import build_dataset, load_dataset
+
+@pytest.mark.parametrize('score_table', [False, True])
+def test_full_and_candidate_rankings_agree_on_shared_recipes(tmp_path, score_table):
+    build_dataset(2000, str(tmp_path), score_table=score_table)
+    snapshot = load_dataset(str(tmp_path))
+    criteria = map_user_input_to_criteria('Dinner', 'low', None, 'high', None, None, 'Europe', None, None, {'protein': 2.0}, None)
+    candidates = snapshot.attribute_index.candidates(criteria, min_candidates=1, max_fraction=1.0)
+    assert 0 < len(candidates) < snapshot.engine.num_recipes
+
+    clear_all_caches()
+    partial = compute_ranking(snapshot, criteria, candidates=candidates)
+    full = compute_ranking(snapshot, criteria)
+    assert partial.total == len(candidates)
+
+    # Same score for every candidate on both paths, and the same order among the candidates
+    full_scores = dict(zip(full.rows.tolist(), full.scores.tolist()))
+    np.testing.assert_allclose(partial.scores, [full_scores[row] for row in partial.rows.tolist()], atol=1e-5)
+    in_candidates = np.isin(full.rows, candidates)
+    np.testing.assert_allclose(full.scores[in_candidates], partial.scores, atol=1e-5)
+
+def test_precomputed_rankings_follow_the_score_table(tmp_path):
+    build_dataset(500, str(tmp_path), score_table=True)
+    snapshot = load_dataset(str(tmp_path))
+    engine, table = snapshot.engine, snapshot.score_table
+    relations, tails = zip(*sorted(table.row_of, key=table.row_of.get))
+    float_table = ScoreTable(table.matrix.astype(np.float16), relations, tails, table.recipe_labels, table.fingerprint)
+
+    save_rankings({}, engine, table, str(tmp_path))
+    store = RankingStore.load(str(tmp_path))
+    assert store.matches(engine.recipe_matrix, engine.recipe_labels, table)
+    assert not store.matches(engine.recipe_matrix, engine.recipe_labels, None)
+    assert not store.matches(engine.recipe_matrix, engine.recipe_labels, float_table)
+
+    save_rankings({}, engine, None, str(tmp_path))
+    store = RankingStore.load(str(tmp_path))
+    assert store.matches(engine.recipe_matrix, engine.recipe_labels, None)
+    assert not store.matches(engine.recipe_matrix, engine.recipe_labels, table)
@@ -0,0 +1,19 @@
+# backend/tests/test_synthetic.py
+
+from core.artifacts import load_labels
+from core.utils import create_node_label
+from perf.synthetic import REGIONS, build_dataset, synthetic_vocabulary
+
+# Function to read a saved vocabulary as a list
+def vocabulary(directory, name):
+    return list(load_labels(str(directory / f'unique_{name}.npy')))
+
+def test_synthetic_vocabularies_hold_data_values(tmp_path):
+    build_dataset(300, str(tmp_path))
+    names = synthetic_vocabulary(300)
+
+    assert vocabulary(tmp_path, 'regions') == [''] + sorted(create_node_label(region) for region in REGIONS)
+    countries = vocabulary(tmp_path, 'countries')
+    assert countries[0] == '' and set(countries[1:]) <= {create_node_label(c) for c in names['countries']}
+    ingredients = vocabulary(tmp_path, 'ingredients')
+    assert ingredients and set(ingredients) <= {create_node_label(i) for i in names['ingredients']}
@@ -0,0 +1,22 @@
+# backend/tests/test_unique_items.py
+
+import pytest
+from routers.unique_items import accepts_gzip
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', True),
+    ('gzip, deflate, br', True),
+    ('br;q=1.0, gzip;q=0.8', True),
+    ('GZIP', True),
+    ('x-gzip', True),
+    ('*', True),
+    ('', False),
+    ('identity', False),
+    ('gzip;q=0', False),
+    ('gzip; q=0.0, deflate', False),
+    ('*;q=0', False),
+    ('gzip;q=0, *', False),
+    ('br, *;q=0.5', True),
+])
+def test_accepts_gzip_reads_q_values(header, expected):
+    assert accepts_gzip(header) is expected
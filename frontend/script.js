@@ -1,7 +1,7 @@
 const API_URL = 'http://localhost:8000'; // Adjust if your backend is hosted elsewhere
 
 document.addEventListener('DOMContentLoaded', () => {
-  // Fetch unique ingredients, regions, and countries from the backend
+  // Fetch suggested ingredients and the unique regions and countries from the backend
   fetchUniqueOptions();
 
   // Update weight display values
@@ -28,6 +28,14 @@ document.addEventListener('DOMContentLoaded', () => {
   const ingredientsSelect = document.getElementById('ingredients');
   const selectedIngredientsList = document.getElementById('selected-ingredients-list');
 
+  // Suggest matching ingredients as the user types (debounced)
+  const ingredientSearch = document.getElementById('ingredient-search');
+  let suggestTimer = null;
+  ingredientSearch.addEventListener('input', () => {
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(() => suggestIngredients(ingredientSearch.value), SUGGEST_DELAY_MS);
+  });
+
   ingredientsSelect.addEventListener('change', () => {
     // Clear the list of selected ingredients
     selectedIngredientsList.innerHTML = '';
@@ -42,20 +50,43 @@ document.addEventListener('DOMContentLoaded', () => {
   });
 });
 
+const PAGE_SIZE = 20;
+const SUGGEST_LIMIT = 50;
+const SUGGEST_DELAY_MS = 150;
+
 let selectedRecipes = [];
 let recipeOffset = 0;
-
-async function fetchUniqueOptions() {
-  // Fetch ingredients
-  const ingredientsResponse = await fetch(`${API_URL}/unique_ingredients`);
-  const ingredients = await ingredientsResponse.json();
+let lastRequestData = null;
+let nextPageOffset = null;
+let recipeInfoCache = {};
+
+// Replace the unselected ingredient options with the server's suggestions for the query;
+// selected ingredients stay in the list so they are still submitted
+async function suggestIngredients(query) {
+  const params = new URLSearchParams({ field: 'ingredients', q: query, k: SUGGEST_LIMIT });
+  const response = await fetch(`${API_URL}/suggest?${params}`);
+  const { suggestions } = await response.json();
   const ingredientsSelect = document.getElementById('ingredients');
-  ingredients.forEach(ingredient => {
+  const selected = new Set(Array.from(ingredientsSelect.selectedOptions).map(option => option.value));
+  Array.from(ingredientsSelect.options).forEach(option => {
+    if (!option.selected) {
+      option.remove();
+    }
+  });
+  suggestions.forEach(ingredient => {
+    if (selected.has(ingredient)) {
+      return;
+    }
     const option = document.createElement('option');
     option.value = ingredient;
     option.textContent = ingredient;
     ingredientsSelect.appendChild(option);
   });
+}
+
+async function fetchUniqueOptions() {
+  // Most used ingredients first; the full list is only searched on the server
+  await suggestIngredients('');
 
   // Fetch regions
   const regionsResponse = await fetch(`${API_URL}/unique_regions`);
@@ -129,21 +160,21 @@ async function getRecommendations() {
     ingredients,
     country,
     weights,
-    flexible: flexible_matching
+    flexible: flexible_matching,
+    limit: PAGE_SIZE,
+    offset: 0
   };
 
   // Send request to backend
-  const response = await fetch(`${API_URL}/recommend`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json'
-    },
-    body: JSON.stringify(requestData)
-  });
+  const page = await fetchRecommendationPage(requestData);
 
-  if (response.status === 200) {
-    selectedRecipes = await response.json();
+  if (page !== null) {
+    lastRequestData = requestData;
+    selectedRecipes = page.recipes;
+    nextPageOffset = page.next_offset ?? null;
     recipeOffset = 0;
+    recipeInfoCache = {};
+    await prefetchRecipeInfo(page.recipes);
     if (selectedRecipes.length > 0) {
       displayRecipeInfo(selectedRecipes[recipeOffset]);
       document.getElementById('next-recipe-button').style.display = 'block';
@@ -157,10 +188,52 @@ async function getRecommendations() {
   }
 }
 
-async function displayRecipeInfo(recipeName) {
-  const response = await fetch(`${API_URL}/recipe/${recipeName}`);
+async function fetchRecommendationPage(requestData) {
+  const response = await fetch(`${API_URL}/recommend`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify(requestData)
+  });
+  if (response.status !== 200) {
+    return null;
+  }
+  return await response.json();
+}
+
+async function prefetchRecipeInfo(recipeNames) {
+  // Load the details of a whole page of recipes in one request
+  if (recipeNames.length === 0) {
+    return;
+  }
+  const response = await fetch(`${API_URL}/recipes/batch`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({ names: recipeNames })
+  });
   if (response.status === 200) {
-    const info = await response.json();
+    const batch = await response.json();
+    Object.assign(recipeInfoCache, batch.recipes);
+  }
+}
+
+async function getRecipeInfo(recipeName) {
+  if (recipeName in recipeInfoCache) {
+    return recipeInfoCache[recipeName];
+  }
+  const response = await fetch(`${API_URL}/recipe/${recipeName}`);
+  if (response.status !== 200) {
+    return null;
+  }
+  return await response.json();
+}
+
+async function displayRecipeInfo(recipeName) {
+  const info = await getRecipeInfo(recipeName);
+  if (info !== null) {
     const container = document.getElementById('recipe-container');
     container.innerHTML = '';
 
@@ -280,8 +353,17 @@ function formatInstructions(instructions) {
   return formattedInstructions;
 }
 
-function displayNextRecipe() {
+async function displayNextRecipe() {
   recipeOffset += 1;
+  if (recipeOffset >= selectedRecipes.length && nextPageOffset !== null) {
+    // Load the next page of recommendations
+    const page = await fetchRecommendationPage({ ...lastRequestData, offset: nextPageOffset });
+    if (page !== null) {
+      selectedRecipes = selectedRecipes.concat(page.recipes);
+      nextPageOffset = page.next_offset ?? null;
+      await prefetchRecipeInfo(page.recipes);
+    }
+  }
   if (recipeOffset < selectedRecipes.length) {
     displayRecipeInfo(selectedRecipes[recipeOffset]);
   } else {